@@ -0,0 +1,36 @@
+#!/bin/bash
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# This runs the scheduler benchmark against synthetic fleets of the given
+# sizes and prints the select_destinations latency (p50/p99), the time spent
+# in each filter and weigher, and the memory used per host.
+#
+# No database or message bus is needed. For this script to work please run:
+# python setup.py develop
+# pip install -r requirements.txt
+# pip install -r test-requirements.txt
+# export EVENTLET_NO_GREENDNS='yes'
+#
+# Usage: benchmark_scheduler.sh [fleet size ...]
+#
+BASEDIR=$(dirname $0)
+TEST=$BASEDIR/../nova/tests/unit/scheduler/test_scheduler_benchmark.py
+SIZES=${@:-1000 5000 10000 50000}
+echo
+echo "Running this unit test file as a python script:"
+echo $TEST $SIZES
+
+python $TEST $SIZES
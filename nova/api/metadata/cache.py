@@ -0,0 +1,68 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Generations of the metadata cached by the metadata request handler.
+
+The metadata and responses cached for an instance are keyed by the current
+generation of the instance. The services updating an instance or its network
+info drop that generation, so that the cached entries are not used anymore,
+without the metadata API having to check the instance on every request.
+"""
+
+import uuid
+
+from nova.openstack.common import memorycache
+
+_CACHE = None
+
+
+def _get_cache():
+    global _CACHE
+
+    if _CACHE is None:
+        _CACHE = memorycache.get_client()
+
+    return _CACHE
+
+
+def reset_cache():
+    global _CACHE
+    _CACHE = None
+
+
+def _make_generation_key(instance_uuid):
+    return str('metadata-generation-%s' % instance_uuid)
+
+
+def get_generation(instance_uuid, expiration):
+    """Return the current generation of the cached metadata of an instance.
+
+    A new generation is started when there is none, it is kept for
+    expiration seconds at most.
+    """
+    cache = _get_cache()
+    key = _make_generation_key(instance_uuid)
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        # Another worker may have started one meanwhile
+        if not cache.add(key, generation, expiration):
+            generation = cache.get(key) or generation
+    return generation
+
+
+def invalidate(instance_uuid):
+    """Stop using the metadata cached for an instance."""
+    _get_cache().delete(_make_generation_key(instance_uuid))
@@ -21,11 +21,13 @@ import os
 
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import encodeutils
 import six
 import webob.dec
 import webob.exc
 
 from nova.api.metadata import base
+from nova.api.metadata import cache as metadata_cache
 from nova import exception
 from nova.i18n import _
 from nova.i18n import _LE
@@ -57,7 +59,11 @@ metadata_opts = [
                     'this should improve response times of the metadata API '
                     'when under heavy load. Higher values may increase memory'
                     'usage and result in longer times for host metadata '
-                    'changes to take effect.')
+                    'changes to take effect. Cached metadata are not used '
+                    'anymore once the instance or its network info are '
+                    'updated. The cache is shared by the API workers, and '
+                    'updates made by other services are seen, when '
+                    'memcached_servers is set.')
 ]
 
 CONF.register_opts(metadata_proxy_opts, 'neutron')
@@ -72,15 +78,34 @@ class MetadataRequestHandler(wsgi.Application):
     def __init__(self):
         self._cache = memorycache.get_client()
 
+    def _get_metadata_key(self, instance_uuid, address):
+        generation = metadata_cache.get_generation(
+            instance_uuid, CONF.metadata_cache_expiration)
+        return 'metadata-%s-%s-%s' % (instance_uuid, generation, address)
+
+    def _get_cached_metadata(self, instance_uuid, address):
+        """Return the metadata cached for the current generation of an
+        instance, if any.
+        """
+        return self._cache.get(self._get_metadata_key(instance_uuid,
+                                                       address))
+
+    def _cache_metadata(self, meta_data):
+        self._cache.set(
+            self._get_metadata_key(meta_data.uuid, meta_data.address),
+            meta_data, CONF.metadata_cache_expiration)
+
     def get_metadata_by_remote_address(self, address):
         if not address:
             raise exception.FixedIpNotFoundForAddress(address=address)
 
-        cache_key = 'metadata-%s' % address
-        data = self._cache.get(cache_key)
-        if data:
-            LOG.debug("Using cached metadata for %s", address)
-            return data
+        cache_key = 'metadata-address-%s' % address
+        instance_uuid = self._cache.get(cache_key)
+        if instance_uuid:
+            data = self._get_cached_metadata(instance_uuid, address)
+            if data:
+                LOG.debug("Using cached metadata for %s", address)
+                return data
 
         try:
             data = base.get_metadata_by_address(address)
@@ -88,16 +113,19 @@ class MetadataRequestHandler(wsgi.Application):
             return None
 
         if CONF.metadata_cache_expiration > 0:
-            self._cache.set(cache_key, data, CONF.metadata_cache_expiration)
+            self._cache.set(cache_key, data.uuid,
+                            CONF.metadata_cache_expiration)
+            self._cache_metadata(data)
 
         return data
 
     def get_metadata_by_instance_id(self, instance_id, address):
-        cache_key = 'metadata-%s' % instance_id
-        data = self._cache.get(cache_key)
-        if data:
-            LOG.debug("Using cached metadata for instance %s", instance_id)
-            return data
+        if CONF.metadata_cache_expiration > 0:
+            data = self._get_cached_metadata(instance_id, address)
+            if data:
+                LOG.debug("Using cached metadata for instance %s",
+                          instance_id)
+                return data
 
         try:
             data = base.get_metadata_by_instance_id(instance_id, address)
@@ -105,7 +133,7 @@ class MetadataRequestHandler(wsgi.Application):
             return None
 
         if CONF.metadata_cache_expiration > 0:
-            self._cache.set(cache_key, data, CONF.metadata_cache_expiration)
+            self._cache_metadata(data)
 
         return data
 
@@ -130,6 +158,19 @@ class MetadataRequestHandler(wsgi.Application):
         if meta_data is None:
             raise webob.exc.HTTPNotFound()
 
+        # NOTE: Serialized responses are cached along with the metadata
+        # they are made of, for the same instance version
+        response_key = None
+        if CONF.metadata_cache_expiration > 0 and req.method == 'GET':
+            path_hash = hashlib.md5(
+                encodeutils.safe_encode(req.path_info)).hexdigest()
+            response_key = '%s-%s' % (
+                self._get_metadata_key(meta_data.uuid, meta_data.address),
+                path_hash)
+            cached = self._cache.get(response_key)
+            if cached:
+                return self._set_response(req, *cached)
+
         try:
             data = meta_data.lookup(req.path_info)
         except base.InvalidMetadataPath:
@@ -139,12 +180,20 @@ class MetadataRequestHandler(wsgi.Application):
             return data(req, meta_data)
 
         resp = base.ec2_md_print(data)
+        content_type = meta_data.get_mimetype()
+        if response_key:
+            self._cache.set(response_key, (resp, content_type),
+                            CONF.metadata_cache_expiration)
+        return self._set_response(req, resp, content_type)
+
+    @staticmethod
+    def _set_response(req, resp, content_type):
         if isinstance(resp, six.text_type):
             req.response.text = resp
         else:
             req.response.body = resp
 
-        req.response.content_type = meta_data.get_mimetype()
+        req.response.content_type = content_type
         return req.response
 
     def _handle_remote_ip_request(self, req):
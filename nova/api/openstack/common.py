@@ -48,6 +48,11 @@ osapi_opts = [
     cfg.StrOpt('osapi_glance_link_prefix',
                help='Base URL that will be presented to users in links '
                     'to glance resources'),
+    cfg.BoolOpt('osapi_pagination_cursors',
+                default=False,
+                help='Use opaque pagination cursors rather than server '
+                     'uuids as the marker of the next links of server '
+                     'lists. Both are accepted as markers.'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(osapi_opts)
@@ -69,7 +69,7 @@ class SimpleTenantUsageController(object):
                 stop = period_stop
             dt = stop - start
             seconds = (dt.days * 3600 * 24 + dt.seconds +
-                       dt.microseconds / 100000.0)
+                       dt.microseconds / 1000000.0)
 
             return seconds / 3600.0
         else:
@@ -101,12 +101,34 @@ class SimpleTenantUsageController(object):
 
         return flavor_ref
 
+    def _tenant_usage_totals_for_period(self, context, period_start,
+                                        period_stop, tenant_id=None):
+        """Return the usage summaries of the tenants, without the usages of
+        their servers. The totals are computed by the database rather than
+        by loading every instance active during the period.
+        """
+        totals = objects.InstanceList.get_usage_totals_by_window(
+                        context, period_start, period_stop, tenant_id)
+        start = timeutils.normalize_time(period_start)
+        stop = timeutils.normalize_time(period_stop)
+        return [{'tenant_id': total['project_id'],
+                 'total_local_gb_usage': total['local_gb_hours'] or 0,
+                 'total_vcpus_usage': total['vcpus_hours'] or 0,
+                 'total_memory_mb_usage': total['memory_mb_hours'] or 0,
+                 'total_hours': total['hours'] or 0,
+                 'start': start,
+                 'stop': stop}
+                for total in totals]
+
     def _tenant_usages_for_period(self, context, period_start,
                                   period_stop, tenant_id=None, detailed=True):
+        if not detailed:
+            return self._tenant_usage_totals_for_period(
+                context, period_start, period_stop, tenant_id=tenant_id)
 
         instances = objects.InstanceList.get_active_by_window_joined(
                         context, period_start, period_stop, tenant_id,
-                        expected_attrs=['system_metadata'])
+                        expected_attrs=['system_metadata', 'flavor'])
         rval = {}
         flavors = {}
 
@@ -25,9 +25,12 @@ PREFIX = "OS-EXT-AZ"
 
 
 class ExtendedAZController(wsgi.Controller):
-    def _extend_server(self, context, server, instance):
+    def _extend_server(self, context, server, instance, azs=None):
         key = "%s:availability_zone" % PREFIX
-        az = avail_zone.get_instance_availability_zone(context, instance)
+        if azs and instance.get('host') in azs:
+            az = azs[instance.get('host')]
+        else:
+            az = avail_zone.get_instance_availability_zone(context, instance)
         if not az and instance.get('availability_zone'):
             # Likely hasn't reached a viable compute node yet so give back the
             # desired availability_zone that *may* exist in the instance
@@ -48,9 +51,12 @@ class ExtendedAZController(wsgi.Controller):
         context = req.environ['nova.context']
         if authorize(context):
             servers = list(resp_obj.obj['servers'])
+            # The zones of the hosts of the listed instances are resolved
+            # in bulk by the core API when this extension is enabled.
+            azs = req.get_db_availability_zones()
             for server in servers:
                 db_instance = req.get_db_instance(server['id'])
-                self._extend_server(context, server, db_instance)
+                self._extend_server(context, server, db_instance, azs=azs)
 
 
 class ExtendedAvailabilityZone(extensions.V3APIExtensionBase):
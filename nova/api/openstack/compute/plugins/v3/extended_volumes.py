@@ -27,9 +27,11 @@ class ExtendedVolumesController(wsgi.Controller):
         super(ExtendedVolumesController, self).__init__(*args, **kwargs)
         self.api_version_2_3 = api_version_request.APIVersionRequest('2.3')
 
-    def _extend_server(self, context, server, instance, requested_version):
-        bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
-                context, instance.uuid)
+    def _extend_server(self, context, server, instance, requested_version,
+                       bdms=None):
+        if bdms is None:
+            bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
+                    context, instance.uuid)
         volumes_attached = []
         for bdm in bdms:
             if bdm.get('volume_id'):
@@ -61,8 +63,12 @@ class ExtendedVolumesController(wsgi.Controller):
                 db_instance = req.get_db_instance(server['id'])
                 # server['id'] is guaranteed to be in the cache due to
                 # the core API adding it in its 'detail' method.
+                # The block device mappings of the listed instances are
+                # loaded in bulk by the core API when this extension is
+                # enabled.
+                bdms = req.get_db_block_device_mappings(server['id'])
                 self._extend_server(context, server, db_instance,
-                                    req.api_version_request)
+                                    req.api_version_request, bdms=bdms)
 
 
 class ExtendedVolumes(extensions.V3APIExtensionBase):
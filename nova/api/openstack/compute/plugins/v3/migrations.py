@@ -10,12 +10,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo_config import cfg
+
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova import compute
 from nova.objects import base as obj_base
 
 
+CONF = cfg.CONF
+CONF.import_opt('osapi_max_limit', 'nova.api.openstack.common')
+CONF.import_opt('osapi_json_streaming', 'nova.api.openstack.wsgi')
+
 ALIAS = "os-migrations"
 
 
@@ -23,20 +29,26 @@ def authorize(context, action_name):
     extensions.os_compute_authorizer(ALIAS)(context, action=action_name)
 
 
+def _output(migrations):
+    """Yields the primitive of each migration which is not hidden."""
+    for migration in migrations:
+        obj = obj_base.obj_to_primitive(migration)
+        if obj['hidden']:
+            continue
+        del obj['deleted']
+        del obj['deleted_at']
+        del obj['migration_type']
+        del obj['hidden']
+        yield obj
+
+
 def output(migrations_obj):
     """Returns the desired output of the API from an object.
 
     From a MigrationsList's object this method returns a list of
     primitive objects with the only necessary fields.
     """
-    objects = obj_base.obj_to_primitive(migrations_obj)
-    objects = [x for x in objects if not x['hidden']]
-    for obj in objects:
-        del obj['deleted']
-        del obj['deleted_at']
-        del obj['migration_type']
-        del obj['hidden']
-    return objects
+    return list(_output(migrations_obj))
 
 
 class MigrationsController(wsgi.Controller):
@@ -49,6 +61,12 @@ class MigrationsController(wsgi.Controller):
         """Return all migrations in progress."""
         context = req.environ['nova.context']
         authorize(context, "index")
+        if CONF.osapi_json_streaming:
+            # The streaming serializer consumes the generator, so the
+            # migrations are read from the database as the body is sent.
+            migrations = self.compute_api.get_migrations_in_batches(
+                context, req.GET, CONF.osapi_max_limit)
+            return {'migrations': _output(migrations)}
         migrations = self.compute_api.get_migrations(context, req.GET)
         return {'migrations': output(migrations)}
 
@@ -35,6 +35,7 @@ from nova.api.openstack.compute.views import servers as views_servers
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova.api import validation
+from nova import availability_zones as avail_zone
 from nova import compute
 from nova.compute import flavors
 from nova import exception
@@ -371,10 +372,15 @@ class ServersController(wsgi.Controller):
 
         limit, marker = common.get_limit_and_marker(req)
         sort_keys, sort_dirs = common.get_sort_params(req.params)
+        expected_attrs = ['pci_devices']
+        if is_detail:
+            # The detail view renders the flavor of every instance, so join
+            # it in the listing query rather than lazy-loading it for each.
+            expected_attrs.append('flavor')
         try:
             instance_list = self.compute_api.get_all(elevated or context,
                     search_opts=search_opts, limit=limit, marker=marker,
-                    want_objects=True, expected_attrs=['pci_devices'],
+                    want_objects=True, expected_attrs=expected_attrs,
                     sort_keys=sort_keys, sort_dirs=sort_dirs)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
@@ -386,12 +392,35 @@ class ServersController(wsgi.Controller):
 
         if is_detail:
             instance_list.fill_faults()
+            self._preload_extension_data(req, context, instance_list)
             response = self._view_builder.detail(req, instance_list)
         else:
             response = self._view_builder.index(req, instance_list)
         req.cache_db_instances(instance_list)
         return response
 
+    def _preload_extension_data(self, req, context, instance_list):
+        """Load the data the loaded extensions add to a server list in bulk.
+
+        Without this, the extensions extending the detail view look up the
+        block device mappings and availability zone of each instance on
+        their own, so the cost of a listing grows with both the number of
+        instances and the number of extensions.
+        """
+        if not instance_list:
+            return
+        loaded_extensions = self.extension_info.get_extensions()
+        if 'os-extended-volumes' in loaded_extensions:
+            instance_uuids = [instance.uuid for instance in instance_list]
+            bdms = objects.BlockDeviceMappingList.get_by_instance_uuids(
+                context, instance_uuids).group_by_instance_uuid()
+            req.cache_db_block_device_mappings(
+                {uuid: bdms.get(uuid, []) for uuid in instance_uuids})
+        if 'os-extended-availability-zone' in loaded_extensions:
+            req.cache_db_availability_zones(
+                avail_zone.get_instance_availability_zones(context,
+                                                           instance_list))
+
     def _get_server(self, context, req, instance_uuid):
         """Utility function for looking up an instance by uuid."""
         instance = common.get_instance(self.compute_api, context,
@@ -16,6 +16,7 @@
 
 import hashlib
 
+from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import timeutils
 
@@ -28,6 +29,7 @@ from nova.objects import base as obj_base
 from nova import utils
 
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
@@ -145,6 +147,29 @@ class ViewBuilder(common.ViewBuilder):
 
         return servers_dict
 
+    def _get_collection_links(self, request, items, collection_name,
+                              id_key="uuid"):
+        links = super(ViewBuilder, self)._get_collection_links(
+            request, items, collection_name, id_key)
+        if links and CONF.osapi_pagination_cursors:
+            cursor = self._get_pagination_cursor(request, items[-1])
+            links[0]['href'] = self._get_next_link(request, cursor,
+                                                   collection_name)
+        return links
+
+    @staticmethod
+    def _get_pagination_cursor(request, instance):
+        """Return a pagination cursor for the servers after instance.
+
+        The cursor carries the values of the requested sort keys, of the
+        default ones and the uuid of the instance.
+        """
+        sort_keys, _sort_dirs = common.get_sort_params(request.params)
+        keys = set(sort_keys) | set(['created_at', 'id', 'uuid'])
+        return utils.encode_pagination_cursor(
+            {key: instance[key] for key in keys
+             if key in instance.fields and instance.obj_attr_is_set(key)})
+
     @staticmethod
     def _get_metadata(instance):
         # FIXME(danms): Transitional support for objects
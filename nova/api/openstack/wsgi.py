@@ -19,6 +19,7 @@ import inspect
 import math
 import time
 
+from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import strutils
@@ -36,6 +37,17 @@ from nova import utils
 from nova import wsgi
 
 
+wsgi_opts = [
+    cfg.BoolOpt('osapi_json_streaming',
+                default=False,
+                help='Send the lists of JSON responses, such as server or '
+                     'hypervisor details, to the client in chunks as they '
+                     'are serialized rather than building the whole '
+                     'response body in memory first'),
+]
+CONF = cfg.CONF
+CONF.register_opts(wsgi_opts)
+
 LOG = logging.getLogger(__name__)
 
 _SUPPORTED_CONTENT_TYPES = (
@@ -156,6 +168,30 @@ class Request(webob.Request):
     def get_db_compute_node(self, id):
         return self.get_db_item('compute_nodes', id)
 
+    def cache_db_block_device_mappings(self, bdms_by_instance):
+        """Store the block device mappings of a list of instances, keyed
+        by instance uuid, so extensions do not look them up one instance
+        at a time.
+        """
+        db_items = self._extension_data['db_items'].setdefault(
+            'block_device_mappings', {})
+        db_items.update(bdms_by_instance)
+
+    def get_db_block_device_mappings(self, instance_uuid):
+        """Return the stored block device mappings of an instance, or None
+        if they were not loaded by the API method.
+        """
+        return self._extension_data['db_items'].get(
+            'block_device_mappings', {}).get(instance_uuid)
+
+    def cache_db_availability_zones(self, azs_by_host):
+        db_items = self._extension_data['db_items'].setdefault(
+            'availability_zones', {})
+        db_items.update(azs_by_host)
+
+    def get_db_availability_zones(self):
+        return self._extension_data['db_items'].get('availability_zones', {})
+
     def best_match_content_type(self):
         """Determine the requested response content-type."""
         if 'nova.best_content_type' not in self.environ:
@@ -291,6 +327,60 @@ class JSONDictSerializer(DictSerializer):
         return jsonutils.dumps(data)
 
 
+class StreamingJSONDictSerializer(JSONDictSerializer):
+    """JSON request body serialization streaming the top level lists.
+
+    Returns an iterable of body chunks rather than a string when the data
+    holds a list, so the items of the list are serialized one at a time
+    and the whole body never needs to be held in memory. The list can be
+    any iterable, a generator included.
+    """
+
+    # Size in bytes of the body chunks handed over to the WSGI server
+    chunk_size = 65536
+
+    def default(self, data):
+        if not (isinstance(data, dict) and
+                any(self._is_list(value) for value in data.values())):
+            return super(StreamingJSONDictSerializer, self).default(data)
+        return self._chunks(self._iterencode(data))
+
+    @staticmethod
+    def _is_list(value):
+        return (isinstance(value, (list, tuple)) or
+                inspect.isgenerator(value))
+
+    def _iterencode(self, data):
+        yield '{'
+        for i, (key, value) in enumerate(six.iteritems(data)):
+            if i:
+                yield ', '
+            yield jsonutils.dumps(key) + ': '
+            if self._is_list(value):
+                yield '['
+                for j, item in enumerate(value):
+                    if j:
+                        yield ', '
+                    yield jsonutils.dumps(item)
+                yield ']'
+            else:
+                yield jsonutils.dumps(value)
+        yield '}'
+
+    def _chunks(self, fragments):
+        chunk = []
+        size = 0
+        for fragment in fragments:
+            chunk.append(fragment)
+            size += len(fragment)
+            if size >= self.chunk_size:
+                yield utils.utf8(''.join(chunk))
+                chunk = []
+                size = 0
+        if chunk:
+            yield utils.utf8(''.join(chunk))
+
+
 def serializers(**serializers):
     """Attaches serializers to a method.
 
@@ -454,7 +544,12 @@ class ResponseObject(object):
             response.headers[hdr] = utils.utf8(str(value))
         response.headers['Content-Type'] = utils.utf8(content_type)
         if self.obj is not None:
-            response.body = serializer.serialize(self.obj)
+            body = serializer.serialize(self.obj)
+            if isinstance(body, six.string_types):
+                response.body = body
+            else:
+                # The serializer streams the body in chunks
+                response.app_iter = body
 
         return response
 
@@ -565,7 +660,10 @@ class Resource(wsgi.Application):
         default_deserializers.update(deserializers)
 
         self.default_deserializers = default_deserializers
-        self.default_serializers = dict(json=JSONDictSerializer)
+        if CONF.osapi_json_streaming:
+            self.default_serializers = dict(json=StreamingJSONDictSerializer)
+        else:
+            self.default_serializers = dict(json=JSONDictSerializer)
 
         self.action_peek = dict(json=action_peek_json)
         self.action_peek.update(action_peek or {})
@@ -27,6 +27,7 @@ import nova.api.openstack.compute.contrib.os_tenant_networks
 import nova.api.openstack.compute.extensions
 import nova.api.openstack.compute.plugins.v3.hide_server_addresses
 import nova.api.openstack.compute.servers
+import nova.api.openstack.wsgi
 import nova.availability_zones
 import nova.baserpc
 import nova.cells.manager
@@ -141,6 +142,7 @@ def list_opts():
              nova.api.openstack.compute.extensions.ext_opts,
              nova.api.openstack.compute.plugins.v3.hide_server_addresses.opts,
              nova.api.openstack.compute.servers.server_opts,
+             nova.api.openstack.wsgi.wsgi_opts,
          )),
         ('neutron', nova.api.metadata.handler.metadata_proxy_opts),
         ('osapi_v3', nova.api.openstack.api_opts),
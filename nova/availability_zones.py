@@ -26,6 +26,12 @@ from nova.openstack.common import memorycache
 #             avoid hitting the db multiple times on every request.
 AZ_CACHE_SECONDS = 60 * 60
 MC = None
+# The map of the availability zones of the hosts in an availability zone
+# aggregate is cached for a short time only, since it is not updated on every
+# aggregate change of the deployment. Its key does not start with the prefix
+# of the keys of the hosts, see _make_cache_key().
+HOST_AZS_CACHE_KEY = 'host-availability-zones'
+HOST_AZS_CACHE_SECONDS = 60
 
 availability_zone_opts = [
     cfg.StrOpt('internal_service_availability_zone',
@@ -56,6 +62,8 @@ def reset_cache():
 
     global MC
 
+    if MC is not None:
+        MC.delete(HOST_AZS_CACHE_KEY)
     MC = None
 
 
@@ -75,24 +83,46 @@ def _build_metadata_by_host(aggregates, hosts=None):
     return metadata
 
 
+def _get_host_availability_zones(context):
+    """Return the availability zones of the hosts in an availability zone
+    aggregate, keyed by host.
+
+    The map is loaded with a single aggregate query and kept in the
+    availability zone cache for HOST_AZS_CACHE_SECONDS, or until the
+    availability zone of a host is updated.
+    """
+    cache = _get_cache()
+    host_azs = cache.get(HOST_AZS_CACHE_KEY)
+    if host_azs is None:
+        aggregates = objects.AggregateList.get_by_metadata_key(
+            context.elevated(), 'availability_zone')
+        metadata = _build_metadata_by_host(aggregates)
+        host_azs = {host: u','.join(sorted(azs))
+                    for host, azs in metadata.items()}
+        cache.set(HOST_AZS_CACHE_KEY, host_azs, HOST_AZS_CACHE_SECONDS)
+    return host_azs
+
+
+def get_hosts_availability_zones(context, hosts):
+    """Return availability zones of the specified compute hosts, keyed by
+    host.
+    """
+    host_azs = _get_host_availability_zones(context)
+    return {host: host_azs.get(host, CONF.default_availability_zone)
+            for host in hosts}
+
+
 def set_availability_zones(context, services):
     # Makes sure services isn't a sqlalchemy object
     services = [dict(service) for service in services]
-    hosts = set([service['host'] for service in services])
-    aggregates = objects.AggregateList.get_by_metadata_key(context,
-            'availability_zone', hosts=hosts)
-    metadata = _build_metadata_by_host(aggregates, hosts=hosts)
-    # gather all of the availability zones associated with a service host
+    compute_hosts = set(service['host'] for service in services
+                        if service['topic'] == "compute")
+    host_azs = get_hosts_availability_zones(context, compute_hosts)
     for service in services:
-        az = CONF.internal_service_availability_zone
         if service['topic'] == "compute":
-            if metadata.get(service['host']):
-                az = u','.join(list(metadata[service['host']]))
-            else:
-                az = CONF.default_availability_zone
-                # update the cache
-                update_host_availability_zone_cache(context,
-                                                    service['host'], az)
+            az = host_azs[service['host']]
+        else:
+            az = CONF.internal_service_availability_zone
         service['availability_zone'] = az
     return services
 
@@ -114,6 +144,11 @@ def update_host_availability_zone_cache(context, host, availability_zone=None):
     cache_key = _make_cache_key(host)
     cache.delete(cache_key)
     cache.set(cache_key, availability_zone, AZ_CACHE_SECONDS)
+    # Only drop the map of the hosts when the zone of the host changed
+    host_azs = cache.get(HOST_AZS_CACHE_KEY)
+    if (host_azs is not None and availability_zone !=
+            host_azs.get(host, CONF.default_availability_zone)):
+        cache.delete(HOST_AZS_CACHE_KEY)
 
 
 def get_availability_zones(context, get_only_available=False,
@@ -179,3 +214,13 @@ def get_instance_availability_zone(context, instance):
         az = get_host_availability_zone(elevated, host)
         cache.set(cache_key, az, AZ_CACHE_SECONDS)
     return az
+
+
+def get_instance_availability_zones(context, instances):
+    """Return availability zones of specified instances, keyed by host.
+
+    Instances which are not on a host yet are left out.
+    """
+    hosts = set(instance.get('host') for instance in instances)
+    return get_hosts_availability_zones(context,
+                                        [host for host in hosts if host])
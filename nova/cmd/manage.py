@@ -64,6 +64,7 @@ import netaddr
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
+from oslo_serialization import jsonutils
 from oslo_utils import importutils
 import six
 
@@ -939,7 +940,15 @@ class DbCommands(object):
 
     @args('--max_rows', metavar='<number>',
             help='Maximum number of deleted rows to archive')
-    def archive_deleted_rows(self, max_rows):
+    @args('--batch_size', metavar='<number>',
+          help='Number of deleted rows to archive at a time from a table')
+    @args('--sleep', metavar='<seconds>',
+          help='Number of seconds to sleep between two batches')
+    @args('--checkpoint', metavar='<path>',
+          help='File to save the archiving progress to, and to resume an '
+               'interrupted archiving from')
+    def archive_deleted_rows(self, max_rows, batch_size=None, sleep=None,
+                             checkpoint=None):
         """Move up to max_rows deleted rows from production tables to shadow
         tables.
         """
@@ -948,8 +957,30 @@ class DbCommands(object):
             if max_rows < 0:
                 print(_("Must supply a positive value for max_rows"))
                 return(1)
+        if batch_size is not None:
+            batch_size = int(batch_size)
+            if batch_size <= 0:
+                print(_("Must supply a positive value for batch_size"))
+                return(1)
+        sleep = float(sleep) if sleep is not None else 0
+        progress = {}
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                progress = jsonutils.load(f)
         admin_context = context.get_admin_context()
-        db.archive_deleted_rows(admin_context, max_rows)
+        try:
+            table_stats = db.archive_deleted_rows(
+                admin_context, max_rows, batch_size=batch_size,
+                throttle=sleep, checkpoint=progress)
+        finally:
+            if checkpoint is not None:
+                with open(checkpoint, 'w') as f:
+                    jsonutils.dump(progress, f)
+        for tablename, (rows, elapsed) in sorted(six.iteritems(table_stats)):
+            print(_("%(table)s: %(rows)d rows archived in %(elapsed).2f "
+                    "seconds (%(rate).1f rows/sec)") %
+                  {'table': tablename, 'rows': rows, 'elapsed': elapsed,
+                   'rate': rows / elapsed if elapsed else float(rows)})
 
     @args('--delete', action='store_true', dest='delete',
           help='If specified, automatically delete any records found where '
@@ -3280,6 +3280,23 @@ class API(base.Base):
         """Get all migrations for the given filters."""
         return objects.MigrationList.get_by_filters(context, filters)
 
+    def get_migrations_in_batches(self, context, filters, batch_size):
+        """Get all migrations for the given filters, lazily.
+
+        Returns a generator of the migrations which reads them from the
+        database batch_size at a time, as the previous ones are consumed.
+        """
+        marker = None
+        while True:
+            db_migrations = self.db.migration_get_all_by_filters(
+                context, filters, limit=batch_size, marker=marker)
+            for db_migration in db_migrations:
+                yield objects.Migration._from_db_object(
+                    context, objects.Migration(), db_migration)
+            if len(db_migrations) < batch_size:
+                break
+            marker = db_migrations[-1]['id']
+
     @wrap_check_policy
     def volume_snapshot_create(self, context, volume_id, create_info):
         bdm = objects.BlockDeviceMapping.get_by_volume_id(
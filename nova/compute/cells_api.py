@@ -473,6 +473,12 @@ class ComputeCellsAPI(compute_api.API):
     def get_migrations(self, context, filters):
         return self.cells_rpcapi.get_migrations(context, filters)
 
+    def get_migrations_in_batches(self, context, filters, batch_size):
+        # The cells RPC API returns the migrations of the child cells all
+        # at once, they cannot be read in batches.
+        for migration in self.get_migrations(context, filters):
+            yield migration
+
 
 class HostAPI(compute_api.HostAPI):
     """HostAPI() class for cells.
@@ -148,6 +148,13 @@ interval_opts = [
                default=60,
                help="Number of seconds between instance network information "
                     "cache updates"),
+    cfg.BoolOpt("heal_instance_info_cache_host_wide",
+                default=False,
+                help="Refresh the network information cache of all the "
+                     "instances of the host on every update, rather than "
+                     "the cache of a single instance. This requires a "
+                     "network API able to refresh many instances at once, "
+                     "such as neutron's."),
     cfg.IntOpt('reclaim_instance_interval',
                default=0,
                help='Interval in seconds for reclaiming deleted instances'),
@@ -5199,6 +5206,46 @@ class ComputeManager(manager.Manager):
                         context, instance, "live_migration.rollback.dest.end",
                         network_info=network_info)
 
+    def _heal_host_instances_info_cache(self, context):
+        """Update the info_cache's network information for all the instances
+        of the host at once.
+
+        Returns False if the network API is not able to do it, in which case
+        the caches should be updated one instance at a time instead.
+        """
+        LOG.debug('Starting heal of all instances info cache')
+        db_instances = objects.InstanceList.get_by_host(
+            context, self.host, expected_attrs=['info_cache'], use_slave=True)
+        instances = []
+        for inst in db_instances:
+            # We don't want to refresh the cache for instances which are
+            # building or deleting.
+            if (inst.vm_state == vm_states.BUILDING or
+                    inst.task_state == task_states.DELETING):
+                continue
+            instances.append(inst)
+
+        if not instances:
+            LOG.debug("Didn't find any instances for network info cache "
+                      "update.")
+            return True
+
+        try:
+            updated = self.network_api.refresh_instances_nw_info(context,
+                                                                 instances)
+        except NotImplementedError:
+            LOG.debug('The network API does not support refreshing the '
+                      'network info cache of many instances at once')
+            return False
+        except Exception:
+            LOG.error(_LE('An error occurred while refreshing the network '
+                          'cache.'), exc_info=True)
+            return True
+        LOG.debug('Updated the network info_cache of %(updated)d out of '
+                  '%(total)d instances',
+                  {'updated': len(updated), 'total': len(instances)})
+        return True
+
     @periodic_task.periodic_task(
         spacing=CONF.heal_instance_info_cache_interval)
     def _heal_instance_info_cache(self, context):
@@ -5216,6 +5263,10 @@ class ComputeManager(manager.Manager):
         if not heal_interval:
             return
 
+        if (CONF.heal_instance_info_cache_host_wide and
+                self._heal_host_instances_info_cache(context)):
+            return
+
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
         instance = None
 
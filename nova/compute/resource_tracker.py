@@ -18,12 +18,14 @@ Track resources like memory and disk for a compute host.  Provides the
 scheduler with useful information about availability through the ComputeNode
 model.
 """
-import copy
+import hashlib
 
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
+from oslo_utils import encodeutils
 from oslo_utils import importutils
+from oslo_utils import timeutils
 
 from nova.compute import claims
 from nova.compute import monitors
@@ -54,6 +56,12 @@ resource_tracker_opts = [
     cfg.ListOpt('compute_resources',
                 default=['vcpu'],
                 help='The names of the extra resources to track.'),
+    cfg.IntOpt('compute_node_update_max_quiet_interval',
+               default=600,
+               help='Maximum number of seconds between two updates of the '
+                    'compute node record when its resources do not change. '
+                    'Unchanged resources are not written more often than '
+                    'this; set to 0 to never write unchanged resources.'),
 ]
 
 CONF = cfg.CONF
@@ -85,7 +93,11 @@ class ResourceTracker(object):
         self.monitors = monitor_handler.choose_monitors(self)
         self.ext_resources_handler = \
             ext_resources.ResourceHandler(CONF.compute_resources)
-        self.old_resources = {}
+        # Digest of the last resources written and when they were written
+        self.old_resources_digest = None
+        self.old_resources_written_at = None
+        # Number of updates written to and skipped since the tracker started
+        self.update_counts = {'written': 0, 'skipped': 0}
         self.scheduler_client = scheduler_client.SchedulerClient()
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
@@ -607,23 +619,50 @@ class ResourceTracker(object):
                   'used_vcpus': ucpu,
                   'pci_stats': pci_device_pools})
 
+    @staticmethod
+    def _resources_digest(resources):
+        """Return a stable digest of the resources reported for the node."""
+        view = {key: obj_base.obj_to_primitive(value)
+                for key, value in resources.items() if key != 'service'}
+        serialized = jsonutils.dumps(view, sort_keys=True)
+        return hashlib.sha1(encodeutils.safe_encode(serialized)).hexdigest()
+
     def _resource_change(self):
-        """Check to see if any resouces have changed."""
-        if cmp(self.compute_node, self.old_resources) != 0:
-            self.old_resources = copy.deepcopy(self.compute_node)
-            return True
-        return False
+        """Check to see if any resouces have changed.
+
+        Unchanged resources are still reported as changed once
+        compute_node_update_max_quiet_interval seconds went by since they
+        were last written, so that the compute node record keeps being
+        refreshed.
+        """
+        digest = self._resources_digest(self.compute_node)
+        quiet_interval = CONF.compute_node_update_max_quiet_interval
+        if (digest == self.old_resources_digest and
+                (quiet_interval <= 0 or not timeutils.is_older_than(
+                    self.old_resources_written_at, quiet_interval))):
+            self.update_counts['skipped'] += 1
+            return False
+        self.old_resources_digest = digest
+        self.old_resources_written_at = timeutils.utcnow()
+        self.update_counts['written'] += 1
+        return True
 
     def _update(self, context):
         """Update partial stats locally and populate them to Scheduler."""
         self._write_ext_resources(self.compute_node)
+        changed = self._resource_change()
         # NOTE(pmurray): the stats field is stored as a json string. The
         # json conversion will be done automatically by the ComputeNode object
         # so this can be removed when using ComputeNode.
         self.compute_node['stats'] = jsonutils.dumps(
             self.compute_node['stats'])
 
-        if not self._resource_change():
+        if not changed:
+            LOG.debug("Compute node resources unchanged for %(host)s:%(node)s,"
+                      " skipping update (%(written)d written, %(skipped)d "
+                      "skipped)",
+                      dict(self.update_counts, host=self.host,
+                           node=self.nodename))
             return
         if "service" in self.compute_node:
             del self.compute_node['service']
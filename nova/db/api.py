@@ -209,6 +209,31 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+def compute_node_get_all_changed_since(context, since):
+    """Get all computeNodes created or updated since a given time.
+
+    :param context: The security context
+    :param since: Datetime; only nodes created or updated at or after this
+                  time are returned
+
+    :returns: List of dictionaries each containing compute node properties
+    """
+    return IMPL.compute_node_get_all_changed_since(context, since)
+
+
+def compute_node_get_all_columns(context, columns, since=None):
+    """Get only some columns of all computeNodes.
+
+    :param context: The security context
+    :param columns: List of the names of the columns to get
+    :param since: Optional datetime; if set, only nodes created or updated at
+                  or after this time are returned
+
+    :returns: List of dictionaries keyed by the requested column names
+    """
+    return IMPL.compute_node_get_all_columns(context, columns, since=since)
+
+
 def compute_node_get_all_by_host(context, host, use_slave=False):
     """Get compute nodes by host name
 
@@ -479,9 +504,15 @@ def migration_get_in_progress_by_host_and_node(context, host, node):
     return IMPL.migration_get_in_progress_by_host_and_node(context, host, node)
 
 
-def migration_get_all_by_filters(context, filters):
-    """Finds all migrations in progress."""
-    return IMPL.migration_get_all_by_filters(context, filters)
+def migration_get_all_by_filters(context, filters, limit=None, marker=None):
+    """Finds all migrations in progress.
+
+    When a limit or a marker is given, the migrations are sorted by id and
+    only the limit first ones with an id greater than the marker are
+    returned.
+    """
+    return IMPL.migration_get_all_by_filters(context, filters, limit=limit,
+                                             marker=marker)
 
 
 ####################
@@ -509,6 +540,18 @@ def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
                                         instance_uuid, host)
 
 
+def fixed_ip_bulk_associate_pool(context, network_ids, instance_uuid,
+                                 host=None):
+    """Find a free ip in each network and associate them to instance.
+
+    All the ips are associated in one transaction, they are returned in
+    the order of the networks. Raises if one is not available.
+
+    """
+    return IMPL.fixed_ip_bulk_associate_pool(context, network_ids,
+                                             instance_uuid, host)
+
+
 def fixed_ip_create(context, values):
     """Create a fixed ip from the values dictionary."""
     return IMPL.fixed_ip_create(context, values)
@@ -524,6 +567,11 @@ def fixed_ip_disassociate(context, address):
     return IMPL.fixed_ip_disassociate(context, address)
 
 
+def fixed_ip_bulk_disassociate(context, instance_uuid, addresses):
+    """Disassociate the fixed ips of an instance by address at once."""
+    return IMPL.fixed_ip_bulk_disassociate(context, instance_uuid, addresses)
+
+
 def fixed_ip_disassociate_all_by_timeout(context, host, time):
     """Disassociate old fixed ips from host."""
     return IMPL.fixed_ip_disassociate_all_by_timeout(context, host, time)
@@ -699,6 +747,16 @@ def instance_get_active_by_window_joined(context, begin, end=None,
                                               columns_to_join=columns_to_join)
 
 
+def instance_get_usage_totals_by_window(context, begin, end, project_id=None,
+                                        use_slave=False):
+    """Get the usage totals of the instances of each project active during
+    a certain time window.
+    """
+    return IMPL.instance_get_usage_totals_by_window(context, begin, end,
+                                                    project_id=project_id,
+                                                    use_slave=use_slave)
+
+
 def instance_get_all_by_host(context, host,
                              columns_to_join=None, use_slave=False):
     """Get all instances belonging to a host."""
@@ -1191,6 +1249,13 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid,
                                                          use_slave)
 
 
+def block_device_mapping_get_all_by_instance_uuids(context, instance_uuids,
+                                                   use_slave=False):
+    """Get all block device mappings belonging to a list of instances."""
+    return IMPL.block_device_mapping_get_all_by_instance_uuids(
+        context, instance_uuids, use_slave)
+
+
 def block_device_mapping_get_by_volume_id(context, volume_id,
         columns_to_join=None):
     """Get block device mapping for a given volume."""
@@ -1888,23 +1953,33 @@ def task_log_get(context, task_name, period_beginning,
 ####################
 
 
-def archive_deleted_rows(context, max_rows=None):
+def archive_deleted_rows(context, max_rows=None, batch_size=None,
+                         throttle=0, checkpoint=None):
     """Move up to max_rows rows from production tables to corresponding shadow
     tables.
 
-    :returns: number of rows archived.
+    :param batch_size: number of rows archived at a time from a table
+    :param throttle: number of seconds to sleep between two batches
+    :param checkpoint: optional dict of {tablename: last archived key},
+                       updated to resume an interrupted archiving
+    :returns: dict of {tablename: (rows archived, seconds spent)}.
     """
-    return IMPL.archive_deleted_rows(context, max_rows=max_rows)
+    return IMPL.archive_deleted_rows(context, max_rows=max_rows,
+                                     batch_size=batch_size,
+                                     throttle=throttle,
+                                     checkpoint=checkpoint)
 
 
-def archive_deleted_rows_for_table(context, tablename, max_rows=None):
+def archive_deleted_rows_for_table(context, tablename, max_rows=None,
+                                   batch_size=None):
     """Move up to max_rows rows from tablename to corresponding shadow
-    table.
+    table, batch_size rows at a time.
 
     :returns: number of rows archived.
     """
     return IMPL.archive_deleted_rows_for_table(context, tablename,
-                                               max_rows=max_rows)
+                                               max_rows=max_rows,
+                                               batch_size=batch_size)
 
 
 def migrate_flavor_data(context, max_count, flavor_cache, force=False):
@@ -21,8 +21,10 @@ import collections
 import copy
 import datetime
 import functools
+import random
 import sys
 import threading
+import time
 import uuid
 
 from oslo_config import cfg
@@ -39,7 +41,10 @@ import six
 from six.moves import range
 from sqlalchemy import and_
 from sqlalchemy import Boolean
+from sqlalchemy import DateTime
 from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy import Float
 from sqlalchemy import Integer
 from sqlalchemy import MetaData
 from sqlalchemy import or_
@@ -67,6 +72,7 @@ from nova.db.sqlalchemy import models
 from nova import exception
 from nova.i18n import _, _LI, _LE, _LW
 from nova import quota
+from nova import utils
 
 db_opts = [
     cfg.StrOpt('osapi_compute_unique_server_name_scope',
@@ -193,6 +199,10 @@ def get_api_session(**kwargs):
 
 
 _SHADOW_TABLE_PREFIX = 'shadow_'
+# Default number of rows archived at a time from a table
+ARCHIVE_BATCH_SIZE = 1000
+# The number of extra free fixed ips a pool allocation picks from
+FIXED_IP_POOL_SPREAD = 16
 _DEFAULT_QUOTA_NAME = 'default'
 PER_PROJECT_QUOTAS = ['fixed_ips', 'floating_ips', 'networks']
 
@@ -606,6 +616,24 @@ def compute_node_get_all(context):
     return model_query(context, models.ComputeNode, read_deleted='no').all()
 
 
+def compute_node_get_all_changed_since(context, since):
+    return model_query(context, models.ComputeNode, read_deleted='no').\
+            filter(or_(models.ComputeNode.updated_at >= since,
+                       models.ComputeNode.created_at >= since)).\
+            all()
+
+
+def compute_node_get_all_columns(context, columns, since=None):
+    query = model_query(context, models.ComputeNode,
+                        args=[getattr(models.ComputeNode, column)
+                              for column in columns],
+                        read_deleted='no')
+    if since is not None:
+        query = query.filter(or_(models.ComputeNode.updated_at >= since,
+                                 models.ComputeNode.created_at >= since))
+    return [dict(zip(columns, row)) for row in query.all()]
+
+
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
     return model_query(context, models.ComputeNode).\
@@ -1157,29 +1185,28 @@ def fixed_ip_associate(context, address, instance_uuid, network_id=None,
     return fixed_ip_ref
 
 
-@require_admin_context
-@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True,
-                           retry_on_request=True)
-def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
-                            host=None):
-    if instance_uuid and not uuidutils.is_uuid_like(instance_uuid):
-        raise exception.InvalidUUID(uuid=instance_uuid)
+def _fixed_ip_associate_pool(context, network_id, instance_uuid, host,
+                             session):
+    network_or_none = or_(models.FixedIp.network_id == network_id,
+                          models.FixedIp.network_id == null())
+    candidates = model_query(context, models.FixedIp, session=session,
+                             read_deleted="no").\
+                         filter(network_or_none).\
+                         filter_by(reserved=False).\
+                         filter_by(instance_uuid=None).\
+                         filter_by(host=None).\
+                         limit(FIXED_IP_POOL_SPREAD + 1).\
+                         all()
 
-    session = get_session()
-    with session.begin():
-        network_or_none = or_(models.FixedIp.network_id == network_id,
-                              models.FixedIp.network_id == null())
-        fixed_ip_ref = model_query(context, models.FixedIp, session=session,
-                                   read_deleted="no").\
-                               filter(network_or_none).\
-                               filter_by(reserved=False).\
-                               filter_by(instance_uuid=None).\
-                               filter_by(host=None).\
-                               first()
+    if not candidates:
+        raise exception.NoMoreFixedIps(net=network_id)
 
-        if not fixed_ip_ref:
-            raise exception.NoMoreFixedIps(net=network_id)
+    # Concurrent allocations on the same network would all pick the first
+    # free address and all but one of them would have to retry, so spread
+    # them over the first free ones.
+    random.shuffle(candidates)
 
+    for fixed_ip_ref in candidates:
         params = {}
         if fixed_ip_ref['network_id'] is None:
             params['network_id'] = network_id
@@ -1188,8 +1215,8 @@ def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
         if host:
             params['host'] = host
 
-        rows_updated = model_query(context, models.FixedIp, session=session,
-                                   read_deleted="no").\
+        rows_updated = model_query(context, models.FixedIp,
+                                   session=session, read_deleted="no").\
             filter_by(id=fixed_ip_ref['id']).\
             filter_by(network_id=fixed_ip_ref['network_id']).\
             filter_by(reserved=False).\
@@ -1197,14 +1224,44 @@ def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
             filter_by(host=None).\
             filter_by(address=fixed_ip_ref['address']).\
             update(params, synchronize_session='evaluate')
+        if rows_updated:
+            return fixed_ip_ref
 
-        if not rows_updated:
-            LOG.debug('The row was updated in a concurrent transaction, '
-                      'we will fetch another row')
-            raise db_exc.RetryRequest(
-                exception.FixedIpAssociateFailed(net=network_id))
+    LOG.debug('The rows were updated in concurrent transactions, '
+              'we will fetch other rows')
+    raise db_exc.RetryRequest(
+        exception.FixedIpAssociateFailed(net=network_id))
 
-    return fixed_ip_ref
+
+@require_admin_context
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True,
+                           retry_on_request=True)
+def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
+                            host=None):
+    if instance_uuid and not uuidutils.is_uuid_like(instance_uuid):
+        raise exception.InvalidUUID(uuid=instance_uuid)
+
+    session = get_session()
+    with session.begin():
+        return _fixed_ip_associate_pool(context, network_id, instance_uuid,
+                                        host, session)
+
+
+@require_admin_context
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True,
+                           retry_on_request=True)
+def fixed_ip_bulk_associate_pool(context, network_ids, instance_uuid,
+                                 host=None):
+    if not uuidutils.is_uuid_like(instance_uuid):
+        raise exception.InvalidUUID(uuid=instance_uuid)
+
+    session = get_session()
+    with session.begin():
+        # A network listed twice gets two fixed ips, the rows claimed
+        # earlier in the transaction are not free anymore.
+        return [_fixed_ip_associate_pool(context, network_id, instance_uuid,
+                                         host, session)
+                for network_id in network_ids]
 
 
 @require_context
@@ -1238,6 +1295,18 @@ def fixed_ip_disassociate(context, address):
                                          'virtual_interface_id': None})
 
 
+@require_context
+def fixed_ip_bulk_disassociate(context, instance_uuid, addresses):
+    if not addresses:
+        return
+    model_query(context, models.FixedIp, read_deleted="no").\
+            filter_by(instance_uuid=instance_uuid).\
+            filter(models.FixedIp.address.in_(addresses)).\
+            update({'instance_uuid': None,
+                    'virtual_interface_id': None},
+                   synchronize_session=False)
+
+
 def fixed_ip_disassociate_all_by_timeout(context, host, time):
     session = get_session()
     # NOTE(vish): only update fixed ips that "belong" to this
@@ -2060,22 +2129,19 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     query_prefix = _tag_instance_filter(context, query_prefix, filters)
 
     # paginate query
+    for sort_key in sort_keys:
+        if not hasattr(models.Instance, sort_key):
+            raise exception.InvalidSortKey()
     if marker is not None:
-        try:
-            if deleted:
-                marker = _instance_get_by_uuid(
-                    context.elevated(read_deleted='yes'), marker,
-                    session=session)
-            else:
-                marker = _instance_get_by_uuid(context,
-                                               marker, session=session)
-        except exception.InstanceNotFound:
-            raise exception.MarkerNotFound(marker)
+        marker_values = _instance_get_marker_values(
+            context.elevated(read_deleted='yes') if deleted else context,
+            session, marker, sort_keys)
+        query_prefix = query_prefix.filter(_keyset_pagination_filter(
+            models.Instance, sort_keys, sort_dirs, marker_values))
     try:
         query_prefix = sqlalchemyutils.paginate_query(query_prefix,
                                models.Instance, limit,
                                sort_keys,
-                               marker=marker,
                                sort_dirs=sort_dirs)
     except db_exc.InvalidSortKey:
         raise exception.InvalidSortKey()
@@ -2083,6 +2149,74 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
 
 
+def _instance_get_marker_values(context, session, marker, sort_keys):
+    """Return the values of the sort keys for a pagination marker.
+
+    The marker is either the uuid of an instance, whose sort key values are
+    then read from the database, or a pagination cursor carrying them.
+    """
+    values = None
+    if not uuidutils.is_uuid_like(marker):
+        try:
+            values = utils.decode_pagination_cursor(marker)
+        except ValueError:
+            pass
+    if values is not None:
+        if all(sort_key in values for sort_key in sort_keys):
+            marker_values = []
+            for sort_key in sort_keys:
+                value = values[sort_key]
+                column_type = getattr(getattr(models.Instance, sort_key),
+                                      'type', None)
+                if value is not None and isinstance(column_type, DateTime):
+                    try:
+                        value = timeutils.normalize_time(
+                            timeutils.parse_isotime(value))
+                    except (TypeError, ValueError):
+                        raise exception.MarkerNotFound(marker)
+                marker_values.append(value)
+            return marker_values
+        # The cursor was made for other sort keys, look the instance up
+        if 'uuid' not in values:
+            raise exception.MarkerNotFound(marker)
+        marker = values['uuid']
+    columns = [getattr(models.Instance, sort_key) for sort_key in sort_keys]
+    result = model_query(context, models.Instance, args=columns,
+                         session=session, project_only=True).\
+        filter_by(uuid=marker).\
+        first()
+    if not result:
+        raise exception.MarkerNotFound(marker)
+    return list(result)
+
+
+def _keyset_pagination_filter(model, sort_keys, sort_dirs, marker_values):
+    """Return the criterion selecting the rows after the marker values.
+
+    Besides the usual "(k1 > v1) OR (k1 == v1 AND k2 > v2) ..." criterion,
+    the range of the first sort key is given on its own so that the database
+    can seek into an index on the sort keys instead of scanning up to the
+    marker.
+    """
+    criteria = []
+    for i, sort_key in enumerate(sort_keys):
+        criterion = [getattr(model, sort_keys[j]) == marker_values[j]
+                     for j in range(i)]
+        column = getattr(model, sort_key)
+        if sort_dirs[i] == 'desc':
+            criterion.append(column < marker_values[i])
+        else:
+            criterion.append(column > marker_values[i])
+        criteria.append(and_(*criterion))
+    keyset = or_(*criteria)
+    if marker_values[0] is None:
+        return keyset
+    first_column = getattr(model, sort_keys[0])
+    if sort_dirs[0] == 'desc':
+        return and_(first_column <= marker_values[0], keyset)
+    return and_(first_column >= marker_values[0], keyset)
+
+
 def _tag_instance_filter(context, query, filters):
     """Applies tag filtering to an Instance query.
 
@@ -2337,6 +2471,68 @@ def instance_get_active_by_window_joined(context, begin, end=None,
     return _instances_fill_metadata(context, query.all(), manual_joins)
 
 
+class _SecondsBetween(sql.expression.FunctionElement):
+    """Number of seconds elapsed between two datetime expressions."""
+    type = Float()
+    name = 'seconds_between'
+
+
+@compiles(_SecondsBetween)
+def _compile_seconds_between(element, compiler, **kw):
+    start, stop = [compiler.process(clause, **kw)
+                   for clause in element.clauses]
+    return '((julianday(%s) - julianday(%s)) * 86400.0)' % (stop, start)
+
+
+@compiles(_SecondsBetween, 'mysql')
+def _compile_seconds_between_mysql(element, compiler, **kw):
+    start, stop = [compiler.process(clause, **kw)
+                   for clause in element.clauses]
+    return '(TIMESTAMPDIFF(MICROSECOND, %s, %s) / 1000000.0)' % (start, stop)
+
+
+@compiles(_SecondsBetween, 'postgresql')
+def _compile_seconds_between_postgresql(element, compiler, **kw):
+    start, stop = [compiler.process(clause, **kw)
+                   for clause in element.clauses]
+    return 'EXTRACT(EPOCH FROM (%s - %s))' % (stop, start)
+
+
+@require_context
+def instance_get_usage_totals_by_window(context, begin, end, project_id=None,
+                                        use_slave=False):
+    """Return the usage totals of the instances of each project that were
+    active during the window.
+    """
+    begin = timeutils.normalize_time(begin)
+    end = timeutils.normalize_time(end)
+    instance = models.Instance
+    # Instances are only charged for the part of the window they ran in
+    start = sql.case([(instance.launched_at > begin, instance.launched_at)],
+                     else_=sql.literal(begin, DateTime))
+    stop = sql.case([(instance.terminated_at < end, instance.terminated_at)],
+                    else_=sql.literal(end, DateTime))
+    hours = _SecondsBetween(start, stop) / 3600.0
+
+    session = get_session(use_slave=use_slave)
+    query = session.query(
+        instance.project_id,
+        func.sum(hours),
+        func.sum(hours * instance.vcpus),
+        func.sum(hours * instance.memory_mb),
+        func.sum(hours * (instance.root_gb + instance.ephemeral_gb)))
+    query = query.filter(or_(instance.terminated_at == null(),
+                             instance.terminated_at > begin))
+    query = query.filter(instance.launched_at < end)
+    if project_id:
+        query = query.filter_by(project_id=project_id)
+    query = query.group_by(instance.project_id)
+
+    keys = ('project_id', 'hours', 'vcpus_hours', 'memory_mb_hours',
+            'local_gb_hours')
+    return [dict(zip(keys, row)) for row in query.all()]
+
+
 def _instance_get_all_query(context, project_only=False,
                             joins=None, use_slave=False):
     if joins is None:
@@ -3911,6 +4107,17 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid,
                  all()
 
 
+@require_context
+def block_device_mapping_get_all_by_instance_uuids(context, instance_uuids,
+                                                   use_slave=False):
+    if not instance_uuids:
+        return []
+    return _block_device_mapping_get_query(context, use_slave=use_slave).\
+                 filter(models.BlockDeviceMapping.instance_uuid.in_(
+                     instance_uuids)).\
+                 all()
+
+
 @require_context
 def block_device_mapping_get_by_volume_id(context, volume_id,
         columns_to_join=None):
@@ -4440,7 +4647,7 @@ def migration_get_in_progress_by_host_and_node(context, host, node):
             all()
 
 
-def migration_get_all_by_filters(context, filters):
+def migration_get_all_by_filters(context, filters, limit=None, marker=None):
     query = model_query(context, models.Migration)
     if "status" in filters:
         query = query.filter(models.Migration.status == filters["status"])
@@ -4457,6 +4664,12 @@ def migration_get_all_by_filters(context, filters):
     if "hidden" in filters:
         hidden = filters["hidden"]
         query = query.filter(models.Migration.hidden == hidden)
+    if limit is not None or marker is not None:
+        query = query.order_by(asc(models.Migration.id))
+        if marker is not None:
+            query = query.filter(models.Migration.id > marker)
+        if limit is not None:
+            query = query.limit(limit)
     return query.all()
 
 
@@ -5928,17 +6141,45 @@ def _get_default_deleted_value(table):
         return None
 
 
-@require_admin_context
-def archive_deleted_rows_for_table(context, tablename, max_rows):
-    """Move up to max_rows rows from one tables to the corresponding
-    shadow table. The context argument is only used for the decorator.
+def _archive_deleted_rows_batch(conn, table, shadow_table, column, marker,
+                                batch_size):
+    """Move the next batch_size deleted rows after marker from table to
+    shadow_table, walking the rows in column order.
 
-    :returns: number of rows archived
+    :returns: list of the column values of the rows archived
+    """
+    deleted_column = table.c.deleted
+    where = deleted_column != deleted_column.default.arg
+    if marker is not None:
+        where = sql.and_(where, column > marker)
+    query = sql.select([column], where).order_by(column).limit(batch_size)
+    keys = [row[0] for row in conn.execute(query)]
+    if not keys:
+        return keys
+    # The rows are selected by key range rather than by listing the keys,
+    # so that the size of the statements does not depend on batch_size and
+    # stays within the bound parameter limits of the database.
+    where = sql.and_(where, column <= keys[-1])
+    columns = [c.name for c in table.c]
+    insert = shadow_table.insert(inline=True).\
+        from_select(columns, sql.select([table], where))
+    delete = table.delete().where(where)
+    # Group the insert and delete in a transaction.
+    with conn.begin():
+        conn.execute(insert)
+        conn.execute(delete)
+    return keys
+
+
+def _archive_deleted_rows_for_table(tablename, max_rows, batch_size,
+                                    throttle, marker):
+    """Move up to max_rows deleted rows from one table to the corresponding
+    shadow table, batch_size rows at a time, starting after marker.
+
+    :returns: tuple of the number of rows archived, the marker to resume
+              from and whether all the deleted rows of the table were
+              archived
     """
-    # NOTE(guochbo): There is a circular import, nova.db.sqlalchemy.utils
-    # imports nova.db.sqlalchemy.api.
-    from nova.db.sqlalchemy import utils as db_utils
-
     engine = get_engine()
     conn = engine.connect()
     metadata = MetaData()
@@ -5955,7 +6196,7 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
         shadow_table = Table(shadow_tablename, metadata, autoload=True)
     except NoSuchTableError:
         # No corresponding shadow table; skip it.
-        return rows_archived
+        return rows_archived, marker, True
 
     if tablename == "dns_domains":
         # We have one table (dns_domains) where the key is called
@@ -5963,59 +6204,90 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
         column = table.c.domain
     else:
         column = table.c.id
-    # NOTE(guochbo): Use DeleteFromSelect to avoid
-    # database's limit of maximum parameter in one SQL statement.
-    deleted_column = table.c.deleted
-    columns = [c.name for c in table.c]
-    insert = shadow_table.insert(inline=True).\
-        from_select(columns,
-                    sql.select([table],
-                               deleted_column != deleted_column.default.arg).
-                    order_by(column).limit(max_rows))
-    query_delete = sql.select([column],
-                          deleted_column != deleted_column.default.arg).\
-                          order_by(column).limit(max_rows)
-
-    delete_statement = db_utils.DeleteFromSelect(table, query_delete, column)
-    try:
-        # Group the insert and delete in a transaction.
-        with conn.begin():
-            conn.execute(insert)
-            result_delete = conn.execute(delete_statement)
-    except db_exc.DBError:
-        # TODO(ekudryashova): replace by DBReferenceError when db layer
-        # raise it.
-        # A foreign key constraint keeps us from deleting some of
-        # these rows until we clean up a dependent table.  Just
-        # skip this table for now; we'll come back to it later.
-        msg = _("IntegrityError detected when archiving table %s") % tablename
-        LOG.warn(msg)
-        return rows_archived
 
-    rows_archived = result_delete.rowcount
+    while max_rows is None or rows_archived < max_rows:
+        if rows_archived and throttle:
+            time.sleep(throttle)
+        limit = batch_size
+        if max_rows is not None:
+            limit = min(limit, max_rows - rows_archived)
+        try:
+            keys = _archive_deleted_rows_batch(conn, table, shadow_table,
+                                               column, marker, limit)
+        except db_exc.DBError:
+            # TODO(ekudryashova): replace by DBReferenceError when db layer
+            # raise it.
+            # A foreign key constraint keeps us from deleting some of
+            # these rows until we clean up a dependent table.  Just
+            # skip this table for now; we'll come back to it later.
+            msg = _("IntegrityError detected when archiving table %s") % \
+                tablename
+            LOG.warn(msg)
+            return rows_archived, marker, False
+        rows_archived += len(keys)
+        if len(keys) < limit:
+            return rows_archived, None, True
+        marker = keys[-1]
+    return rows_archived, marker, False
+
+
+@require_admin_context
+def archive_deleted_rows_for_table(context, tablename, max_rows=None,
+                                   batch_size=None):
+    """Move up to max_rows rows from one tables to the corresponding
+    shadow table. The context argument is only used for the decorator.
 
+    :returns: number of rows archived
+    """
+    rows_archived, _marker, _done = _archive_deleted_rows_for_table(
+        tablename, max_rows, batch_size or ARCHIVE_BATCH_SIZE, 0, None)
     return rows_archived
 
 
 @require_admin_context
-def archive_deleted_rows(context, max_rows=None):
+def archive_deleted_rows(context, max_rows=None, batch_size=None,
+                         throttle=0, checkpoint=None):
     """Move up to max_rows rows from production tables to the corresponding
     shadow tables.
 
-    :returns: Number of rows archived.
+    The tables are archived in foreign key order, dependent tables first,
+    batch_size rows at a time, sleeping throttle seconds between two
+    batches. If a checkpoint dict is given, it is updated with the last
+    archived key of each table not yet fully archived, and the rows are
+    archived from these keys on when it is passed again.
+
+    :returns: dict of {tablename: (rows archived, seconds spent)} for the
+              tables rows were archived from
     """
     # The context argument is only used for the decorator.
-    tablenames = []
-    for model_class in six.itervalues(models.__dict__):
-        if hasattr(model_class, "__tablename__"):
-            tablenames.append(model_class.__tablename__)
+    if checkpoint is None:
+        checkpoint = {}
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    table_stats = {}
     rows_archived = 0
-    for tablename in tablenames:
-        rows_archived += archive_deleted_rows_for_table(context, tablename,
-                                         max_rows=max_rows - rows_archived)
-        if rows_archived >= max_rows:
+    for table in reversed(models.BASE.metadata.sorted_tables):
+        if max_rows is not None and rows_archived >= max_rows:
             break
-    return rows_archived
+        tablename = table.name
+        start = time.time()
+        rows, marker, done = _archive_deleted_rows_for_table(
+            tablename,
+            None if max_rows is None else max_rows - rows_archived,
+            batch_size, throttle, checkpoint.get(tablename))
+        if done:
+            checkpoint.pop(tablename, None)
+        elif marker is not None:
+            checkpoint[tablename] = marker
+        if not rows:
+            continue
+        elapsed = time.time() - start
+        table_stats[tablename] = (rows, elapsed)
+        LOG.info(_LI("Archived %(rows)d rows from %(table)s in %(elapsed).2f "
+                     "seconds (%(rate).1f rows/sec)"),
+                 {'rows': rows, 'table': tablename, 'elapsed': elapsed,
+                  'rate': rows / elapsed if elapsed else float(rows)})
+        rows_archived += rows
+    return table_stats
 
 
 def _augment_flavor_to_migrate(flavor_to_migrate, full_flavor):
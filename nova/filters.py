@@ -48,6 +48,11 @@ class BaseFilter(object):
     # for each request rather than for each instance
     run_filter_once_per_request = False
 
+    # Set to true in a subclass if whether an object passes the filter can
+    # change when other objects are selected within a request (e.g. because
+    # the filter depends on the hosts already selected for a server group)
+    depends_on_selection = False
+
     def run_filter_for_index(self, index):
         """Return True if the filter needs to be run for the "index-th"
         instance in a request.  Only need to override this if a filter
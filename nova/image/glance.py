@@ -25,6 +25,9 @@ import time
 
 import glanceclient
 import glanceclient.exc
+from keystoneclient import auth
+from keystoneclient import session
+from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
@@ -34,6 +37,7 @@ import six
 from six.moves import range
 import six.moves.urllib.parse as urlparse
 
+from nova import context as nova_context
 from nova import exception
 from nova.i18n import _, _LE
 import nova.image.download as image_xfers
@@ -77,6 +81,21 @@ CONF.import_opt('auth_strategy', 'nova.api.auth')
 CONF.import_opt('my_ip', 'nova.netconf')
 CONF.import_group('ssl', 'nova.openstack.common.sslutils')
 
+# The credentials of the admin context returned by get_admin_context()
+session.Session.register_conf_options(CONF, 'glance')
+auth.register_conf_options(CONF, 'glance')
+
+_SESSION = None
+_ADMIN_AUTH = None
+
+
+def reset_state():
+    global _ADMIN_AUTH
+    global _SESSION
+
+    _ADMIN_AUTH = None
+    _SESSION = None
+
 
 def generate_glance_url():
     """Generate the URL to glance."""
@@ -119,6 +138,39 @@ def generate_identity_headers(context, status='Confirmed'):
     }
 
 
+def get_admin_context():
+    """Return an admin context that can be used to talk to glance.
+
+    Unlike nova.context.get_admin_context(), the context carries the token
+    of the credentials of the auth plugin configured in the [glance]
+    section, for the requests made outside of any user request. Without an
+    auth plugin, a plain admin context is returned, which is only enough
+    when glance does not authenticate the requests.
+    """
+    global _ADMIN_AUTH
+    global _SESSION
+
+    if not _ADMIN_AUTH:
+        _ADMIN_AUTH = auth.load_from_conf_options(CONF, 'glance')
+        if not _ADMIN_AUTH:
+            return nova_context.get_admin_context()
+
+    if not _SESSION:
+        _SESSION = session.Session.load_from_conf_options(CONF, 'glance')
+
+    # The auth plugin authenticates on demand and is not thread safe
+    with lockutils.lock('glance_admin_auth_token_lock'):
+        auth_token = _ADMIN_AUTH.get_token(_SESSION)
+        user_id = _ADMIN_AUTH.get_user_id(_SESSION)
+        project_id = _ADMIN_AUTH.get_project_id(_SESSION)
+
+    return nova_context.RequestContext(user_id=user_id,
+                                       project_id=project_id,
+                                       is_admin=True,
+                                       auth_token=auth_token,
+                                       overwrite=False)
+
+
 def _create_glance_client(context, host, port, use_ssl, version=1):
     """Instantiate a new glanceclient.Client object."""
     params = {}
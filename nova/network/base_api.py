@@ -20,6 +20,7 @@ from oslo_concurrency import lockutils
 from oslo_log import log as logging
 from oslo_utils import excutils
 
+from nova.api.metadata import cache as metadata_cache
 from nova.db import base
 from nova import hooks
 from nova.i18n import _, _LE
@@ -48,6 +49,7 @@ def update_instance_cache_with_nw_info(impl, context, instance,
         ic = objects.InstanceInfoCache.new(context, instance.uuid)
         ic.network_info = nw_info
         ic.save(update_cells=update_cells)
+        metadata_cache.invalidate(instance.uuid)
     except Exception:
         with excutils.save_and_reraise_exception():
             LOG.exception(_LE('Failed storing info cache'), instance=instance)
@@ -240,6 +242,13 @@ class NetworkAPI(base.Base):
         """Returns all network info related to an instance."""
         raise NotImplementedError()
 
+    def refresh_instances_nw_info(self, context, instances):
+        """Refresh the network info cache of several instances at once.
+
+        Returns the list of instances whose cache was updated.
+        """
+        raise NotImplementedError()
+
     def create_pci_requests_for_sriov_ports(self, context,
                                             pci_requests,
                                             requested_networks):
@@ -168,6 +168,7 @@ class RPCAllocateFixedIP(object):
             for request in requested_networks:
                 addresses_by_network[request.network_id] = request.address
 
+        local_allocations = []
         for network in networks:
             if 'uuid' in network and network['uuid'] in addresses_by_network:
                 address = addresses_by_network[network['uuid']]
@@ -190,8 +191,10 @@ class RPCAllocateFixedIP(object):
                         host))
             else:
                 # i am the correct host, run here
-                self.allocate_fixed_ip(context, instance_id, network,
-                                       vpn=vpn, address=address)
+                local_allocations.append((network, address))
+
+        self._allocate_local_fixed_ips(context, instance_id,
+                                       local_allocations, vpn=vpn)
 
         # wait for all of the allocates (if any) to finish
         for gt in green_threads:
@@ -558,9 +561,7 @@ class NetworkManager(manager.Manager):
         LOG.debug("Network deallocation for instance",
                   context=context, instance_uuid=instance_uuid)
         # deallocate fixed ips
-        for fixed_ip in fixed_ips:
-            self.deallocate_fixed_ip(context, fixed_ip, host=host,
-                    instance=instance)
+        self._deallocate_fixed_ips(context, fixed_ips, host, instance)
 
         if CONF.update_dns_entries:
             self.network_rpcapi.update_dns(context, list(network_ids))
@@ -571,6 +572,12 @@ class NetworkManager(manager.Manager):
         LOG.info(_LI("Network deallocated for instance (fixed ips: '%s')"),
                  fixed_ips, context=context, instance_uuid=instance_uuid)
 
+    def _deallocate_fixed_ips(self, context, addresses, host, instance):
+        """Calls deallocate_fixed_ip for each of the addresses."""
+        for address in addresses:
+            self.deallocate_fixed_ip(context, address, host=host,
+                    instance=instance)
+
     @messaging.expected_exceptions(exception.InstanceNotFound)
     def get_instance_nw_info(self, context, instance_id, rxtx_factor,
                              host, instance_uuid=None, **kwargs):
@@ -899,7 +906,14 @@ class NetworkManager(manager.Manager):
                         instance_id, network['id'])
 
                 address = kwargs.get('address', None)
-                if address:
+                fip = kwargs.get('fixed_ip')
+                if fip is not None:
+                    address = str(fip.address)
+                    LOG.debug('Instance already associated with fixed IP '
+                              '%(address)s from pool in network %(network)s.',
+                              {'address': address, 'network': network['id']},
+                              instance=instance)
+                elif address:
                     LOG.debug('Associating instance with specified fixed IP '
                               '%(address)s in network %(network)s on subnet '
                               '%(cidr)s.' %
@@ -1491,6 +1505,42 @@ class NetworkManager(manager.Manager):
         """Calls allocate_fixed_ip once for each network."""
         raise NotImplementedError()
 
+    def _allocate_local_fixed_ips(self, context, instance_id, allocations,
+                                  **kwargs):
+        """Calls allocate_fixed_ip for each (network, address) pair.
+
+        When the fixed ips of several networks are taken from their pools,
+        the instance is associated with them in a single transaction first,
+        rather than in one transaction per network.
+        """
+        pending = []
+        if not kwargs.get('vpn'):
+            network_ids = [network['id'] for network, address in allocations
+                           if not address and network['cidr']]
+            if len(network_ids) > 1:
+                LOG.debug('Associating instance with fixed IPs from pools in '
+                          'networks %s', network_ids,
+                          instance_uuid=instance_id)
+                pending = list(objects.FixedIPList.bulk_associate_pool(
+                    context, network_ids, instance_id))
+
+        try:
+            for network, address in allocations:
+                if pending and not address and network['cidr']:
+                    self.allocate_fixed_ip(context, instance_id, network,
+                                           fixed_ip=pending[0], **kwargs)
+                    pending.pop(0)
+                else:
+                    self.allocate_fixed_ip(context, instance_id, network,
+                                           address=address, **kwargs)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                # Give back the fixed ips which have not been allocated yet
+                if pending:
+                    objects.FixedIPList.bulk_disassociate(
+                        context, instance_id,
+                        [fixed_ip.address for fixed_ip in pending])
+
     def setup_networks_on_host(self, context, instance_id, host,
                                teardown=False):
         """calls setup/teardown on network hosts for an instance."""
@@ -1726,13 +1776,14 @@ class FlatManager(NetworkManager):
         if requested_networks is not None:
             for request in requested_networks:
                 addresses_by_network[request.network_id] = request.address
+        allocations = []
         for network in networks:
             if network['uuid'] in addresses_by_network:
                 address = addresses_by_network[network['uuid']]
             else:
                 address = None
-            self.allocate_fixed_ip(context, instance_id,
-                                   network, address=address)
+            allocations.append((network, address))
+        self._allocate_local_fixed_ips(context, instance_id, allocations)
 
     def deallocate_fixed_ip(self, context, address, host=None, teardown=True,
             instance=None):
@@ -1742,6 +1793,15 @@ class FlatManager(NetworkManager):
                                                      instance=instance)
         objects.FixedIP.disassociate_by_address(context, address)
 
+    def _deallocate_fixed_ips(self, context, addresses, host, instance):
+        """Returns the fixed ips of an instance to the pool at once."""
+        for address in addresses:
+            super(FlatManager, self).deallocate_fixed_ip(context, address,
+                                                         host,
+                                                         instance=instance)
+        objects.FixedIPList.bulk_disassociate(context, instance.uuid,
+                                              addresses)
+
     def _setup_network_on_host(self, context, network):
         """Setup Network on this host."""
         # NOTE(tr3buchet): this does not need to happen on every ip
@@ -1987,11 +2047,14 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                                             reserved=True)
         else:
             address = kwargs.get('address', None)
-            if address:
+            # The fixed ip may already be associated from the pool by
+            # _allocate_local_fixed_ips()
+            fip = kwargs.get('fixed_ip')
+            if fip is None and address:
                 fip = objects.FixedIP.associate(context, str(address),
                                                 instance_id,
                                                 network['id'])
-            else:
+            elif fip is None:
                 fip = objects.FixedIP.associate_pool(context,
                                                      network['id'],
                                                      instance_id)
@@ -27,6 +27,7 @@ from neutronclient.v2_0 import client as clientv20
 from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 from oslo_utils import excutils
 from oslo_utils import uuidutils
 import six
@@ -129,6 +130,9 @@ soft_external_network_attach_authorize = extensions.soft_core_authorizer(
 _SESSION = None
 _ADMIN_AUTH = None
 
+# Maximum number of ids searched for in a single request
+MAX_SEARCH_IDS = 150
+
 
 def reset_state():
     global _ADMIN_AUTH
@@ -886,6 +890,91 @@ class API(base_api.NetworkAPI):
                                                  preexisting_port_ids)
         return network_model.NetworkInfo.hydrate(nw_info)
 
+    def refresh_instances_nw_info(self, context, instances):
+        """Refresh the network info cache of several instances at once.
+
+        The ports of all the instances, along with their networks, floating
+        ips and subnets, are looked up with a few bulk requests and the
+        network info of each instance is rebuilt from them. Only the caches
+        which changed are written back.
+
+        :returns: the list of instances whose cache was updated.
+        """
+        client = get_client(context, admin=True)
+
+        # Only the ports of the instances' projects are taken into account,
+        # as when refreshing the cache of a single instance.
+        project_ids = {instance.uuid: instance.project_id
+                       for instance in instances}
+        instance_ports = {}
+        for ids in _chunk_by_ids([instance.uuid for instance in instances]):
+            data = client.list_ports(device_id=ids)
+            for port in data.get('ports', []):
+                if port['tenant_id'] == project_ids.get(port['device_id']):
+                    instance_ports.setdefault(port['device_id'],
+                                              []).append(port)
+
+        # The networks of the ports actually found are looked up along with
+        # the cached ones, so that an instance with an empty or stale cache
+        # is not rebuilt without its networks.
+        net_ids = []
+        for instance in instances:
+            for iface in compute_utils.get_nw_info_for_instance(instance):
+                if iface['network']['id'] not in net_ids:
+                    net_ids.append(iface['network']['id'])
+            for port in instance_ports.get(instance.uuid, []):
+                if port['network_id'] not in net_ids:
+                    net_ids.append(port['network_id'])
+        networks = []
+        for ids in _chunk_by_ids(net_ids):
+            networks += self._get_available_networks(context, None, ids)
+
+        addressed_ports = [port for ports in instance_ports.values()
+                           for port in ports if port.get('fixed_ips')]
+        floatingips = self._get_floating_ips_by_ports(
+            client, [port['id'] for port in addressed_ports])
+        ipam_subnets = {}
+        subnet_ids = _unique_subnet_ids(addressed_ports)
+        if subnet_ids:
+            ipam_subnets = self._get_ipam_subnets(get_client(context),
+                                                  subnet_ids)
+
+        updated = []
+        for instance in instances:
+            current_neutron_ports = instance_ports.get(instance.uuid, [])
+            cached_nw_info = compute_utils.get_nw_info_for_instance(instance)
+            port_ids = [iface['id'] for iface in cached_nw_info]
+            try:
+                with lockutils.lock('refresh_cache-%s' % instance.uuid):
+                    # The ports were fetched without holding the lock, so
+                    # leave the cache alone if it changed in the meantime,
+                    # it will be healed next time.
+                    cache = objects.InstanceInfoCache.get_by_instance_uuid(
+                        context, instance.uuid)
+                    cached_json = _nw_info_json(cached_nw_info)
+                    if _nw_info_json(cache.network_info) != cached_json:
+                        LOG.debug('Network info cache changed while being '
+                                  'refreshed, skipping it', instance=instance)
+                        continue
+                    nw_info = self._nw_info_build_vifs(
+                        context, client, instance, current_neutron_ports,
+                        networks, port_ids, floatingips=floatingips,
+                        ipam_subnets=ipam_subnets)
+                    nw_info = network_model.NetworkInfo.hydrate(nw_info)
+                    if _nw_info_json(nw_info) == cached_json:
+                        continue
+                    base_api.update_instance_cache_with_nw_info(
+                        self, context, instance, nw_info=nw_info,
+                        update_cells=False)
+                    updated.append(instance)
+            except exception.InstanceInfoCacheNotFound:
+                LOG.debug('Instance no longer exists. Unable to refresh',
+                          instance=instance)
+            except Exception:
+                LOG.exception(_LE('An error occurred while refreshing the '
+                                  'network cache.'), instance=instance)
+        return updated
+
     def _gather_port_ids_and_networks(self, context, instance, networks=None,
                                       port_ids=None):
         """Return an instance's complete list of port_ids and networks."""
@@ -1424,21 +1513,25 @@ class API(base_api.NetworkAPI):
             raise exception.FloatingIpMultipleFoundForAddress(address=address)
         return fips[0]
 
-    def _get_floating_ips_by_fixed_and_port(self, client, fixed_ip, port):
-        """Get floatingips from fixed ip and port."""
-        try:
-            data = client.list_floatingips(fixed_ip_address=fixed_ip,
-                                           port_id=port)
-        # If a neutron plugin does not implement the L3 API a 404 from
-        # list_floatingips will be raised.
-        except neutron_client_exc.NeutronClientException as e:
-            if e.status_code == 404:
-                return []
-            with excutils.save_and_reraise_exception():
-                LOG.exception(_LE('Unable to access floating IP %(fixed_ip)s '
-                                  'for port %(port_id)s'),
-                              {'fixed_ip': fixed_ip, 'port_id': port})
-        return data['floatingips']
+    def _get_floating_ips_by_ports(self, client, port_ids):
+        """Get floatingips for a list of ports, keyed by port id."""
+        floatingips = {}
+        if not port_ids:
+            return floatingips
+        for ids in _chunk_by_ids(port_ids):
+            try:
+                data = client.list_floatingips(port_id=ids)
+            # If a neutron plugin does not implement the L3 API a 404 from
+            # list_floatingips will be raised.
+            except neutron_client_exc.NeutronClientException as e:
+                if e.status_code == 404:
+                    return floatingips
+                with excutils.save_and_reraise_exception():
+                    LOG.exception(_LE('Unable to access floating IPs for '
+                                      'ports %s'), ids)
+            for fip in data['floatingips']:
+                floatingips.setdefault(fip['port_id'], []).append(fip)
+        return floatingips
 
     def release_floating_ip(self, context, address,
                             affect_auto_assigned=False):
@@ -1502,21 +1595,22 @@ class API(base_api.NetworkAPI):
         """Force add a network to the project."""
         raise NotImplementedError()
 
-    def _nw_info_get_ips(self, client, port):
+    def _nw_info_get_ips(self, port, floatingips):
         network_IPs = []
         for fixed_ip in port['fixed_ips']:
             fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
-            floats = self._get_floating_ips_by_fixed_and_port(
-                client, fixed_ip['ip_address'], port['id'])
-            for ip in floats:
+            for ip in floatingips:
+                if ip['fixed_ip_address'] != fixed_ip['ip_address']:
+                    continue
                 fip = network_model.IP(address=ip['floating_ip_address'],
                                        type='floating')
                 fixed.add_floating_ip(fip)
             network_IPs.append(fixed)
         return network_IPs
 
-    def _nw_info_get_subnets(self, context, port, network_IPs):
-        subnets = self._get_subnets_from_port(context, port)
+    def _nw_info_get_subnets(self, context, port, network_IPs,
+                             ipam_subnets=None):
+        subnets = self._get_subnets_from_port(context, port, ipam_subnets)
         for subnet in subnets:
             subnet['ips'] = [fixed_ip for fixed_ip in network_IPs
                              if fixed_ip.is_in_subnet(subnet)]
@@ -1629,6 +1723,25 @@ class API(base_api.NetworkAPI):
         nw_info_refresh = networks is None and port_ids is None
         networks, port_ids = self._gather_port_ids_and_networks(
                 context, instance, networks, port_ids)
+        return self._nw_info_build_vifs(context, client, instance,
+                                        current_neutron_ports, networks,
+                                        port_ids, preexisting_port_ids,
+                                        nw_info_refresh)
+
+    def _nw_info_build_vifs(self, context, client, instance,
+                            current_neutron_ports, networks, port_ids,
+                            preexisting_port_ids=None, nw_info_refresh=True,
+                            floatingips=None, ipam_subnets=None):
+        """Return list of ordered VIFs built from the ports of an instance.
+
+        :param current_neutron_ports - the ports of the instance in neutron.
+        :param floatingips - floating ips keyed by port id, as returned by
+                             _get_floating_ips_by_ports(). If None, the
+                             floating ips of the ports are looked up.
+        :param ipam_subnets - neutron subnets keyed by id, as returned by
+                              _get_ipam_subnets(). If None, the subnets of
+                              the ports are looked up.
+        """
         nw_info = network_model.NetworkInfo()
 
         if preexisting_port_ids is None:
@@ -1646,6 +1759,23 @@ class API(base_api.NetworkAPI):
         if not port_ids:
             port_ids = current_neutron_port_map.keys()
 
+        # Look up the floating ips and subnets of all the ports in one
+        # go rather than port by port, so that refreshing the cache of an
+        # instance with many ports only costs a few round-trips to neutron.
+        addressed_ports = [current_neutron_port_map[port_id]
+                           for port_id in port_ids
+                           if current_neutron_port_map.get(port_id, {}).get(
+                               'fixed_ips')]
+        if floatingips is None:
+            floatingips = self._get_floating_ips_by_ports(
+                client, [port['id'] for port in addressed_ports])
+        if ipam_subnets is None:
+            ipam_subnets = {}
+            subnet_ids = _unique_subnet_ids(addressed_ports)
+            if subnet_ids:
+                ipam_subnets = self._get_ipam_subnets(get_client(context),
+                                                      subnet_ids)
+
         for port_id in port_ids:
             current_neutron_port = current_neutron_port_map.get(port_id)
             if current_neutron_port:
@@ -1654,11 +1784,12 @@ class API(base_api.NetworkAPI):
                     or current_neutron_port['status'] == 'ACTIVE'):
                     vif_active = True
 
-                network_IPs = self._nw_info_get_ips(client,
-                                                    current_neutron_port)
+                network_IPs = self._nw_info_get_ips(
+                    current_neutron_port, floatingips.get(port_id, []))
                 subnets = self._nw_info_get_subnets(context,
                                                     current_neutron_port,
-                                                    network_IPs)
+                                                    network_IPs,
+                                                    ipam_subnets)
 
                 devname = "tap" + current_neutron_port['id']
                 devname = devname[:network_model.NIC_NAME_LEN]
@@ -1691,39 +1822,66 @@ class API(base_api.NetworkAPI):
 
         return nw_info
 
-    def _get_subnets_from_port(self, context, port):
-        """Return the subnets for a given port."""
+    def _get_ipam_subnets(self, client, subnet_ids):
+        """Return the neutron subnets with the given ids, keyed by id.
 
-        fixed_ips = port['fixed_ips']
+        The address of the DHCP server of each subnet, if any, is stored
+        under the 'dhcp_server' key.
+        """
+        # Since list_subnets(id=[]) returns all subnets visible for the
+        # current tenant, returned subnets may contain subnets which are not
+        # requested. To avoid this, the method returns here.
+        if not subnet_ids:
+            return {}
+        ipam_subnets = {}
+        for ids in _chunk_by_ids(subnet_ids):
+            data = client.list_subnets(id=ids)
+            for subnet in data.get('subnets', []):
+                ipam_subnets[subnet['id']] = dict(subnet)
+        if not ipam_subnets:
+            return ipam_subnets
+
+        # attempt to populate DHCP server field
+        network_ids = sorted(set(subnet['network_id']
+                                 for subnet in ipam_subnets.values()))
+        for ids in _chunk_by_ids(network_ids):
+            data = client.list_ports(network_id=ids,
+                                     device_owner='network:dhcp')
+            for p in data.get('ports', []):
+                for ip_pair in p['fixed_ips']:
+                    subnet = ipam_subnets.get(ip_pair['subnet_id'])
+                    if subnet is not None:
+                        subnet['dhcp_server'] = ip_pair['ip_address']
+        return ipam_subnets
+
+    def _get_subnets_from_port(self, context, port, ipam_subnets=None):
+        """Return the subnets for a given port.
+
+        :param ipam_subnets: neutron subnets keyed by id, as returned by
+                             _get_ipam_subnets(). If not given, the subnets
+                             of the port are looked up in neutron.
+        """
         # No fixed_ips for the port means there is no subnet associated
         # with the network the port is created on.
-        # Since list_subnets(id=[]) returns all subnets visible for the
-        # current tenant, returned subnets may contain subnets which is not
-        # related to the port. To avoid this, the method returns here.
-        if not fixed_ips:
+        subnet_ids = _unique_subnet_ids([port])
+        if not subnet_ids:
             return []
-        search_opts = {'id': [ip['subnet_id'] for ip in fixed_ips]}
-        data = get_client(context).list_subnets(**search_opts)
-        ipam_subnets = data.get('subnets', [])
+        if ipam_subnets is None:
+            ipam_subnets = self._get_ipam_subnets(get_client(context),
+                                                  subnet_ids)
         subnets = []
 
-        for subnet in ipam_subnets:
+        for subnet_id in subnet_ids:
+            subnet = ipam_subnets.get(subnet_id)
+            if subnet is None:
+                continue
             subnet_dict = {'cidr': subnet['cidr'],
                            'gateway': network_model.IP(
                                 address=subnet['gateway_ip'],
                                 type='gateway'),
             }
-
-            # attempt to populate DHCP server field
-            search_opts = {'network_id': subnet['network_id'],
-                           'device_owner': 'network:dhcp'}
-            data = get_client(context).list_ports(**search_opts)
-            dhcp_ports = data.get('ports', [])
-            for p in dhcp_ports:
-                for ip_pair in p['fixed_ips']:
-                    if ip_pair['subnet_id'] == subnet['id']:
-                        subnet_dict['dhcp_server'] = ip_pair['ip_address']
-                        break
+            if 'dhcp_server' in subnet:
+                subnet_dict['dhcp_server'] = subnet['dhcp_server']
 
             subnet_object = network_model.Subnet(**subnet_dict)
             for dns in subnet.get('dns_nameservers', []):
@@ -1812,3 +1970,28 @@ def _ensure_requested_network_ordering(accessor, unordered, preferred):
     """Sort a list with respect to the preferred network ordering."""
     if preferred:
         unordered.sort(key=lambda i: preferred.index(accessor(i)))
+
+
+def _chunk_by_ids(ids, limit=MAX_SEARCH_IDS):
+    """Split a list of ids used as search criteria into smaller lists.
+
+    The search criteria form part of the URL of the request, which has a
+    fixed max size.
+    """
+    for i in range(0, len(ids), limit):
+        yield ids[i:i + limit]
+
+
+def _nw_info_json(nw_info):
+    """Return a comparable primitive form of a network info model."""
+    return jsonutils.loads(jsonutils.dumps(nw_info))
+
+
+def _unique_subnet_ids(ports):
+    """Return the ids of the subnets of the given ports, in order."""
+    subnet_ids = []
+    for port in ports:
+        for fixed_ip in port.get('fixed_ips', []):
+            if fixed_ip['subnet_id'] not in subnet_ids:
+                subnet_ids.append(fixed_ip['subnet_id'])
+    return subnet_ids
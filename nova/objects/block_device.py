@@ -250,7 +250,8 @@ class BlockDeviceMappingList(base.ObjectListBase, base.NovaObject):
     # Version 1.8: BlockDeviceMapping <= version 1.7
     # Version 1.9: BlockDeviceMapping <= version 1.8
     # Version 1.10: BlockDeviceMapping <= version 1.9
-    VERSION = '1.10'
+    # Version 1.11: Added get_by_instance_uuids()
+    VERSION = '1.11'
 
     fields = {
         'objects': fields.ListOfObjectsField('BlockDeviceMapping'),
@@ -267,6 +268,7 @@ class BlockDeviceMappingList(base.ObjectListBase, base.NovaObject):
         '1.8': '1.7',
         '1.9': '1.8',
         '1.10': '1.9',
+        '1.11': '1.9',
     }
 
     @base.remotable_classmethod
@@ -276,6 +278,20 @@ class BlockDeviceMappingList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(
                 context, cls(), objects.BlockDeviceMapping, db_bdms or [])
 
+    @base.remotable_classmethod
+    def get_by_instance_uuids(cls, context, instance_uuids, use_slave=False):
+        db_bdms = db.block_device_mapping_get_all_by_instance_uuids(
+                context, instance_uuids, use_slave=use_slave)
+        return base.obj_make_list(
+                context, cls(), objects.BlockDeviceMapping, db_bdms or [])
+
+    def group_by_instance_uuid(self):
+        """Return a dict of lists of mappings keyed by instance uuid."""
+        bdms_by_uuid = {}
+        for bdm in self:
+            bdms_by_uuid.setdefault(bdm.instance_uuid, []).append(bdm)
+        return bdms_by_uuid
+
     def root_bdm(self):
         try:
             return next(bdm_obj for bdm_obj in self if bdm_obj.is_root)
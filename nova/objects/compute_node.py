@@ -13,6 +13,7 @@
 #    under the License.
 
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 import six
 
 from nova import db
@@ -311,7 +312,8 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
     # Version 1.9 ComputeNode version 1.9
     # Version 1.10 ComputeNode version 1.10
     # Version 1.11 ComputeNode version 1.11
-    VERSION = '1.11'
+    # Version 1.12 Add get_all_changed_since()
+    VERSION = '1.12'
     fields = {
         'objects': fields.ListOfObjectsField('ComputeNode'),
         }
@@ -329,6 +331,7 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         '1.9': '1.9',
         '1.10': '1.10',
         '1.11': '1.11',
+        '1.12': '1.11',
         }
 
     @base.remotable_classmethod
@@ -337,6 +340,25 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @base.remotable_classmethod
+    def _get_all_changed_since(cls, context, since):
+        # NOTE: The timestamp is sent as a string primitive over RPC and
+        # needs to be a timezone-aware datetime again for the DB API call.
+        since = timeutils.parse_isotime(since)
+        db_computes = db.compute_node_get_all_changed_since(context, since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
+    @classmethod
+    def get_all_changed_since(cls, context, since):
+        """Get the compute nodes created or updated since a point in time.
+
+        :param context: nova request context
+        :param since: datetime from which changes are returned
+        :returns: ComputeNodeList
+        """
+        return cls._get_all_changed_since(context, timeutils.isotime(since))
+
     @base.remotable_classmethod
     def get_by_hypervisor(cls, context, hypervisor_match):
         db_computes = db.compute_node_search_by_hypervisor(context,
@@ -217,7 +217,8 @@ class FixedIPList(obj_base.ObjectListBase, obj_base.NovaObject):
     # Version 1.8: FixedIP <= version 1.8
     # Version 1.9: FixedIP <= version 1.9
     # Version 1.10: FixedIP <= version 1.10
-    VERSION = '1.10'
+    # Version 1.11: Added bulk_associate_pool() and bulk_disassociate()
+    VERSION = '1.11'
 
     fields = {
         'objects': fields.ListOfObjectsField('FixedIP'),
@@ -234,6 +235,7 @@ class FixedIPList(obj_base.ObjectListBase, obj_base.NovaObject):
         '1.8': '1.8',
         '1.9': '1.9',
         '1.10': '1.10',
+        '1.11': '1.10',
         }
 
     @obj_base.remotable_classmethod
@@ -307,3 +309,17 @@ class FixedIPList(obj_base.ObjectListBase, obj_base.NovaObject):
                                                   reason='already created')
             ips.append(ip)
         db.fixed_ip_bulk_create(context, ips)
+
+    @obj_base.remotable_classmethod
+    def bulk_associate_pool(cls, context, network_ids, instance_uuid,
+                            host=None):
+        db_fixedips = db.fixed_ip_bulk_associate_pool(context, network_ids,
+                                                      instance_uuid,
+                                                      host=host)
+        return obj_base.obj_make_list(context, cls(context),
+                                      objects.FixedIP, db_fixedips)
+
+    @obj_base.remotable_classmethod
+    def bulk_disassociate(cls, context, instance_uuid, addresses):
+        db.fixed_ip_bulk_disassociate(context, instance_uuid,
+                                      [str(address) for address in addresses])
@@ -21,6 +21,7 @@ from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 
+from nova.api.metadata import cache as metadata_cache
 from nova.cells import opts as cells_opts
 from nova.cells import rpcapi as cells_rpcapi
 from nova.cells import utils as cells_utils
@@ -900,6 +901,8 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
 
         self._from_db_object(context, self, inst_ref,
                              expected_attrs=expected_attrs)
+        # The metadata cached for the instance are out of date
+        metadata_cache.invalidate(self.uuid)
 
         if cells_update_from_api:
             _handle_cell_update_from_api()
@@ -1202,7 +1205,8 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     # Version 1.15: Instance <= version 1.19
     # Version 1.16: Added get_all() method
     # Version 1.17: Instance <= version 1.20
-    VERSION = '1.17'
+    # Version 1.18: Added get_usage_totals_by_window() method
+    VERSION = '1.18'
 
     fields = {
         'objects': fields.ListOfObjectsField('Instance'),
@@ -1226,6 +1230,7 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         '1.15': '1.19',
         '1.16': '1.19',
         '1.17': '1.20',
+        '1.18': '1.20',
         }
 
     @base.remotable_classmethod
@@ -1328,6 +1333,35 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
                                                 expected_attrs,
                                                 use_slave=use_slave)
 
+    @base.remotable_classmethod
+    def _get_usage_totals_by_window(cls, context, begin, end,
+                                    project_id=None, use_slave=False):
+        begin = timeutils.parse_isotime(begin)
+        end = timeutils.parse_isotime(end)
+        return db.instance_get_usage_totals_by_window(
+            context, begin, end, project_id=project_id, use_slave=use_slave)
+
+    @classmethod
+    def get_usage_totals_by_window(cls, context, begin, end,
+                                   project_id=None, use_slave=False):
+        """Get the usage totals of the instances of each project active
+        during a certain time window, computed by the database.
+
+        :param:context: nova request context
+        :param:begin: datetime for the start of the time window
+        :param:end: datetime for the end of the time window
+        :param:project_id: used to filter instances by project
+        :param use_slave if True, ship this query off to a DB slave
+        :returns: list of dicts with the project_id and the hours,
+        vcpus_hours, memory_mb_hours and local_gb_hours totals
+
+        """
+        begin = timeutils.isotime(begin)
+        end = timeutils.isotime(end)
+        return cls._get_usage_totals_by_window(context, begin, end,
+                                               project_id,
+                                               use_slave=use_slave)
+
     @base.remotable_classmethod
     def get_by_security_group_id(cls, context, security_group_id):
         db_secgroup = db.security_group_get(
@@ -0,0 +1,165 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Bulk loading of the compute nodes for the scheduler.
+
+Rather than building full ComputeNode objects for every node on every
+scheduling pass, only the columns used by the HostStates are read from the
+database, and the JSON fields are only decoded when first accessed. Decoded
+fields are cached for as long as the compute node is not updated.
+"""
+
+import iso8601
+import netaddr
+from oslo_serialization import jsonutils
+import six
+
+from nova import db
+from nova import exception
+from nova import objects
+from nova.objects import pci_device_pool
+
+# Columns of the compute_nodes table used by HostState
+COLUMNS = (
+    'id', 'service_id', 'host', 'hypervisor_hostname', 'updated_at',
+    'vcpus', 'vcpus_used', 'memory_mb', 'free_ram_mb', 'local_gb',
+    'local_gb_used', 'free_disk_gb', 'disk_available_least',
+    'hypervisor_type', 'hypervisor_version', 'host_ip', 'cpu_info',
+    'numa_topology', 'metrics', 'stats', 'supported_instances', 'pci_stats',
+)
+
+
+def _decode_stats(stats):
+    if stats:
+        # NOTE: stats values are strings in ComputeNode objects
+        return {key: value if value is None else six.text_type(value)
+                for key, value in six.iteritems(jsonutils.loads(stats))}
+    return None
+
+
+def _decode_supported_hv_specs(supported_instances):
+    if supported_instances:
+        return [objects.HVSpec.from_list(hv_spec)
+                for hv_spec in jsonutils.loads(supported_instances)]
+    return []
+
+
+class SchedulerComputeNode(object):
+    """Read-only view of the compute node columns used by the scheduler.
+
+    Provides the same attributes as a ComputeNode object to
+    HostState.update_from_compute_node(). The 'stats', 'supported_hv_specs'
+    and 'pci_device_pools' fields are decoded from the JSON columns on first
+    access and cached by the loader.
+    """
+
+    # Decoders of the JSON fields, keyed by field name, with the column the
+    # fields are decoded from
+    _decoders = {
+        'stats': ('stats', _decode_stats),
+        'supported_hv_specs': ('supported_instances',
+                               _decode_supported_hv_specs),
+        'pci_device_pools': ('pci_stats', pci_device_pool.from_pci_stats),
+    }
+
+    def __init__(self, row, decoded):
+        self._row = row
+        # Dict of the decoded fields shared by the views of a same row
+        self._decoded = decoded
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self._decoders:
+            if name not in self._decoded:
+                column, decoder = self._decoders[name]
+                self._decoded[name] = decoder(self._row[column])
+            value = self._decoded[name]
+            if name == 'stats' and value is not None:
+                # NOTE: stats are stored as is by the HostStates, don't let
+                # them modify the cached copy
+                value = dict(value)
+            return value
+        try:
+            return self._row[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __repr__(self):
+        return ('<SchedulerComputeNode %(id)s: %(host)s %(node)s>' %
+                {'id': self._row['id'], 'host': self._row['host'],
+                 'node': self._row['hypervisor_hostname']})
+
+
+class ComputeNodeLoader(object):
+    """Loads the compute nodes for the HostManager in bulk."""
+
+    def __init__(self):
+        # Decoded JSON fields and updated_at of each compute node, keyed by
+        # compute node id
+        self._decoded = {}
+
+    def _get_decoded(self, row):
+        updated_at, decoded = self._decoded.get(row['id'], (None, None))
+        if decoded is None or updated_at != row['updated_at']:
+            decoded = {}
+            self._decoded[row['id']] = (row['updated_at'], decoded)
+        return decoded
+
+    @staticmethod
+    def _coerce(row):
+        # NOTE: Make the values of the row what the fields of a ComputeNode
+        # object would be
+        updated_at = row['updated_at']
+        if updated_at is not None and updated_at.tzinfo is None:
+            row['updated_at'] = updated_at.replace(
+                tzinfo=iso8601.iso8601.Utc())
+        if row['host_ip'] is not None:
+            row['host_ip'] = netaddr.IPAddress(row['host_ip'])
+
+    def _set_host(self, context, row):
+        if row['host'] is not None or row['service_id'] is None:
+            return
+        # FIXME(sbauza): Unconverted compute record, provide compatibility
+        # This has to stay until we can be sure that any/all compute nodes
+        # in the database have been converted to use the host field
+        try:
+            row['host'] = objects.Service.get_by_id(
+                context, row['service_id']).host
+        except exception.ServiceNotFound:
+            pass
+
+    def get_all(self, context, since=None):
+        """Returns a list of SchedulerComputeNodes.
+
+        :param context: nova request context
+        :param since: optional datetime; if set, only the compute nodes
+                      created or updated since then are returned
+        """
+        rows = db.compute_node_get_all_columns(context, COLUMNS, since=since)
+        if since is None:
+            # Forget about the compute nodes which are gone
+            ids = set(row['id'] for row in rows)
+            for compute_id in list(self._decoded):
+                if compute_id not in ids:
+                    del self._decoded[compute_id]
+        compute_nodes = []
+        for row in rows:
+            self._coerce(row)
+            self._set_host(context, row)
+            compute_nodes.append(
+                SchedulerComputeNode(row, self._get_decoded(row)))
+        return compute_nodes
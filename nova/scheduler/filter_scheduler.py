@@ -19,6 +19,8 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import heapq
+import itertools
 import random
 
 from oslo_config import cfg
@@ -45,7 +47,16 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_batch_placement',
+                default=False,
+                help='Whether requests for several instances are placed in '
+                     'one batch: hosts are filtered and weighed once for '
+                     'the request, and only the host selected for an '
+                     'instance is filtered and weighed again before '
+                     'selecting a host for the next instance, instead of '
+                     'filtering and weighing all the hosts for each '
+                     'instance'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -139,8 +150,13 @@ class FilterScheduler(driver.Scheduler):
         # are being scanned in a filter or weighing function.
         hosts = self._get_all_host_states(elevated)
 
-        selected_hosts = []
         num_instances = request_spec.get('num_instances', 1)
+        if CONF.scheduler_batch_placement and num_instances > 1:
+            return self._schedule_batch(hosts, filter_properties,
+                                        instance_properties, num_instances,
+                                        update_group_hosts)
+
+        selected_hosts = []
         for num in range(num_instances):
             # Filter local hosts based on requirements ...
             hosts = self.host_manager.get_filtered_hosts(hosts,
@@ -156,12 +172,8 @@ class FilterScheduler(driver.Scheduler):
 
             LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
 
-            scheduler_host_subset_size = CONF.scheduler_host_subset_size
-            if scheduler_host_subset_size > len(weighed_hosts):
-                scheduler_host_subset_size = len(weighed_hosts)
-            if scheduler_host_subset_size < 1:
-                scheduler_host_subset_size = 1
-
+            scheduler_host_subset_size = self._get_host_subset_size(
+                len(weighed_hosts))
             chosen_host = random.choice(
                 weighed_hosts[0:scheduler_host_subset_size])
             LOG.debug("Selected host: %(host)s", {'host': chosen_host})
@@ -171,15 +183,105 @@ class FilterScheduler(driver.Scheduler):
             # will change for the next instance.
             chosen_host.obj.consume_from_instance(instance_properties)
             if update_group_hosts is True:
-                # NOTE(sbauza): Group details are serialized into a list now
-                # that they are populated by the conductor, we need to
-                # deserialize them
-                if isinstance(filter_properties['group_hosts'], list):
-                    filter_properties['group_hosts'] = set(
-                        filter_properties['group_hosts'])
-                filter_properties['group_hosts'].add(chosen_host.obj.host)
+                self._add_group_host(filter_properties, chosen_host)
         return selected_hosts
 
+    def _schedule_batch(self, hosts, filter_properties, instance_properties,
+                        num_instances, update_group_hosts):
+        """Returns a list of hosts for several instances, selected in one
+        batch.
+
+        The hosts are filtered and weighed once, and kept in a heap ordered
+        by weight. Only the resources of the host selected for an instance
+        are consumed, so it is the only host filtered and weighed again
+        (against the normalization bounds of the first weighing) before the
+        next instance. When the hosts of the server group change, the filters
+        which depend on the hosts already selected are run again on all the
+        remaining hosts.
+        """
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                filter_properties, index=0)
+        if not hosts:
+            return []
+
+        LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
+
+        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                filter_properties)
+        bounds = self.host_manager.get_weight_bounds()
+
+        LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
+
+        # NOTE: the counter keeps the order of hosts with the same weight
+        # and avoids comparing the hosts themselves
+        counter = itertools.count()
+        heap = [(-weighed_host.weight, next(counter), weighed_host)
+                for weighed_host in weighed_hosts]
+        heapq.heapify(heap)
+        selection_filters = [filter_.__class__.__name__
+                             for filter_ in self.host_manager.default_filters
+                             if filter_.depends_on_selection]
+
+        selected_hosts = []
+        for num in range(num_instances):
+            if not heap:
+                # Can't get any more locally.
+                break
+
+            scheduler_host_subset_size = self._get_host_subset_size(
+                len(heap))
+            subset = [heapq.heappop(heap)
+                      for _i in range(scheduler_host_subset_size)]
+            chosen = random.choice(subset)
+            for entry in subset:
+                if entry is not chosen:
+                    heapq.heappush(heap, entry)
+            chosen_host = chosen[2]
+            LOG.debug("Selected host: %(host)s", {'host': chosen_host})
+            selected_hosts.append(chosen_host)
+
+            chosen_host.obj.consume_from_instance(instance_properties)
+            if update_group_hosts is True:
+                self._add_group_host(filter_properties, chosen_host)
+            if num + 1 == num_instances:
+                break
+
+            if update_group_hosts is True and selection_filters and heap:
+                remaining = self.host_manager.get_filtered_hosts(
+                    [entry[2].obj for entry in heap], filter_properties,
+                    filter_class_names=selection_filters, index=num + 1)
+                remaining = set(remaining or [])
+                heap = [entry for entry in heap if entry[2].obj in remaining]
+                heapq.heapify(heap)
+
+            # Only the selected host has changed, filter and weigh it again
+            if self.host_manager.get_filtered_hosts(
+                    [chosen_host.obj], filter_properties, index=num + 1):
+                weighed_host = self.host_manager.get_weighed_host(
+                    chosen_host.obj, filter_properties, bounds)
+                heapq.heappush(heap, (-weighed_host.weight, next(counter),
+                                      weighed_host))
+        return selected_hosts
+
+    @staticmethod
+    def _get_host_subset_size(num_hosts):
+        scheduler_host_subset_size = CONF.scheduler_host_subset_size
+        if scheduler_host_subset_size > num_hosts:
+            scheduler_host_subset_size = num_hosts
+        if scheduler_host_subset_size < 1:
+            scheduler_host_subset_size = 1
+        return scheduler_host_subset_size
+
+    @staticmethod
+    def _add_group_host(filter_properties, chosen_host):
+        # NOTE(sbauza): Group details are serialized into a list now
+        # that they are populated by the conductor, we need to
+        # deserialize them
+        if isinstance(filter_properties['group_hosts'], list):
+            filter_properties['group_hosts'] = set(
+                filter_properties['group_hosts'])
+        filter_properties['group_hosts'].add(chosen_host.obj.host)
+
     def _get_all_host_states(self, context):
         """Template method, so a subclass can implement caching."""
         return self.host_manager.get_all_host_states(context)
@@ -28,6 +28,27 @@ class AggregateMultiTenancyIsolation(filters.BaseHostFilter):
     # Aggregate data and tenant do not change within a request
     run_filter_once_per_request = True
 
+    def filter_all(self, filter_obj_list, filter_properties):
+        spec = filter_properties.get('request_spec', {})
+        props = spec.get('instance_properties', {})
+        tenant_id = props.get('project_id')
+        return (host_state for host_state in filter_obj_list
+                if self._tenant_passes(host_state, filter_properties,
+                                       tenant_id))
+
+    def _tenant_passes(self, host_state, filter_properties, tenant_id):
+        index = host_state.aggregate_index
+        if index is None:
+            return self.host_passes(host_state, filter_properties)
+        # Answer with the aggregate metadata index of the HostManager rather
+        # than building the metadata of each host
+        if (host_state.host in index.hosts_with_key('filter_tenant_id') and
+                host_state.host not in index.hosts_with_value(
+                    'filter_tenant_id', tenant_id)):
+            LOG.debug("%s fails tenant id on aggregate", host_state)
+            return False
+        return True
+
     def host_passes(self, host_state, filter_properties):
         """If a host is in an aggregate that has the metadata key
         "filter_tenant_id" it can only create instances from that tenant(s).
@@ -36,10 +36,41 @@ class AvailabilityZoneFilter(filters.BaseHostFilter):
     # Availability zones do not change within a request
     run_filter_once_per_request = True
 
-    def host_passes(self, host_state, filter_properties):
+    @staticmethod
+    def _get_availability_zone(filter_properties):
         spec = filter_properties.get('request_spec', {})
         props = spec.get('instance_properties', {})
-        availability_zone = props.get('availability_zone')
+        return props.get('availability_zone')
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        availability_zone = self._get_availability_zone(filter_properties)
+        if not availability_zone:
+            return filter_obj_list
+        return (host_state for host_state in filter_obj_list
+                if self._az_passes(host_state, filter_properties,
+                                   availability_zone))
+
+    def _az_passes(self, host_state, filter_properties, availability_zone):
+        index = host_state.aggregate_index
+        if index is None:
+            return self.host_passes(host_state, filter_properties)
+        # Answer with the aggregate metadata index of the HostManager rather
+        # than building the metadata of each host
+        if host_state.host in index.hosts_with_value('availability_zone',
+                                                     availability_zone):
+            return True
+        if host_state.host in index.hosts_with_key('availability_zone'):
+            LOG.debug("Availability Zone '%(az)s' requested. "
+                      "%(host_state)s has AZs: %(host_az)s",
+                      {'host_state': host_state,
+                       'az': availability_zone,
+                       'host_az': index.values_from_key(
+                           host_state.host, 'availability_zone')})
+            return False
+        return self.host_passes(host_state, filter_properties)
+
+    def host_passes(self, host_state, filter_properties):
+        availability_zone = self._get_availability_zone(filter_properties)
 
         if not availability_zone:
             return True
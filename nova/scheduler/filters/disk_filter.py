@@ -32,22 +32,25 @@ CONF.register_opt(disk_allocation_ratio_opt)
 class DiskFilter(filters.BaseHostFilter):
     """Disk Filter with over subscription flag."""
 
+    # Set to True in a subclass if the allocation ratio differs per host, in
+    # which case the ratio is looked up for each host. Otherwise the ratio is
+    # looked up once and all the hosts are checked against it in one pass.
+    ratio_per_host = False
+
     def _get_disk_allocation_ratio(self, host_state, filter_properties):
         return CONF.disk_allocation_ratio
 
-    def host_passes(self, host_state, filter_properties):
-        """Filter based on disk usage."""
+    @staticmethod
+    def _requested_disk_mb(filter_properties):
         instance_type = filter_properties.get('instance_type')
-        requested_disk = (1024 * (instance_type['root_gb'] +
-                                 instance_type['ephemeral_gb']) +
-                         instance_type['swap'])
+        return (1024 * (instance_type['root_gb'] +
+                        instance_type['ephemeral_gb']) +
+                instance_type['swap'])
 
+    def _disk_passes(self, host_state, requested_disk, disk_allocation_ratio):
         free_disk_mb = host_state.free_disk_mb
         total_usable_disk_mb = host_state.total_usable_disk_gb * 1024
 
-        disk_allocation_ratio = self._get_disk_allocation_ratio(
-            host_state, filter_properties)
-
         disk_mb_limit = total_usable_disk_mb * disk_allocation_ratio
         used_disk_mb = total_usable_disk_mb - free_disk_mb
         usable_disk_mb = disk_mb_limit - used_disk_mb
@@ -64,6 +67,25 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def host_passes(self, host_state, filter_properties):
+        """Filter based on disk usage."""
+        disk_allocation_ratio = self._get_disk_allocation_ratio(
+            host_state, filter_properties)
+        return self._disk_passes(host_state,
+                                 self._requested_disk_mb(filter_properties),
+                                 disk_allocation_ratio)
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        if self.ratio_per_host:
+            return super(DiskFilter, self).filter_all(filter_obj_list,
+                                                      filter_properties)
+        requested_disk = self._requested_disk_mb(filter_properties)
+        disk_allocation_ratio = self._get_disk_allocation_ratio(
+            None, filter_properties)
+        return (host_state for host_state in filter_obj_list
+                if self._disk_passes(host_state, requested_disk,
+                                     disk_allocation_ratio))
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -72,6 +94,8 @@ class AggregateDiskFilter(DiskFilter):
     found.
     """
 
+    ratio_per_host = True
+
     def _get_disk_allocation_ratio(self, host_state, filter_properties):
         aggregate_vals = utils.aggregate_values_from_key(
             host_state,
@@ -36,17 +36,16 @@ CONF.register_opt(max_io_ops_per_host_opt)
 class IoOpsFilter(filters.BaseHostFilter):
     """Filter out hosts with too many concurrent I/O operations."""
 
+    # Set to True in a subclass if the maximum differs per host, in which
+    # case it is looked up for each host. Otherwise it is looked up once and
+    # all the hosts are checked against it in one pass.
+    limit_per_host = False
+
     def _get_max_io_ops_per_host(self, host_state, filter_properties):
         return CONF.max_io_ops_per_host
 
-    def host_passes(self, host_state, filter_properties):
-        """Use information about current vm and task states collected from
-        compute node statistics to decide whether to filter.
-        """
-        num_io_ops = host_state.num_io_ops
-        max_io_ops = self._get_max_io_ops_per_host(
-            host_state, filter_properties)
-        passes = num_io_ops < max_io_ops
+    def _io_ops_pass(self, host_state, max_io_ops):
+        passes = host_state.num_io_ops < max_io_ops
         if not passes:
             LOG.debug("%(host_state)s fails I/O ops check: Max IOs per host "
                         "is set to %(max_io_ops)s",
@@ -54,6 +53,22 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def host_passes(self, host_state, filter_properties):
+        """Use information about current vm and task states collected from
+        compute node statistics to decide whether to filter.
+        """
+        max_io_ops = self._get_max_io_ops_per_host(
+            host_state, filter_properties)
+        return self._io_ops_pass(host_state, max_io_ops)
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        if self.limit_per_host:
+            return super(IoOpsFilter, self).filter_all(filter_obj_list,
+                                                       filter_properties)
+        max_io_ops = self._get_max_io_ops_per_host(None, filter_properties)
+        return (host_state for host_state in filter_obj_list
+                if self._io_ops_pass(host_state, max_io_ops))
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -61,6 +76,8 @@ class AggregateIoOpsFilter(IoOpsFilter):
     Fall back to global max_io_ops_per_host if no per-aggregate setting found.
     """
 
+    limit_per_host = True
+
     def _get_max_io_ops_per_host(self, host_state, filter_properties):
         aggregate_vals = utils.aggregate_values_from_key(
             host_state,
@@ -33,14 +33,16 @@ CONF.register_opt(max_instances_per_host_opt)
 class NumInstancesFilter(filters.BaseHostFilter):
     """Filter out hosts with too many instances."""
 
+    # Set to True in a subclass if the maximum differs per host, in which
+    # case it is looked up for each host. Otherwise it is looked up once and
+    # all the hosts are checked against it in one pass.
+    limit_per_host = False
+
     def _get_max_instances_per_host(self, host_state, filter_properties):
         return CONF.max_instances_per_host
 
-    def host_passes(self, host_state, filter_properties):
-        num_instances = host_state.num_instances
-        max_instances = self._get_max_instances_per_host(
-            host_state, filter_properties)
-        passes = num_instances < max_instances
+    def _num_instances_pass(self, host_state, max_instances):
+        passes = host_state.num_instances < max_instances
         if not passes:
             LOG.debug("%(host_state)s fails num_instances check: Max "
                         "instances per host is set to %(max_instances)s",
@@ -48,6 +50,20 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def host_passes(self, host_state, filter_properties):
+        max_instances = self._get_max_instances_per_host(
+            host_state, filter_properties)
+        return self._num_instances_pass(host_state, max_instances)
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        if self.limit_per_host:
+            return super(NumInstancesFilter, self).filter_all(
+                filter_obj_list, filter_properties)
+        max_instances = self._get_max_instances_per_host(None,
+                                                         filter_properties)
+        return (host_state for host_state in filter_obj_list
+                if self._num_instances_pass(host_state, max_instances))
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -56,6 +72,8 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
     found.
     """
 
+    limit_per_host = True
+
     def _get_max_instances_per_host(self, host_state, filter_properties):
         aggregate_vals = utils.aggregate_values_from_key(
             host_state,
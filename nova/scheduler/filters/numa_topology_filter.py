@@ -11,6 +11,7 @@
 #    under the License.
 
 from oslo_config import cfg
+import six
 
 from nova import objects
 from nova.scheduler import filters
@@ -21,34 +22,106 @@ CONF.import_opt('cpu_allocation_ratio', 'nova.scheduler.filters.core_filter')
 CONF.import_opt('ram_allocation_ratio', 'nova.scheduler.filters.ram_filter')
 
 
+def _instance_topology_key(instance_topology):
+    """Returns a hashable key of what an instance topology requests."""
+    return tuple(
+        (tuple(sorted(cell.cpuset)), cell.memory, cell.pagesize,
+         cell.cpu_pinning_requested,
+         cell.cpu_topology and (cell.cpu_topology.sockets,
+                                cell.cpu_topology.cores,
+                                cell.cpu_topology.threads))
+        for cell in instance_topology.cells)
+
+
 class NUMATopologyFilter(filters.BaseHostFilter):
     """Filter on requested NUMA topology."""
 
-    def host_passes(self, host_state, filter_properties):
-        ram_ratio = CONF.ram_allocation_ratio
-        cpu_ratio = CONF.cpu_allocation_ratio
+    # Maximum number of NUMA fit results remembered by the filter
+    fit_cache_size = 10000
+
+    def __init__(self):
+        super(NUMATopologyFilter, self).__init__()
+        # Whether an instance topology fits onto a host topology, keyed by
+        # the serialized host topology, the instance topology and the limits.
+        # Hosts with the same topology and usage share the result, which
+        # stays valid for as long as the host usage does not change, within
+        # a request and across the instances of a multi-instance boot.
+        self._fit_cache = {}
+
+    def _topology_fits(self, host_state, requested_topology, instance_key,
+                       limits):
+        """Returns whether the instance topology fits onto the host, without
+        taking PCI devices into account.
+        """
+        host_numa_topology = host_state.numa_topology
+        key = None
+        if isinstance(host_numa_topology, six.string_types):
+            key = (host_numa_topology, instance_key,
+                   limits.cpu_allocation_ratio, limits.ram_allocation_ratio)
+            fits = self._fit_cache.get(key)
+            if fits is not None:
+                return fits
+        host_topology, _fmt = hardware.host_topology_and_format_from_host(
+                host_state)
+        fits = bool(hardware.numa_fit_instance_to_host(
+            host_topology, requested_topology, limits=limits))
+        if key is not None:
+            if len(self._fit_cache) >= self.fit_cache_size:
+                self._fit_cache.clear()
+            self._fit_cache[key] = fits
+        return fits
+
+    @staticmethod
+    def _get_request(filter_properties):
         request_spec = filter_properties.get('request_spec', {})
         instance = request_spec.get('instance_properties', {})
         requested_topology = hardware.instance_topology_from_instance(instance)
-        host_topology, _fmt = hardware.host_topology_and_format_from_host(
-                host_state)
         pci_requests = filter_properties.get('pci_requests')
         if pci_requests:
             pci_requests = pci_requests.requests
-        if requested_topology and host_topology:
-            limits = objects.NUMATopologyLimits(
-                cpu_allocation_ratio=cpu_ratio,
-                ram_allocation_ratio=ram_ratio)
-            instance_topology = (hardware.numa_fit_instance_to_host(
-                        host_topology, requested_topology,
-                        limits=limits,
-                        pci_requests=pci_requests,
-                        pci_stats=host_state.pci_stats))
-            if not instance_topology:
+        limits = objects.NUMATopologyLimits(
+            cpu_allocation_ratio=CONF.cpu_allocation_ratio,
+            ram_allocation_ratio=CONF.ram_allocation_ratio)
+        return requested_topology, pci_requests, limits
+
+    def _numa_passes(self, host_state, requested_topology, instance_key,
+                     pci_requests, limits):
+        if requested_topology and host_state.numa_topology:
+            if not self._topology_fits(host_state, requested_topology,
+                                       instance_key, limits):
                 return False
+            if pci_requests:
+                host_topology, _fmt = (
+                    hardware.host_topology_and_format_from_host(host_state))
+                instance_topology = (hardware.numa_fit_instance_to_host(
+                            host_topology, requested_topology,
+                            limits=limits,
+                            pci_requests=pci_requests,
+                            pci_stats=host_state.pci_stats))
+                if not instance_topology:
+                    return False
             host_state.limits['numa_topology'] = limits
             return True
         elif requested_topology:
             return False
         else:
             return True
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        # The requested topology does not change within a request, only
+        # look it up once rather than for each host
+        requested_topology, pci_requests, limits = self._get_request(
+            filter_properties)
+        instance_key = (requested_topology and
+                        _instance_topology_key(requested_topology))
+        return (host_state for host_state in filter_obj_list
+                if self._numa_passes(host_state, requested_topology,
+                                     instance_key, pci_requests, limits))
+
+    def host_passes(self, host_state, filter_properties):
+        requested_topology, pci_requests, limits = self._get_request(
+            filter_properties)
+        instance_key = (requested_topology and
+                        _instance_topology_key(requested_topology))
+        return self._numa_passes(host_state, requested_topology,
+                                 instance_key, pci_requests, limits)
@@ -24,26 +24,122 @@ from nova.i18n import _LI
 LOG = logging.getLogger(__name__)
 
 
+def _values_from_key(metadata_list, key_name):
+    return {metadata[key_name]
+              for metadata in metadata_list
+              if key_name in metadata
+              }
+
+
+def _metadata_by_key(metadata_list, key=None):
+    metadata = collections.defaultdict(set)
+    for aggr_metadata in metadata_list:
+        if key is None or key in aggr_metadata:
+            for k, v in aggr_metadata.items():
+                metadata[k].update(x.strip() for x in v.split(','))
+    return metadata
+
+
+class AggregateMetadataIndex(object):
+    """Index of the aggregate metadata of the hosts.
+
+    Keeps, for each metadata key and value, the set of hosts belonging to an
+    aggregate with that key and value (comma separated values are split the
+    same way as by aggregate_metadata_get_by_host()), and caches the
+    metadata of each host. It is maintained by the HostManager when
+    aggregates are updated or deleted so that filters don't have to walk the
+    aggregates of every host on each request.
+    """
+
+    def __init__(self):
+        # Dict of host sets keyed by metadata value, keyed by metadata key
+        self._hosts_by_value = collections.defaultdict(
+            lambda: collections.defaultdict(set))
+        # Dict of host sets keyed by metadata key
+        self._hosts_by_key = collections.defaultdict(set)
+        # Dict of the list of aggregate metadata keyed by host
+        self._host_metadata = {}
+        # Caches of the lookups done by hosts, keyed by host then by key
+        self._metadata_cache = collections.defaultdict(dict)
+        self._values_cache = collections.defaultdict(dict)
+
+    def update_host(self, host, aggregates):
+        """Set the aggregates a host belongs to."""
+        self.remove_host(host)
+        metadata_list = [dict(aggr.metadata or {}) for aggr in aggregates]
+        if not metadata_list:
+            return
+        self._host_metadata[host] = metadata_list
+        for metadata in metadata_list:
+            for key, value in six.iteritems(metadata):
+                self._hosts_by_key[key].add(host)
+                for x in value.split(','):
+                    self._hosts_by_value[key][x.strip()].add(host)
+
+    def remove_host(self, host):
+        """Forget about the aggregates of a host."""
+        self._metadata_cache.pop(host, None)
+        self._values_cache.pop(host, None)
+        for metadata in self._host_metadata.pop(host, []):
+            for key, value in six.iteritems(metadata):
+                self._hosts_by_key[key].discard(host)
+                if not self._hosts_by_key[key]:
+                    del self._hosts_by_key[key]
+                hosts_by_value = self._hosts_by_value[key]
+                for x in value.split(','):
+                    hosts_by_value[x.strip()].discard(host)
+                    if not hosts_by_value[x.strip()]:
+                        del hosts_by_value[x.strip()]
+                if not hosts_by_value:
+                    del self._hosts_by_value[key]
+
+    def hosts_with_key(self, key):
+        """Returns the set of hosts with a metadata key."""
+        return self._hosts_by_key.get(key, set())
+
+    def hosts_with_value(self, key, value):
+        """Returns the set of hosts with a metadata key set to a value."""
+        hosts_by_value = self._hosts_by_value.get(key)
+        if not hosts_by_value:
+            return set()
+        return hosts_by_value.get(value, set())
+
+    def values_from_key(self, host, key_name):
+        """Same as aggregate_values_from_key() for a host name."""
+        cache = self._values_cache[host]
+        if key_name not in cache:
+            cache[key_name] = _values_from_key(
+                self._host_metadata.get(host, []), key_name)
+        return set(cache[key_name])
+
+    def metadata_get_by_host(self, host, key=None):
+        """Same as aggregate_metadata_get_by_host() for a host name."""
+        cache = self._metadata_cache[host]
+        if key not in cache:
+            cache[key] = _metadata_by_key(
+                self._host_metadata.get(host, []), key)
+        return collections.defaultdict(
+            set, {k: set(v) for k, v in six.iteritems(cache[key])})
+
+
 def aggregate_values_from_key(host_state, key_name):
     """Returns a set of values based on a metadata key for a specific host."""
-    aggrlist = host_state.aggregates
-    return {aggr.metadata[key_name]
-              for aggr in aggrlist
-              if key_name in aggr.metadata
-              }
+    if host_state.aggregate_index is not None:
+        return host_state.aggregate_index.values_from_key(host_state.host,
+                                                          key_name)
+    return _values_from_key([aggr.metadata for aggr in host_state.aggregates],
+                            key_name)
 
 
 def aggregate_metadata_get_by_host(host_state, key=None):
     """Returns a dict of all metadata based on a metadata key for a specific
     host. If the key is not provided, returns a dict of all metadata.
     """
-    aggrlist = host_state.aggregates
-    metadata = collections.defaultdict(set)
-    for aggr in aggrlist:
-        if key is None or key in aggr.metadata:
-            for k, v in aggr.metadata.items():
-                metadata[k].update(x.strip() for x in v.split(','))
-    return metadata
+    if host_state.aggregate_index is not None:
+        return host_state.aggregate_index.metadata_get_by_host(
+            host_state.host, key)
+    return _metadata_by_key([aggr.metadata for aggr in host_state.aggregates],
+                            key)
 
 
 def validate_num_values(vals, default=None, cast_to=int, based_on=min):
@@ -18,6 +18,7 @@ Manage hosts in the current zone.
 """
 
 import collections
+import datetime
 import time
 try:
     from collections import UserDict as IterableUserDict   # Python 3
@@ -39,7 +40,9 @@ from nova import exception
 from nova.i18n import _, _LI, _LW
 from nova import objects
 from nova.pci import stats as pci_stats
+from nova.scheduler import compute_node_loader
 from nova.scheduler import filters
+from nova.scheduler.filters import utils as filters_utils
 from nova.scheduler import weights
 from nova import utils
 from nova.virt import hardware
@@ -71,6 +74,37 @@ host_manager_opts = [
                default=True,
                help='Determines if the Scheduler tracks changes to instances '
                     'to help with its filtering decisions.'),
+    cfg.BoolOpt('scheduler_incremental_host_states',
+               default=False,
+               help='Keep the host states resident between scheduling '
+                    'requests and only reload the compute nodes which were '
+                    'created or updated since the previous request, instead '
+                    'of reloading every compute node each time. Instance '
+                    'changes are taken from the updates sent by the compute '
+                    'nodes when scheduler_tracks_instance_changes is set.'),
+    cfg.IntOpt('scheduler_host_states_resync_interval',
+               default=300,
+               help='When scheduler_incremental_host_states is enabled, the '
+                    'interval in seconds after which all the compute nodes '
+                    'are reloaded from the database, so that deleted nodes '
+                    'are dropped and any missed change is picked up. A '
+                    'value of 0 or less reloads every compute node on each '
+                    'request.'),
+    cfg.IntOpt('scheduler_host_states_sync_margin',
+               default=60,
+               help='When scheduler_incremental_host_states is enabled, the '
+                    'number of seconds subtracted from the time of the '
+                    'previous request when loading the changed compute '
+                    'nodes, so that clock skew between the scheduler and '
+                    'the database, and the updates committed while the '
+                    'previous request was loading, are not missed.'),
+    cfg.BoolOpt('scheduler_bulk_load_compute_nodes',
+               default=False,
+               help='Load the compute nodes by reading only the columns used '
+                    'by the scheduler from the database, instead of building '
+                    'full ComputeNode objects. JSON fields are then only '
+                    'decoded when used, and kept until the compute node is '
+                    'updated.'),
 ]
 
 CONF = cfg.CONF
@@ -153,6 +187,8 @@ class HostState(object):
 
         # List of aggregates the host belongs to
         self.aggregates = []
+        # Index of the aggregate metadata of all hosts, if any
+        self.aggregate_index = None
 
         # Instances on this host
         self.instances = {}
@@ -330,12 +366,20 @@ class HostManager(object):
         # Dict of set of aggregate IDs keyed by the name of the host belonging
         # to those aggregates
         self.host_aggregates_map = collections.defaultdict(set)
+        # Index of the aggregate metadata used by the aggregate filters
+        self.aggregate_index = filters_utils.AggregateMetadataIndex()
         self._init_aggregates()
         self.tracks_instance_changes = CONF.scheduler_tracks_instance_changes
         # Dict of instances and status, keyed by host
         self._instance_info = {}
         if self.tracks_instance_changes:
             self._init_instance_info()
+        # Timestamps of the last full and last incremental reload of the
+        # compute nodes, used when incremental host states are enabled
+        self._last_full_sync = None
+        self._last_sync = None
+        # Loader of the compute nodes when they are loaded in bulk
+        self.compute_node_loader = compute_node_loader.ComputeNodeLoader()
 
     def _load_filters(self):
         return CONF.scheduler_default_filters
@@ -347,6 +391,13 @@ class HostManager(object):
             self.aggs_by_id[agg.id] = agg
             for host in agg.hosts:
                 self.host_aggregates_map[host].add(agg.id)
+        for host in self.host_aggregates_map:
+            self._update_aggregate_index(host)
+
+    def _update_aggregate_index(self, host):
+        self.aggregate_index.update_host(
+            host, [self.aggs_by_id[agg_id]
+                   for agg_id in self.host_aggregates_map[host]])
 
     def update_aggregates(self, aggregates):
         """Updates internal HostManager information about aggregates."""
@@ -358,6 +409,7 @@ class HostManager(object):
 
     def _update_aggregate(self, aggregate):
         self.aggs_by_id[aggregate.id] = aggregate
+        changed_hosts = set(aggregate.hosts)
         for host in aggregate.hosts:
             self.host_aggregates_map[host].add(aggregate.id)
         # Refreshing the mapping dict to remove all hosts that are no longer
@@ -366,6 +418,9 @@ class HostManager(object):
             if (aggregate.id in self.host_aggregates_map[host]
                     and host not in aggregate.hosts):
                 self.host_aggregates_map[host].remove(aggregate.id)
+                changed_hosts.add(host)
+        for host in changed_hosts:
+            self._update_aggregate_index(host)
 
     def delete_aggregate(self, aggregate):
         """Deletes internal HostManager information about a specific aggregate.
@@ -375,6 +430,7 @@ class HostManager(object):
         for host in aggregate.hosts:
             if aggregate.id in self.host_aggregates_map[host]:
                 self.host_aggregates_map[host].remove(aggregate.id)
+            self._update_aggregate_index(host)
 
     def _init_instance_info(self):
         """Creates the initial view of instances for all hosts.
@@ -527,6 +583,71 @@ class HostManager(object):
         return self.weight_handler.get_weighed_objects(self.weighers,
                 hosts, weight_properties)
 
+    def get_weight_bounds(self):
+        """Return the normalization bounds of the last weighing of hosts."""
+        return self.weight_handler.get_weight_bounds(self.weighers)
+
+    def get_weighed_host(self, host, weight_properties, bounds):
+        """Weigh a single host against the bounds of a previous weighing."""
+        return self.weight_handler.get_weighed_object(self.weighers,
+                host, weight_properties, bounds)
+
+    def _needs_full_sync(self, now):
+        """Returns True if every compute node has to be reloaded."""
+        if not CONF.scheduler_incremental_host_states:
+            return True
+        interval = CONF.scheduler_host_states_resync_interval
+        if self._last_full_sync is None or interval <= 0:
+            return True
+        return timeutils.delta_seconds(self._last_full_sync, now) >= interval
+
+    def _get_compute_nodes(self, context):
+        """Returns the compute nodes to refresh the host states from and
+        whether that is the full list of compute nodes.
+
+        When incremental host states are enabled and no full resync is due,
+        only the compute nodes changed since the previous call are returned,
+        along with the nodes of any host state which was invalidated (by
+        resetting its 'updated' field) since then.
+        """
+        now = timeutils.utcnow()
+        if self._needs_full_sync(now):
+            if CONF.scheduler_bulk_load_compute_nodes:
+                compute_nodes = self.compute_node_loader.get_all(context)
+            else:
+                compute_nodes = objects.ComputeNodeList.get_all(context)
+            self._last_full_sync = now
+            self._last_sync = now
+            return compute_nodes, True
+
+        # The nodes changed within the margin are loaded again, which is
+        # harmless, rather than missing an update
+        since = self._last_sync - datetime.timedelta(
+            seconds=CONF.scheduler_host_states_sync_margin)
+        if CONF.scheduler_bulk_load_compute_nodes:
+            compute_nodes = self.compute_node_loader.get_all(
+                context, since=since)
+        else:
+            compute_nodes = list(
+                objects.ComputeNodeList.get_all_changed_since(
+                    context, since))
+        self._last_sync = now
+        changed = set((compute.host, compute.hypervisor_hostname)
+                      for compute in compute_nodes)
+        for state_key, host_state in six.iteritems(self.host_state_map):
+            if host_state.updated is not None or state_key in changed:
+                continue
+            host, node = state_key
+            try:
+                compute_nodes.append(
+                    objects.ComputeNode.get_by_host_and_nodename(
+                        context, host, node))
+            except exception.ComputeHostNotFound:
+                # NOTE: The node is gone; it is dropped from the map on the
+                # next full resync.
+                pass
+        return compute_nodes, False
+
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
         the HostManager knows about. Also, each of the consumable resources
@@ -537,7 +658,7 @@ class HostManager(object):
                         for service in objects.ServiceList.get_by_binary(
                             context, 'nova-compute')}
         # Get resource usage across the available compute nodes:
-        compute_nodes = objects.ComputeNodeList.get_all(context)
+        compute_nodes, full_sync = self._get_compute_nodes(context)
         seen_nodes = set()
         for compute in compute_nodes:
             service = service_refs.get(compute.host)
@@ -556,27 +677,36 @@ class HostManager(object):
             else:
                 host_state = self.host_state_cls(host, node, compute=compute)
                 self.host_state_map[state_key] = host_state
-            # We force to update the aggregates info each time a new request
-            # comes in, because some changes on the aggregates could have been
-            # happening after setting this field for the first time
-            host_state.aggregates = [self.aggs_by_id[agg_id] for agg_id in
-                                     self.host_aggregates_map[
-                                         host_state.host]]
-            host_state.update_service(dict(service))
-            self._add_instance_info(context, compute, host_state)
             seen_nodes.add(state_key)
 
-        # remove compute nodes from host_state_map if they are not active
-        dead_nodes = set(self.host_state_map.keys()) - seen_nodes
+        if full_sync:
+            # remove compute nodes from host_state_map if they are not active
+            dead_nodes = set(self.host_state_map.keys()) - seen_nodes
+        else:
+            # NOTE: Deleted compute nodes are only noticed on a full resync,
+            # but the ones whose service went away can be dropped right now.
+            dead_nodes = set(state_key for state_key in self.host_state_map
+                             if state_key[0] not in service_refs)
         for state_key in dead_nodes:
             host, node = state_key
             LOG.info(_LI("Removing dead compute node %(host)s:%(node)s "
                          "from scheduler"), {'host': host, 'node': node})
             del self.host_state_map[state_key]
 
+        for host_state in six.itervalues(self.host_state_map):
+            # We force to update the aggregates info each time a new request
+            # comes in, because some changes on the aggregates could have been
+            # happening after setting this field for the first time
+            host_state.aggregates = [self.aggs_by_id[agg_id] for agg_id in
+                                     self.host_aggregates_map[
+                                         host_state.host]]
+            host_state.aggregate_index = self.aggregate_index
+            host_state.update_service(dict(service_refs[host_state.host]))
+            self._add_instance_info(context, host_state)
+
         return six.itervalues(self.host_state_map)
 
-    def _add_instance_info(self, context, compute, host_state):
+    def _add_instance_info(self, context, host_state):
         """Adds the host instance info to the host_state object.
 
         Some older compute nodes may not be sending instance change updates to
@@ -586,7 +716,7 @@ class HostManager(object):
         In those cases, we need to grab the current InstanceList instead of
         relying on the version in _instance_info.
         """
-        host_name = compute.host
+        host_name = host_state.host
         host_info = self._instance_info.get(host_name)
         if host_info and host_info.get("updated"):
             inst_dict = host_info["instances"]
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
 from oslo_serialization import jsonutils
 import webob
 
@@ -72,10 +73,16 @@ def fake_get_no_host_availability_zone(context, host):
     return None
 
 
+def fake_get_hosts_availability_zones(context, hosts):
+    return {host: host for host in hosts}
+
+
 class ExtendedAvailabilityZoneTestV21(test.TestCase):
     content_type = 'application/json'
     prefix = 'OS-EXT-AZ:'
     base_url = '/v2/fake/servers/'
+    # The zones of the hosts of the listed instances are resolved in bulk
+    detail_az_lookups = 0
 
     def setUp(self):
         super(ExtendedAvailabilityZoneTestV21, self).setUp()
@@ -85,6 +92,8 @@ class ExtendedAvailabilityZoneTestV21(test.TestCase):
         self.stubs.Set(compute.api.API, 'get_all', fake_compute_get_all)
         self.stubs.Set(availability_zones, 'get_host_availability_zone',
                        fake_get_host_availability_zone)
+        self.stubs.Set(availability_zones, 'get_hosts_availability_zones',
+                       fake_get_hosts_availability_zones)
         return_server = fakes.fake_instance_get()
         self.stubs.Set(db, 'instance_get_by_uuid', return_server)
 
@@ -142,6 +151,18 @@ class ExtendedAvailabilityZoneTestV21(test.TestCase):
         for i, server in enumerate(self._get_servers(res.body)):
             self.assertAvailabilityZone(server, 'all-host')
 
+    def test_detail_az_lookups(self):
+        url = self.base_url + 'detail'
+        with mock.patch.object(availability_zones,
+                               'get_instance_availability_zone',
+                               return_value='all-host') as mock_get_az:
+            res = self._make_request(url)
+
+        self.assertEqual(200, res.status_int)
+        self.assertEqual(self.detail_az_lookups, mock_get_az.call_count)
+        for server in self._get_servers(res.body):
+            self.assertAvailabilityZone(server, 'all-host')
+
     def test_no_instance_passthrough_404(self):
 
         def fake_compute_get(*args, **kwargs):
@@ -155,6 +176,7 @@ class ExtendedAvailabilityZoneTestV21(test.TestCase):
 
 
 class ExtendedAvailabilityZoneTestV2(ExtendedAvailabilityZoneTestV21):
+    detail_az_lookups = 2
 
     def setUp(self):
         super(ExtendedAvailabilityZoneTestV2, self).setUp()
@@ -18,6 +18,7 @@ import webob.exc
 
 from nova.api.openstack.compute.contrib import hosts as os_hosts_v2
 from nova.api.openstack.compute.plugins.v3 import hosts as os_hosts_v21
+from nova import availability_zones
 from nova.compute import power_state
 from nova.compute import vm_states
 from nova import context as context_maker
@@ -155,6 +156,7 @@ class HostTestCaseV21(test.TestCase):
 
     def setUp(self):
         super(HostTestCaseV21, self).setUp()
+        availability_zones.reset_cache()
         self.controller = self.Controller()
         self.hosts_api = self.controller.api
         self.req = fakes.HTTPRequest.blank('', use_admin_context=True)
@@ -14,6 +14,8 @@
 
 import datetime
 
+import mock
+from oslo_config import cfg
 from oslotest import moxstubout
 
 from nova.api.openstack.compute.contrib import migrations as migrations_v2
@@ -26,6 +28,8 @@ from nova import test
 from nova.tests.unit.api.openstack import fakes
 
 
+CONF = cfg.CONF
+
 fake_migrations = [
     {
         'id': 1234,
@@ -112,6 +116,31 @@ class MigrationsTestCaseV21(test.NoDBTestCase):
         response = self.controller.index(self.req)
         self.assertEqual(migrations_in_progress, response)
 
+    def test_index_streaming(self):
+        self.flags(osapi_json_streaming=True)
+        consumed = []
+
+        def fake_get_migrations_in_batches(context, filters, batch_size):
+            for migration in migrations_obj:
+                consumed.append(migration.id)
+                yield migration
+
+        with mock.patch.object(self.controller.compute_api,
+                               'get_migrations_in_batches',
+                               side_effect=fake_get_migrations_in_batches
+                               ) as mock_get:
+            response = self.controller.index(self.req)
+            mock_get.assert_called_once_with(self.context, self.req.GET,
+                                             CONF.osapi_max_limit)
+
+        expected = self.migrations.output(migrations_obj)
+        migrations = response['migrations']
+        self.assertEqual([], consumed)
+        self.assertEqual(expected[0], next(migrations))
+        self.assertEqual([1234], consumed)
+        self.assertEqual(expected[1:], list(migrations))
+        self.assertEqual([1234, 5678], consumed)
+
 
 class MigrationsTestCaseV2(MigrationsTestCaseV21):
     migrations = migrations_v2
@@ -166,6 +166,7 @@ class ServicesTestV21(test.TestCase):
 
     def setUp(self):
         super(ServicesTestV21, self).setUp()
+        availability_zones.reset_cache()
 
         self.ext_mgr = extensions.ExtensionManager()
         self.ext_mgr.extensions = {}
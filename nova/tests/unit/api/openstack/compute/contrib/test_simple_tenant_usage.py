@@ -103,6 +103,21 @@ def fake_instance_get_active_by_window_joined(context, begin, end,
                                          for x in range(TENANTS * SERVERS)]
 
 
+def fake_instance_get_usage_totals_by_window(context, begin, end,
+                                             project_id=None,
+                                             use_slave=False):
+    tenants = ([project_id] if project_id else
+               ["faketenant_%s" % x for x in range(TENANTS)])
+    return [{'project_id': tenant,
+             'hours': SERVERS * HOURS,
+             'vcpus_hours': SERVERS * VCPUS * HOURS,
+             'memory_mb_hours': SERVERS * MEMORY_MB * HOURS,
+             'local_gb_hours': SERVERS * (ROOT_GB + EPHEMERAL_GB) * HOURS}
+            for tenant in tenants]
+
+
+@mock.patch.object(db, 'instance_get_usage_totals_by_window',
+                   fake_instance_get_usage_totals_by_window)
 @mock.patch.object(db, 'instance_get_active_by_window_joined',
                    fake_instance_get_active_by_window_joined)
 class SimpleTenantUsageTestV21(test.TestCase):
@@ -158,7 +173,7 @@ class SimpleTenantUsageTestV21(test.TestCase):
         req.environ['nova.context'] = self.admin_context
 
         # Make sure that get_active_by_window_joined is only called with
-        # expected_attrs=['system_metadata'].
+        # expected_attrs=['system_metadata', 'flavor'].
         orig_get_active_by_window_joined = (
             objects.InstanceList.get_active_by_window_joined)
 
@@ -166,7 +181,7 @@ class SimpleTenantUsageTestV21(test.TestCase):
                                     project_id=None, host=None,
                                     expected_attrs=None,
                                     use_slave=False):
-            self.assertEqual(['system_metadata'], expected_attrs)
+            self.assertEqual(['system_metadata', 'flavor'], expected_attrs)
             return orig_get_active_by_window_joined(context, begin, end,
                                                     project_id, host,
                                                     expected_attrs, use_slave)
@@ -189,6 +204,21 @@ class SimpleTenantUsageTestV21(test.TestCase):
         for i in range(TENANTS):
             self.assertIsNone(usages[i].get('server_usages'))
 
+    def test_verify_simple_index_totals_from_db(self):
+        req = fakes.HTTPRequest.blank('?start=%s&end=%s' %
+                    (START.isoformat(), STOP.isoformat()))
+        req.environ['nova.context'] = self.admin_context
+        with mock.patch.object(objects.InstanceList,
+                               'get_active_by_window_joined') as mock_get:
+            usages = self.controller.index(req)['tenant_usages']
+        self.assertFalse(mock_get.called)
+        self.assertEqual(['faketenant_0', 'faketenant_1'],
+                         sorted(usage['tenant_id'] for usage in usages))
+        for usage in usages:
+            self.assertEqual(SERVERS * HOURS, usage['total_hours'])
+            self.assertEqual(timeutils.normalize_time(START), usage['start'])
+            self.assertEqual(timeutils.normalize_time(STOP), usage['stop'])
+
     def test_verify_simple_index_empty_param(self):
         # NOTE(lzyeval): 'detailed=&start=..&end=..'
         usages = self._get_tenant_usages()
@@ -329,6 +359,42 @@ class SimpleTenantUsageControllerTestV21(test.TestCase):
         flavor = self.controller._get_flavor(self.context, self.inst_obj, {})
         self.assertIsNone(flavor)
 
+    def _get_tenant_usage(self, detailed):
+        req = fakes.HTTPRequest.blank('?detailed=%s&start=%s&end=%s' %
+                    (detailed, START.isoformat(), STOP.isoformat()))
+        req.environ['nova.context'] = context.get_admin_context()
+        usages = self.controller.index(req)['tenant_usages']
+        self.assertEqual(1, len(usages))
+        return usages[0]
+
+    def test_detailed_and_simple_totals_agree(self):
+        # The totals are computed by the database without detailed=1, and
+        # from the usages of the servers with it
+        ctxt = context.get_admin_context()
+        flavor = objects.Flavor(**FAKE_INST_TYPE)
+        for launched, terminated in [
+                (START + datetime.timedelta(hours=1, microseconds=987654),
+                 STOP - datetime.timedelta(hours=2, microseconds=123456)),
+                (START - datetime.timedelta(microseconds=500000), None)]:
+            instance = objects.Instance(ctxt,
+                                        project_id=self.context.project_id,
+                                        user_id=self.context.user_id,
+                                        vm_state=vm_states.ACTIVE,
+                                        launched_at=launched,
+                                        terminated_at=terminated,
+                                        vcpus=VCPUS, memory_mb=MEMORY_MB,
+                                        root_gb=ROOT_GB,
+                                        ephemeral_gb=EPHEMERAL_GB,
+                                        flavor=flavor)
+            instance.create()
+
+        simple = self._get_tenant_usage(detailed='0')
+        detailed = self._get_tenant_usage(detailed='1')
+        for key in ('total_hours', 'total_vcpus_usage',
+                    'total_memory_mb_usage', 'total_local_gb_usage'):
+            self.assertAlmostEqual(detailed[key], simple[key], places=4,
+                                   msg=key)
+
 
 class SimpleTenantUsageControllerTestV2(SimpleTenantUsageControllerTestV21):
     controller = simple_tenant_usage_v2.SimpleTenantUsageController()
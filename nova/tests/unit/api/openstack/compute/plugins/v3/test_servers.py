@@ -45,6 +45,7 @@ from nova.api.openstack.compute.schemas.v3 import disk_config as \
 from nova.api.openstack.compute.schemas.v3 import servers as servers_schema
 from nova.api.openstack.compute import views
 from nova.api.openstack import extensions
+from nova import availability_zones
 from nova.compute import api as compute_api
 from nova.compute import flavors
 from nova.compute import task_states
@@ -175,6 +176,7 @@ class ControllerTest(test.TestCase):
 
     def setUp(self):
         super(ControllerTest, self).setUp()
+        availability_zones.reset_cache()
         self.flags(verbose=True, use_ipv6=False)
         fakes.stub_out_rate_limiting(self.stubs)
         fakes.stub_out_key_pair_funcs(self.stubs)
@@ -1343,6 +1345,62 @@ class ServersControllerTest(ControllerTest):
         self.assertIn('servers', self.controller.index(req))
         self.assertIn('pci_devices', self.expected_attrs)
 
+    def test_get_servers_detail_joins_flavor(self):
+        self.expected_attrs = None
+
+        def fake_get_all(compute_self, context, search_opts=None,
+                         limit=None, marker=None, want_objects=False,
+                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+            self.expected_attrs = expected_attrs
+            return objects.InstanceList(objects=[])
+
+        self.stubs.Set(compute_api.API, 'get_all', fake_get_all)
+
+        req = fakes.HTTPRequestV3.blank('/servers/detail',
+                                        use_admin_context=True)
+        self.assertIn('servers', self.controller.detail(req))
+        self.assertIn('flavor', self.expected_attrs)
+
+    @mock.patch('nova.availability_zones.get_instance_availability_zones')
+    @mock.patch.object(objects.BlockDeviceMappingList,
+                       'get_by_instance_uuids')
+    def test_get_servers_detail_preloads_extension_data(self, mock_get_bdms,
+                                                        mock_get_azs):
+        bdm = objects.BlockDeviceMapping(instance_uuid=fakes.get_fake_uuid(0),
+                                         volume_id='fake-volume')
+        mock_get_bdms.return_value = objects.BlockDeviceMappingList(
+            objects=[bdm])
+        mock_get_azs.return_value = {'fake_host': 'nova'}
+        loaded_extensions = dict.fromkeys(['os-extended-volumes',
+                                           'os-extended-availability-zone'])
+
+        req = fakes.HTTPRequestV3.blank('/servers/detail')
+        with mock.patch.object(self.controller.extension_info,
+                               'get_extensions',
+                               return_value=loaded_extensions):
+            servers_list = self.controller.detail(req)['servers']
+
+        uuids = [server['id'] for server in servers_list]
+        mock_get_bdms.assert_called_once_with(mock.ANY, uuids)
+        self.assertEqual(1, mock_get_azs.call_count)
+        self.assertEqual([bdm], req.get_db_block_device_mappings(uuids[0]))
+        self.assertEqual([], req.get_db_block_device_mappings(uuids[1]))
+        self.assertEqual({'fake_host': 'nova'},
+                         req.get_db_availability_zones())
+
+    @mock.patch('nova.availability_zones.get_instance_availability_zones')
+    @mock.patch.object(objects.BlockDeviceMappingList,
+                       'get_by_instance_uuids')
+    def test_get_servers_detail_no_extension_data(self, mock_get_bdms,
+                                                  mock_get_azs):
+        req = fakes.HTTPRequestV3.blank('/servers/detail')
+        servers_list = self.controller.detail(req)['servers']
+
+        self.assertFalse(mock_get_bdms.called)
+        self.assertFalse(mock_get_azs.called)
+        self.assertIsNone(req.get_db_block_device_mappings(
+            servers_list[0]['id']))
+
 
 class ServersControllerDeleteTest(ControllerTest):
 
@@ -553,6 +553,20 @@ class ServersControllerTest(ControllerTest):
                            'marker': [fakes.get_fake_uuid(2)]}
         self.assertThat(params, matchers.DictMatches(expected_params))
 
+    def test_get_servers_with_limit_pagination_cursor(self):
+        self.flags(osapi_pagination_cursors=True)
+        req = fakes.HTTPRequest.blank('/fake/servers?limit=3')
+        res_dict = self.controller.index(req)
+
+        servers_links = res_dict['servers_links']
+        href_parts = urlparse.urlparse(servers_links[0]['href'])
+        params = urlparse.parse_qs(href_parts.query)
+        self.assertEqual(['3'], params['limit'])
+        cursor = nova_utils.decode_pagination_cursor(params["marker"][0])
+        self.assertEqual(fakes.get_fake_uuid(2), cursor['uuid'])
+        self.assertIn('created_at', cursor)
+        self.assertIn('id', cursor)
+
     def test_get_servers_with_limit_bad_value(self):
         req = fakes.HTTPRequest.blank('/fake/servers?limit=aaa')
         self.assertRaises(webob.exc.HTTPBadRequest,
@@ -221,6 +221,42 @@ class JSONDictSerializerTest(test.NoDBTestCase):
         self.assertEqual(result, expected_json)
 
 
+class StreamingJSONDictSerializerTest(test.NoDBTestCase):
+    def test_json_without_list(self):
+        serializer = wsgi.StreamingJSONDictSerializer()
+        result = serializer.serialize(dict(server=dict(a=(2, 3))))
+        self.assertIsInstance(result, six.string_types)
+        self.assertEqual({'server': {'a': [2, 3]}}, jsonutils.loads(result))
+
+    def test_json_streams_lists(self):
+        input_dict = dict(servers=[dict(id=i) for i in range(3)],
+                          servers_links=[], other=dict(a=1))
+        serializer = wsgi.StreamingJSONDictSerializer()
+        result = serializer.serialize(input_dict)
+        self.assertNotIsInstance(result, six.string_types)
+        self.assertEqual(input_dict, jsonutils.loads(''.join(result)))
+
+    def test_json_streams_generator(self):
+        def servers():
+            for i in range(3):
+                yield dict(id=i)
+
+        serializer = wsgi.StreamingJSONDictSerializer()
+        result = ''.join(serializer.serialize(dict(servers=servers())))
+        self.assertEqual({'servers': [{'id': 0}, {'id': 1}, {'id': 2}]},
+                         jsonutils.loads(result))
+
+    def test_json_chunks(self):
+        input_dict = dict(servers=[dict(name='x' * 10) for i in range(10)])
+        serializer = wsgi.StreamingJSONDictSerializer()
+        serializer.chunk_size = 50
+        chunks = list(serializer.serialize(input_dict))
+        self.assertTrue(len(chunks) > 1)
+        for chunk in chunks[:-1]:
+            self.assertTrue(len(chunk) >= 50)
+        self.assertEqual(input_dict, jsonutils.loads(''.join(chunks)))
+
+
 class TextDeserializerTest(test.NoDBTestCase):
     def test_dispatch_default(self):
         deserializer = wsgi.TextDeserializer()
@@ -356,6 +392,29 @@ class ResourceTest(test.NoDBTestCase):
         self.assertEqual(response.body, 'success')
         self.assertEqual(response.status_int, 200)
 
+    def test_resource_call_json_streaming(self):
+        self.flags(osapi_json_streaming=True)
+
+        class Controller(object):
+            def index(self, req):
+                return {'tests': [{'id': 1}, {'id': 2}]}
+
+        app = fakes.TestRouterV21(Controller())
+        req = webob.Request.blank('/tests')
+        response = req.get_response(app)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual({'tests': [{'id': 1}, {'id': 2}]},
+                         jsonutils.loads(response.body))
+
+    def test_resource_json_streaming_serializer(self):
+        resource = wsgi.Resource(None)
+        self.assertEqual(wsgi.JSONDictSerializer,
+                         resource.default_serializers['json'])
+        self.flags(osapi_json_streaming=True)
+        resource = wsgi.Resource(None)
+        self.assertEqual(wsgi.StreamingJSONDictSerializer,
+                         resource.default_serializers['json'])
+
     def test_resource_call_with_method_post(self):
         class Controller(object):
             @extensions.expected_errors(400)
@@ -1142,6 +1201,18 @@ class ResponseObjectTest(test.NoDBTestCase):
             self.assertEqual(response.status_int, 202)
             self.assertEqual(response.body, mtype)
 
+    def test_serialize_streamed(self):
+        class StreamingSerializer(object):
+            def serialize(self, obj):
+                return iter(['{"tests": [', '1, 2', ']}'])
+
+        robj = wsgi.ResponseObject({'tests': [1, 2]},
+                                   json=StreamingSerializer)
+        request = wsgi.Request.blank('/tests')
+        response = robj.serialize(request, 'application/json')
+        self.assertIsNone(response.content_length)
+        self.assertEqual('{"tests": [1, 2]}', response.body)
+
 
 class ValidBodyTest(test.NoDBTestCase):
 
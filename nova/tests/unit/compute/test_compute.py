@@ -152,6 +152,7 @@ class BaseTestCase(test.TestCase):
 
     def setUp(self):
         super(BaseTestCase, self).setUp()
+        availability_zones.reset_cache()
         self.flags(network_manager='nova.network.manager.FlatManager')
         fake.set_nodes([NODENAME])
         self.flags(use_local=True, group='conductor')
@@ -6241,6 +6242,54 @@ class ComputeTestCase(BaseTestCase):
     def test_heal_instance_info_cache_with_exception(self):
         self._heal_instance_info_cache(_get_instance_nw_info_raise=True)
 
+    def _heal_host_instances(self):
+        instances = [fake_instance.fake_instance_obj(
+            self.context, uuid='fake-uuid-%s' % x, host=self.compute.host,
+            vm_state=vm_states.ACTIVE, task_state=None) for x in range(3)]
+        instances[0].vm_state = vm_states.BUILDING
+        instances[1].task_state = task_states.DELETING
+        return instances
+
+    @mock.patch.object(network_api.API, 'get_instance_nw_info')
+    @mock.patch.object(network_api.API, 'refresh_instances_nw_info')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_host_wide(self, mock_get_by_host,
+                                                mock_refresh,
+                                                mock_get_nw_info):
+        self.flags(heal_instance_info_cache_interval=-1,
+                   heal_instance_info_cache_host_wide=True)
+        ctxt = context.get_admin_context()
+        instances = self._heal_host_instances()
+        mock_get_by_host.return_value = instances
+        mock_refresh.return_value = instances[2:]
+
+        self.compute._heal_instance_info_cache(ctxt)
+
+        mock_get_by_host.assert_called_once_with(
+            ctxt, self.compute.host, expected_attrs=['info_cache'],
+            use_slave=True)
+        # Building and deleting instances are skipped
+        mock_refresh.assert_called_once_with(ctxt, instances[2:])
+        self.assertFalse(mock_get_nw_info.called)
+
+    @mock.patch.object(network_api.API, 'get_instance_nw_info')
+    @mock.patch.object(network_api.API, 'refresh_instances_nw_info',
+                       side_effect=NotImplementedError)
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_host_wide_not_supported(
+            self, mock_get_by_host, mock_refresh, mock_get_nw_info):
+        self.flags(heal_instance_info_cache_interval=-1,
+                   heal_instance_info_cache_host_wide=True)
+        ctxt = context.get_admin_context()
+        instances = self._heal_host_instances()
+        mock_get_by_host.return_value = instances
+
+        self.compute._heal_instance_info_cache(ctxt)
+
+        mock_refresh.assert_called_once_with(ctxt, instances[2:])
+        # The cache of one instance is refreshed instead
+        mock_get_nw_info.assert_called_once_with(ctxt, instances[2])
+
     @mock.patch('nova.objects.InstanceList.get_by_filters')
     @mock.patch('nova.compute.api.API.unrescue')
     def test_poll_rescued_instances(self, unrescue, get):
@@ -9835,6 +9884,24 @@ class ComputeAPITestCase(BaseTestCase):
         self.assertEqual(1, len(migrations))
         self.assertEqual(migrations[0].id, migration['id'])
 
+    def test_get_migrations_in_batches(self):
+        db_migrations = [test_migration.fake_db_migration(id=i)
+                         for i in range(1, 4)]
+        filters = {'host': 'host1'}
+        with mock.patch.object(db, 'migration_get_all_by_filters',
+                               side_effect=[db_migrations[:2],
+                                            db_migrations[2:]]) as mock_get:
+            migrations = self.compute_api.get_migrations_in_batches(
+                self.context, filters, 2)
+            self.assertFalse(mock_get.called)
+            self.assertEqual(1, next(migrations).id)
+            self.assertEqual(2, next(migrations).id)
+            self.assertEqual(1, mock_get.call_count)
+            self.assertEqual([3], [m.id for m in migrations])
+            mock_get.assert_has_calls([
+                mock.call(self.context, filters, limit=2, marker=None),
+                mock.call(self.context, filters, limit=2, marker=2)])
+
 
 class ComputeAPIIpFilterTestCase(test.NoDBTestCase):
     '''Verifies the IP filtering in the compute API.'''
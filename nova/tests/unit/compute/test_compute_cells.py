@@ -265,6 +265,17 @@ class CellsComputeAPITestCase(test_compute.ComputeAPITestCase):
 
         self.assertEqual(migrations, response)
 
+    def test_get_migrations_in_batches(self):
+        filters = {'cell_name': 'ChildCell', 'status': 'confirmed'}
+        migrations = [{'id': 1234}, {'id': 5678}]
+        with mock.patch.object(self.compute_api.cells_rpcapi,
+                               'get_migrations',
+                               return_value=migrations) as mock_get:
+            response = self.compute_api.get_migrations_in_batches(
+                self.context, filters, 1)
+            self.assertEqual(migrations, list(response))
+            mock_get.assert_called_once_with(self.context, filters)
+
     def test_create_block_device_mapping(self):
         instance_type = {'swap': 1, 'ephemeral_gb': 1}
         instance = self._create_fake_instance_obj()
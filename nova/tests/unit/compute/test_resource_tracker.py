@@ -21,6 +21,7 @@ import uuid
 import mock
 from oslo_config import cfg
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 
 from nova.compute import flavors
 from nova.compute import resource_tracker
@@ -820,6 +821,38 @@ class SchedulerClientTrackerTestCase(BaseTrackerTestCase):
         self.assertFalse(update.called, "update_resource_stats should not be "
                                         "called when there is no change")
 
+    def test_update_resource_counts(self):
+        counts = dict(self.tracker.update_counts)
+        self.tracker._update(self.context)
+        self.tracker.compute_node['local_gb_used'] += 1
+        self.tracker._update(self.context)
+        self.tracker._update(self.context)
+        self.assertEqual(counts['written'] + 1,
+                         self.tracker.update_counts['written'])
+        self.assertEqual(counts['skipped'] + 2,
+                         self.tracker.update_counts['skipped'])
+
+    def test_update_resource_max_quiet_interval(self):
+        self.flags(compute_node_update_max_quiet_interval=60)
+        update = self.tracker.scheduler_client.update_resource_stats
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.tracker._update(self.context)
+        self.assertFalse(update.called)
+
+        timeutils.advance_time_seconds(61)
+        self.tracker._update(self.context)
+        self.assertEqual(1, update.call_count)
+
+    def test_update_resource_no_max_quiet_interval(self):
+        self.flags(compute_node_update_max_quiet_interval=0)
+        update = self.tracker.scheduler_client.update_resource_stats
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.advance_time_seconds(3600)
+        self.tracker._update(self.context)
+        self.assertFalse(update.called)
+
 
 class TrackerPciStatsTestCase(BaseTrackerTestCase):
 
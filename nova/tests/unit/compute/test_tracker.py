@@ -958,7 +958,7 @@ class TestUpdateComputeNode(BaseTestCase):
         self.assertFalse(create_node_mock.called)
 
         # The above call to _update() will populate the
-        # RT.old_resources collection with the resources. Here, we check that
+        # RT.old_resources_digest with the resources. Here, we check that
         # if we call _update() again with the same resources, that
         # the scheduler client won't be called again to update those
         # (unchanged) resources for the compute node
@@ -1098,6 +1098,51 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
         self.assertIn('info_cache', result[0])
         self.assertEqual(network_info, result[0]['info_cache']['network_info'])
 
+    def test_instance_get_usage_totals_by_window(self):
+        start = datetime.datetime(2013, 10, 10, 0, 0, 0)
+        stop = start + datetime.timedelta(hours=10)
+        ctxt = context.get_admin_context()
+        other_ctxt = context.RequestContext('user2', 'project2')
+        flavor = {'vcpus': 2, 'memory_mb': 512, 'root_gb': 1,
+                  'ephemeral_gb': 2}
+        # Running for the whole window
+        self.create_instance_with_args(
+            launched_at=start - datetime.timedelta(hours=1), **flavor)
+        # Launched and terminated during the window
+        self.create_instance_with_args(
+            launched_at=start + datetime.timedelta(hours=2),
+            terminated_at=start + datetime.timedelta(hours=5), **flavor)
+        # Terminated before or launched after the window
+        self.create_instance_with_args(
+            launched_at=start - datetime.timedelta(hours=2),
+            terminated_at=start - datetime.timedelta(hours=1), **flavor)
+        self.create_instance_with_args(
+            launched_at=stop + datetime.timedelta(hours=1), **flavor)
+        # Never launched
+        self.create_instance_with_args(**flavor)
+        # Launched during the window in another project
+        self.create_instance_with_args(
+            context=other_ctxt,
+            launched_at=stop - datetime.timedelta(minutes=30), **flavor)
+
+        totals = sqlalchemy_api.instance_get_usage_totals_by_window(
+            ctxt, start, stop)
+        totals = {total['project_id']: total for total in totals}
+        self.assertEqual(set([self.project_id, 'project2']), set(totals))
+        for project_id, hours in ((self.project_id, 13), ('project2', 0.5)):
+            total = totals[project_id]
+            self.assertAlmostEqual(hours, total['hours'], places=3)
+            self.assertAlmostEqual(hours * 2, total['vcpus_hours'], places=3)
+            self.assertAlmostEqual(hours * 512, total['memory_mb_hours'],
+                                   places=3)
+            self.assertAlmostEqual(hours * 3, total['local_gb_hours'],
+                                   places=3)
+
+        totals = sqlalchemy_api.instance_get_usage_totals_by_window(
+            ctxt, start, stop, project_id='project2')
+        self.assertEqual(['project2'],
+                         [total['project_id'] for total in totals])
+
     @mock.patch('nova.db.sqlalchemy.api.instance_get_all_by_filters_sort')
     def test_instance_get_all_by_filters_calls_sort(self,
                                                     mock_get_all_filters_sort):
@@ -1321,6 +1366,18 @@ class MigrationTestCase(test.TestCase):
         dests = [x['dest_compute'] for x in migrations]
         self.assertEqual(['host1', 'host3'], dests)
 
+    def test_get_migrations_by_filters_limit_marker(self):
+        filters = {'source_compute': 'host1'}
+        migrations = db.migration_get_all_by_filters(self.ctxt, filters)
+        self.assertEqual(5, len(migrations))
+        ids = sorted(x['id'] for x in migrations)
+        migrations = db.migration_get_all_by_filters(self.ctxt, filters,
+                                                     limit=3)
+        self.assertEqual(ids[:3], [x['id'] for x in migrations])
+        migrations = db.migration_get_all_by_filters(self.ctxt, filters,
+                                                     limit=3, marker=ids[2])
+        self.assertEqual(ids[3:], [x['id'] for x in migrations])
+
     def test_migration_get_unconfirmed_by_dest_compute(self):
         # Ensure no migrations are returned.
         results = db.migration_get_unconfirmed_by_dest_compute(self.ctxt, 10,
@@ -2082,6 +2139,57 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         instances = db.instance_get_all_by_filters(self.ctxt, {}, limit=0)
         self.assertEqual([], instances)
 
+    def test_instance_get_all_by_filters_sort_pagination_cursor(self):
+        instances = [self.create_instance_with_args() for i in range(4)]
+        # Default sort is created_at desc, id desc
+        instances.reverse()
+        marker = instances[1]
+        cursor = utils.encode_pagination_cursor(
+            {'created_at': marker['created_at'], 'id': marker['id']})
+        result = db.instance_get_all_by_filters_sort(self.ctxt, {},
+                                                     marker=cursor)
+        self.assertEqual([inst['uuid'] for inst in instances[2:]],
+                         [inst['uuid'] for inst in result])
+
+        # Same page as with the uuid of the marker instance
+        result = db.instance_get_all_by_filters_sort(self.ctxt, {},
+                                                     marker=marker['uuid'])
+        self.assertEqual([inst['uuid'] for inst in instances[2:]],
+                         [inst['uuid'] for inst in result])
+
+    def test_instance_get_all_by_filters_sort_cursor_other_keys(self):
+        instances = [self.create_instance_with_args(display_name=name)
+                     for name in ['a', 'b', 'c']]
+        # The cursor lacks the display_name sort key, the instance is looked
+        # up by uuid
+        cursor = utils.encode_pagination_cursor(
+            {'uuid': instances[0]['uuid']})
+        result = db.instance_get_all_by_filters_sort(
+            self.ctxt, {}, marker=cursor, sort_keys=['display_name'],
+            sort_dirs=['asc'])
+        self.assertEqual([inst['uuid'] for inst in instances[1:]],
+                         [inst['uuid'] for inst in result])
+
+    def test_instance_get_all_by_filters_sort_invalid_cursor(self):
+        self.create_instance_with_args()
+        for cursor in ['not-a-cursor',
+                       utils.encode_pagination_cursor({'id': 1}),
+                       utils.encode_pagination_cursor(
+                           {'created_at': 'invalid', 'id': 1})]:
+            self.assertRaises(exception.MarkerNotFound,
+                              db.instance_get_all_by_filters_sort,
+                              self.ctxt, {}, marker=cursor)
+
+    def test_keyset_pagination_filter(self):
+        criterion = sqlalchemy_api._keyset_pagination_filter(
+            models.Instance, ['created_at', 'id'], ['desc', 'desc'],
+            ['2015-01-01 00:00:00', 5])
+        self.assertEqual(
+            'instances.created_at <= :created_at_1 AND '
+            '(instances.created_at < :created_at_2 OR '
+            'instances.created_at = :created_at_3 AND instances.id < :id_1)',
+            str(criterion))
+
     def test_instance_metadata_get_multi(self):
         uuids = [self.create_instance_with_args()['uuid'] for i in range(3)]
         meta = sqlalchemy_api._instance_metadata_get_multi(self.ctxt, uuids)
@@ -4267,18 +4375,18 @@ class FixedIPTestCase(BaseInstanceTypeTestCase):
 
         address = self.create_fixed_ip(network_id=network['id'])
 
-        def fake_first():
-            if mock_first.call_count == 1:
-                return {'network_id': network['id'], 'address': 'invalid',
-                        'instance_uuid': None, 'host': None, 'id': 1}
+        def fake_all():
+            if mock_all.call_count == 1:
+                return [{'network_id': network['id'], 'address': 'invalid',
+                         'instance_uuid': None, 'host': None, 'id': 1}]
             else:
-                return {'network_id': network['id'], 'address': address,
-                        'instance_uuid': None, 'host': None, 'id': 1}
+                return [{'network_id': network['id'], 'address': address,
+                         'instance_uuid': None, 'host': None, 'id': 1}]
 
-        with mock.patch('sqlalchemy.orm.query.Query.first',
-                        side_effect=fake_first) as mock_first:
+        with mock.patch('sqlalchemy.orm.query.Query.all',
+                        side_effect=fake_all) as mock_all:
             db.fixed_ip_associate_pool(self.ctxt, network['id'], instance_uuid)
-            self.assertEqual(2, mock_first.call_count)
+            self.assertEqual(2, mock_all.call_count)
 
         fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
         self.assertEqual(instance_uuid, fixed_ip['instance_uuid'])
@@ -4289,17 +4397,83 @@ class FixedIPTestCase(BaseInstanceTypeTestCase):
 
         self.create_fixed_ip(network_id=network['id'])
 
-        def fake_first():
-            return {'network_id': network['id'], 'address': 'invalid',
-                    'instance_uuid': None, 'host': None, 'id': 1}
+        def fake_all():
+            return [{'network_id': network['id'], 'address': 'invalid',
+                     'instance_uuid': None, 'host': None, 'id': 1}]
 
-        with mock.patch('sqlalchemy.orm.query.Query.first',
-                        side_effect=fake_first) as mock_first:
+        with mock.patch('sqlalchemy.orm.query.Query.all',
+                        side_effect=fake_all) as mock_all:
             self.assertRaises(exception.FixedIpAssociateFailed,
                               db.fixed_ip_associate_pool, self.ctxt,
                               network['id'], instance_uuid)
             # 5 retries + initial attempt
-            self.assertEqual(6, mock_first.call_count)
+            self.assertEqual(6, mock_all.call_count)
+
+    def test_fixed_ip_associate_pool_concurrent_update(self):
+        instance_uuid = self._create_instance()
+        network = db.network_create_safe(self.ctxt, {})
+
+        address1 = self.create_fixed_ip(network_id=network['id'],
+                                        address='192.168.0.1')
+        address2 = self.create_fixed_ip(network_id=network['id'],
+                                        address='192.168.0.2')
+
+        def fake_all():
+            # One of the free ips is taken by a concurrent transaction
+            return [{'network_id': network['id'], 'address': 'invalid',
+                     'instance_uuid': None, 'host': None, 'id': 1},
+                    {'network_id': network['id'], 'address': address2,
+                     'instance_uuid': None, 'host': None, 'id': 2}]
+
+        with mock.patch('sqlalchemy.orm.query.Query.all',
+                        side_effect=fake_all) as mock_all:
+            fixed_ip = db.fixed_ip_associate_pool(self.ctxt, network['id'],
+                                                  instance_uuid)
+            # The other free ip is used without retrying
+            self.assertEqual(1, mock_all.call_count)
+        self.assertEqual(address2, fixed_ip['address'])
+        fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address1)
+        self.assertIsNone(fixed_ip['instance_uuid'])
+
+    def test_fixed_ip_bulk_associate_pool_succeeds(self):
+        instance_uuid = self._create_instance()
+        network1 = db.network_create_safe(self.ctxt, {})
+        network2 = db.network_create_safe(self.ctxt, {})
+        for i in range(1, 3):
+            self.create_fixed_ip(network_id=network1['id'],
+                                 address='192.168.0.%d' % i)
+        self.create_fixed_ip(network_id=network2['id'],
+                             address='192.168.1.1')
+
+        network_ids = [network1['id'], network2['id'], network1['id']]
+        fixed_ips = db.fixed_ip_bulk_associate_pool(self.ctxt, network_ids,
+                                                    instance_uuid)
+        self.assertEqual(network_ids,
+                         [fixed_ip['network_id'] for fixed_ip in fixed_ips])
+        self.assertEqual(3, len(set(fixed_ip['address']
+                                    for fixed_ip in fixed_ips)))
+        for fixed_ip in fixed_ips:
+            fixed_ip = db.fixed_ip_get_by_address(self.ctxt,
+                                                  fixed_ip['address'])
+            self.assertEqual(instance_uuid, fixed_ip['instance_uuid'])
+
+    def test_fixed_ip_bulk_associate_pool_no_more_fixed_ips(self):
+        instance_uuid = self._create_instance()
+        network1 = db.network_create_safe(self.ctxt, {})
+        network2 = db.network_create_safe(self.ctxt, {})
+        address = self.create_fixed_ip(network_id=network1['id'])
+
+        self.assertRaises(exception.NoMoreFixedIps,
+                          db.fixed_ip_bulk_associate_pool, self.ctxt,
+                          [network1['id'], network2['id']], instance_uuid)
+        # Nothing is associated when one of the networks is full
+        fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
+        self.assertIsNone(fixed_ip['instance_uuid'])
+
+    def test_fixed_ip_bulk_associate_pool_invalid_uuid(self):
+        self.assertRaises(exception.InvalidUUID,
+                          db.fixed_ip_bulk_associate_pool,
+                          self.ctxt, [1], '123')
 
     def test_fixed_ip_create_same_address(self):
         address = '192.168.1.5'
@@ -4416,6 +4590,25 @@ class FixedIPTestCase(BaseInstanceTypeTestCase):
         self.assertIsNone(fixed_ip_data['instance_uuid'])
         self.assertIsNone(fixed_ip_data['virtual_interface_id'])
 
+    def test_fixed_ip_bulk_disassociate(self):
+        instance_uuid = self._create_instance()
+        other_instance_uuid = self._create_instance()
+        network_id = db.network_create_safe(self.ctxt, {})['id']
+        addresses = ['192.168.1.5', '192.168.1.6', '192.168.1.7']
+        for address in addresses[:2]:
+            self.create_fixed_ip(address=address, network_id=network_id,
+                                 instance_uuid=instance_uuid)
+        self.create_fixed_ip(address=addresses[2], network_id=network_id,
+                             instance_uuid=other_instance_uuid)
+
+        db.fixed_ip_bulk_disassociate(self.ctxt, instance_uuid, addresses)
+        for address in addresses[:2]:
+            fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
+            self.assertIsNone(fixed_ip['instance_uuid'])
+        # The fixed ips of other instances are left alone
+        fixed_ip = db.fixed_ip_get_by_address(self.ctxt, addresses[2])
+        self.assertEqual(other_instance_uuid, fixed_ip['instance_uuid'])
+
     def test_fixed_ip_get_not_found_exception(self):
         self.assertRaises(exception.FixedIpNotFound,
                           db.fixed_ip_get, self.ctxt, 0)
@@ -5579,6 +5772,28 @@ class BlockDeviceMappingTestCase(test.TestCase):
         bmd = db.block_device_mapping_get_all_by_instance(self.ctxt, uuid2)
         self.assertEqual(len(bmd), 2)
 
+    def test_block_device_mapping_get_all_by_instance_uuids(self):
+        uuid1 = self.instance['uuid']
+        uuid2 = db.instance_create(self.ctxt, {})['uuid']
+        uuid3 = db.instance_create(self.ctxt, {})['uuid']
+
+        bmds_values = [{'instance_uuid': uuid1,
+                        'device_name': '/dev/vda'},
+                       {'instance_uuid': uuid2,
+                        'device_name': '/dev/vdb'},
+                       {'instance_uuid': uuid3,
+                        'device_name': '/dev/vdc'}]
+
+        for bdm in bmds_values:
+            self._create_bdm(bdm)
+
+        bmds = db.block_device_mapping_get_all_by_instance_uuids(
+            self.ctxt, [uuid1, uuid2])
+        self.assertEqual(['/dev/vda', '/dev/vdb'],
+                         sorted(bdm['device_name'] for bdm in bmds))
+        self.assertEqual([], db.block_device_mapping_get_all_by_instance_uuids(
+            self.ctxt, []))
+
     def test_block_device_mapping_destroy(self):
         bdm = self._create_bdm({})
         db.block_device_mapping_destroy(self.ctxt, bdm['id'])
@@ -6770,6 +6985,47 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self._assertEqualListsOfObjects(expected, result,
                                         ignored_keys=['stats'])
 
+    def test_compute_node_get_all_changed_since(self):
+        since = timeutils.utcnow() + datetime.timedelta(seconds=5)
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual([], nodes)
+
+        with mock.patch.object(timeutils, 'utcnow',
+                               return_value=since):
+            db.compute_node_update(self.ctxt, self.item['id'],
+                                   {'vcpus_used': 1})
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(1, len(nodes))
+        self.assertEqual(self.item['id'], nodes[0]['id'])
+        self.assertEqual(1, nodes[0]['vcpus_used'])
+
+    def test_compute_node_get_all_changed_since_created(self):
+        since = timeutils.utcnow() - datetime.timedelta(seconds=5)
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(1, len(nodes))
+        self.assertEqual(self.item['id'], nodes[0]['id'])
+
+    def test_compute_node_get_all_columns(self):
+        nodes = db.compute_node_get_all_columns(
+            self.ctxt, ['id', 'host', 'vcpus_used'])
+        self.assertEqual([{'id': self.item['id'],
+                           'host': self.item['host'],
+                           'vcpus_used': self.item['vcpus_used']}], nodes)
+
+    def test_compute_node_get_all_columns_since(self):
+        since = timeutils.utcnow() + datetime.timedelta(seconds=5)
+        nodes = db.compute_node_get_all_columns(self.ctxt, ['id'],
+                                                since=since)
+        self.assertEqual([], nodes)
+
+        with mock.patch.object(timeutils, 'utcnow',
+                               return_value=since):
+            db.compute_node_update(self.ctxt, self.item['id'],
+                                   {'vcpus_used': 1})
+        nodes = db.compute_node_get_all_columns(self.ctxt, ['id'],
+                                                since=since)
+        self.assertEqual([{'id': self.item['id']}], nodes)
+
     def test_compute_node_get_all_by_host_with_distinct_hosts(self):
         # Create another service with another node
         service2 = self.service_dict.copy()
@@ -8073,6 +8329,97 @@ class ArchiveTestCase(test.TestCase):
         self._assert_shadow_tables_empty_except(
             'shadow_instance_id_mappings')
 
+    def _create_deleted_instance_id_mappings(self):
+        for uuidstr in self.uuidstrs:
+            ins_stmt = self.instance_id_mappings.insert().values(uuid=uuidstr)
+            self.conn.execute(ins_stmt)
+        # Set 4 to deleted
+        update_statement = self.instance_id_mappings.update().\
+                where(self.instance_id_mappings.c.uuid.in_(self.uuidstrs[:4]))\
+                .values(deleted=1)
+        self.conn.execute(update_statement)
+        qiim = sql.select([self.instance_id_mappings.c.id]).where(
+            self.instance_id_mappings.c.uuid.in_(self.uuidstrs[:4])).\
+            order_by(self.instance_id_mappings.c.id)
+        return [row[0] for row in self.conn.execute(qiim)]
+
+    @mock.patch.object(sqlalchemy_api.time, 'sleep')
+    def test_archive_deleted_rows_in_batches(self, mock_sleep):
+        self._create_deleted_instance_id_mappings()
+        table_stats = db.archive_deleted_rows(self.context, batch_size=3,
+                                              throttle=0.5)
+        self.assertEqual(['instance_id_mappings'], list(table_stats))
+        self.assertEqual(4, table_stats['instance_id_mappings'][0])
+        # One sleep between the batch of 3 rows and the one of 1 row
+        mock_sleep.assert_called_once_with(0.5)
+        qsiim = sql.select([self.shadow_instance_id_mappings]).\
+                where(self.shadow_instance_id_mappings.c.uuid.in_(
+                                                                self.uuidstrs))
+        rows = self.conn.execute(qsiim).fetchall()
+        self.assertEqual(4, len(rows))
+        self._assert_shadow_tables_empty_except(
+            'shadow_instance_id_mappings')
+
+    def test_archive_deleted_rows_key_range(self):
+        for uuidstr in self.uuidstrs:
+            ins_stmt = self.instance_id_mappings.insert().values(uuid=uuidstr)
+            self.conn.execute(ins_stmt)
+        # Every other row is deleted, the batches of 2 deleted rows span
+        # rows which are not deleted
+        deleted_uuids = self.uuidstrs[::2]
+        update_statement = self.instance_id_mappings.update().\
+                where(self.instance_id_mappings.c.uuid.in_(deleted_uuids))\
+                .values(deleted=1)
+        self.conn.execute(update_statement)
+
+        table_stats = db.archive_deleted_rows(self.context, batch_size=2)
+        self.assertEqual(len(deleted_uuids),
+                         table_stats['instance_id_mappings'][0])
+        qiim = sql.select([self.instance_id_mappings.c.uuid]).where(
+            self.instance_id_mappings.c.uuid.in_(self.uuidstrs))
+        self.assertEqual(set(self.uuidstrs[1::2]),
+                         set(row[0] for row in self.conn.execute(qiim)))
+        qsiim = sql.select([self.shadow_instance_id_mappings.c.uuid]).where(
+            self.shadow_instance_id_mappings.c.uuid.in_(self.uuidstrs))
+        self.assertEqual(set(deleted_uuids),
+                         set(row[0] for row in self.conn.execute(qsiim)))
+
+    def test_archive_deleted_rows_checkpoint(self):
+        ids = self._create_deleted_instance_id_mappings()
+        checkpoint = {}
+        table_stats = db.archive_deleted_rows(self.context, max_rows=3,
+                                              batch_size=2,
+                                              checkpoint=checkpoint)
+        self.assertEqual(3, table_stats['instance_id_mappings'][0])
+        self.assertEqual({'instance_id_mappings': ids[2]}, checkpoint)
+
+        # Resume from the checkpoint
+        table_stats = db.archive_deleted_rows(self.context, batch_size=2,
+                                              checkpoint=checkpoint)
+        self.assertEqual(1, table_stats['instance_id_mappings'][0])
+        self.assertEqual({}, checkpoint)
+        qsiim = sql.select([self.shadow_instance_id_mappings.c.id]).\
+                where(self.shadow_instance_id_mappings.c.uuid.in_(
+                                                                self.uuidstrs))
+        self.assertEqual(ids, sorted(row[0] for row in
+                                     self.conn.execute(qsiim)))
+
+    def test_archive_deleted_rows_fk_order(self):
+        # consoles.pool_id depends on console_pools.id, consoles must be
+        # archived first
+        ins_stmt = self.console_pools.insert().values(deleted=1)
+        result = self.conn.execute(ins_stmt)
+        ins_stmt = self.consoles.insert().values(
+            deleted=1, pool_id=result.inserted_primary_key[0])
+        self.conn.execute(ins_stmt)
+        table_stats = db.archive_deleted_rows(self.context)
+        self.assertEqual(set(['consoles', 'console_pools']),
+                         set(table_stats))
+        self._assert_shadow_tables_empty_except(
+            'shadow_console_pools',
+            'shadow_consoles'
+        )
+
     def test_archive_deleted_rows_for_every_uuid_table(self):
         tablenames = []
         for model_class in six.itervalues(models.__dict__):
@@ -0,0 +1,140 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Benchmark for the allocation of fixed ips from a network pool.
+
+Run as a unit test, a few allocations are made to make sure the harness
+keeps working. Run as a script, the given number of instances allocate
+their fixed ips from concurrent green threads and the allocations per
+second are printed. Each instance gets a fixed ip from each of the given
+number of networks, one network at a time and from all of them in bulk,
+e.g.::
+
+    python nova/tests/unit/db/test_fixed_ip_benchmark.py 200 50 2
+"""
+
+import sys
+import time
+
+import eventlet
+import netaddr
+from six.moves import range
+
+from nova import context
+from nova import db
+from nova import test
+from nova.tests.unit import utils as test_utils
+
+INSTANCES = 20
+CONCURRENCY = 5
+NETWORKS = 2
+
+
+class FixedIPBenchmark(object):
+    """Times fixed ip allocations from concurrent green threads."""
+
+    def __init__(self, ctxt, num_instances, num_networks=1):
+        self.context = ctxt
+        self.num_instances = num_instances
+        self.network_ids = []
+        for n in range(num_networks):
+            network = db.network_create_safe(ctxt, {})
+            cidr = netaddr.IPNetwork('10.%d.0.0/16' % n)
+            db.fixed_ip_bulk_create(ctxt, [
+                {'address': str(cidr[i]), 'network_id': network['id']}
+                for i in range(1, num_instances + 1)])
+            self.network_ids.append(network['id'])
+        self.instance_uuids = [db.instance_create(ctxt, {})['uuid']
+                               for _ in range(num_instances)]
+
+    def _allocate(self, instance_uuid):
+        return [db.fixed_ip_associate_pool(self.context, network_id,
+                                           instance_uuid)
+                for network_id in self.network_ids]
+
+    def _allocate_bulk(self, instance_uuid):
+        return db.fixed_ip_bulk_associate_pool(self.context,
+                                               self.network_ids,
+                                               instance_uuid)
+
+    def run(self, concurrency, bulk=False):
+        """Allocate the fixed ips of every instance, return a report dict."""
+        allocate = self._allocate_bulk if bulk else self._allocate
+        pool = eventlet.GreenPool(concurrency)
+        start = time.time()
+        addresses = [str(fixed_ip['address'])
+                     for fixed_ips in pool.imap(allocate, self.instance_uuids)
+                     for fixed_ip in fixed_ips]
+        elapsed = time.time() - start
+        return {
+            'mode': 'bulk' if bulk else 'single',
+            'instances': self.num_instances,
+            'networks': len(self.network_ids),
+            'concurrency': concurrency,
+            'addresses': addresses,
+            'allocations_per_sec': len(addresses) / max(elapsed, 1e-6),
+        }
+
+
+def format_report(report):
+    return ('%(instances)d instances, %(networks)d networks, '
+            '%(concurrency)d concurrent, %(mode)s: '
+            '%(allocations_per_sec).1f allocations/sec' % report)
+
+
+class FixedIPBenchmarkTestCase(test.TestCase):
+    """Runs the fixed ip allocation benchmark, small by default."""
+
+    def setUp(self):
+        super(FixedIPBenchmarkTestCase, self).setUp()
+        self.context = context.get_admin_context()
+
+    def add_report(self, report):
+        """Replaced by run_benchmark() to collect the reports."""
+
+    def _run(self, num_networks, bulk=False):
+        benchmark = FixedIPBenchmark(self.context, INSTANCES, num_networks)
+        report = benchmark.run(CONCURRENCY, bulk=bulk)
+        self.add_report(report)
+        self.assertEqual(INSTANCES * num_networks,
+                         len(set(report['addresses'])))
+        for instance_uuid in benchmark.instance_uuids:
+            self.assertEqual(num_networks, len(db.fixed_ip_get_by_instance(
+                self.context, instance_uuid)))
+
+    def test_benchmark_associate_pool(self):
+        self._run(1)
+
+    def test_benchmark_associate_pool_networks(self):
+        self._run(NETWORKS)
+
+    def test_benchmark_bulk_associate_pool_networks(self):
+        self._run(NETWORKS, bulk=True)
+
+
+if __name__ == '__main__':
+    # The number of instances, the concurrency and the number of networks
+    # can be given on the command line, e.g. "200 50 2"
+    if len(sys.argv) > 1:
+        INSTANCES = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        CONCURRENCY = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        NETWORKS = int(sys.argv[3])
+    test_utils.run_benchmark(FixedIPBenchmarkTestCase,
+                             ['test_benchmark_associate_pool',
+                              'test_benchmark_associate_pool_networks',
+                              'test_benchmark_bulk_associate_pool_networks'],
+                             format_report)
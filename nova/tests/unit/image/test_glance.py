@@ -262,6 +262,50 @@ class TestCreateGlanceClient(test.NoDBTestCase):
                                           **expected_params)
 
 
+class TestGetAdminContext(test.NoDBTestCase):
+    def setUp(self):
+        super(TestGetAdminContext, self).setUp()
+        glance.reset_state()
+        self.addCleanup(glance.reset_state)
+
+    @mock.patch('keystoneclient.auth.load_from_conf_options',
+                return_value=None)
+    def test_get_admin_context_no_auth_plugin(self, mock_load_auth):
+        ctx = glance.get_admin_context()
+
+        mock_load_auth.assert_called_once_with(CONF, 'glance')
+        self.assertTrue(ctx.is_admin)
+        self.assertIsNone(ctx.auth_token)
+
+    @mock.patch('keystoneclient.session.Session.load_from_conf_options')
+    @mock.patch('keystoneclient.auth.load_from_conf_options')
+    def test_get_admin_context(self, mock_load_auth, mock_load_session):
+        auth_plugin = mock_load_auth.return_value
+        auth_plugin.get_token.return_value = 'token'
+        auth_plugin.get_user_id.return_value = 'user'
+        auth_plugin.get_project_id.return_value = 'project'
+
+        ctx = glance.get_admin_context()
+
+        mock_load_auth.assert_called_once_with(CONF, 'glance')
+        mock_load_session.assert_called_once_with(CONF, 'glance')
+        auth_plugin.get_token.assert_called_once_with(
+            mock_load_session.return_value)
+        self.assertTrue(ctx.is_admin)
+        self.assertEqual('token', ctx.auth_token)
+        self.assertEqual('user', ctx.user_id)
+        self.assertEqual('project', ctx.project_id)
+
+        # The auth plugin and the session are reused, the token is asked for
+        # again as the plugin renews it when it expires
+        auth_plugin.get_token.return_value = 'new-token'
+        ctx = glance.get_admin_context()
+
+        self.assertEqual(1, mock_load_auth.call_count)
+        self.assertEqual(1, mock_load_session.call_count)
+        self.assertEqual('new-token', ctx.auth_token)
+
+
 class TestGlanceClientWrapper(test.NoDBTestCase):
     @mock.patch('time.sleep')
     @mock.patch('nova.image.glance._create_glance_client')
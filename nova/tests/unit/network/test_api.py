@@ -566,6 +566,13 @@ class TestUpdateInstanceCache(test.NoDBTestCase):
         db_mock.assert_called_once_with(self.context, self.instance.uuid,
                                         {'network_info': self.nw_json})
 
+    @mock.patch('nova.api.metadata.cache.invalidate')
+    def test_update_nw_info_invalidates_metadata_cache(self, invalidate_mock,
+                                                       db_mock, api_mock):
+        base_api.update_instance_cache_with_nw_info(api_mock, self.context,
+                                               self.instance, self.nw_info)
+        invalidate_mock.assert_called_once_with(self.instance.uuid)
+
     def test_update_nw_info_empty_list(self, db_mock, api_mock):
         api_mock._get_instance_nw_info.return_value = self.nw_info
         base_api.update_instance_cache_with_nw_info(api_mock, self.context,
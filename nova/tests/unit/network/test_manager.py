@@ -827,6 +827,76 @@ class FlatNetworkTestCase(test.TestCase):
                     '9d2ee1e3-ffad-4e5f-81ff-c96dd97b0ee0', network)
         self.assertFalse(mock_fixedip.called, str(mock_fixedip.mock_calls))
 
+    @mock.patch('nova.objects.FixedIPList.bulk_associate_pool')
+    def test_allocate_fixed_ips_bulk_associates_pools(self, mock_associate):
+        fips = [objects.FixedIP(address=netaddr.IPAddress('192.168.0.100')),
+                objects.FixedIP(address=netaddr.IPAddress('192.168.1.100'))]
+        mock_associate.return_value = objects.FixedIPList(objects=fips)
+        with mock.patch.object(self.network,
+                               'allocate_fixed_ip') as mock_allocate:
+            self.network._allocate_fixed_ips(self.context, FAKEUUID, HOST,
+                                             networks)
+        mock_associate.assert_called_once_with(self.context, [0, 1],
+                                               FAKEUUID)
+        self.assertEqual([
+            mock.call(self.context, FAKEUUID, networks[0], fixed_ip=fips[0]),
+            mock.call(self.context, FAKEUUID, networks[1], fixed_ip=fips[1]),
+            ], mock_allocate.call_args_list)
+
+    @mock.patch('nova.objects.FixedIPList.bulk_associate_pool')
+    def test_allocate_fixed_ips_single_pool(self, mock_associate):
+        requested_networks = objects.NetworkRequestList(
+            objects=[objects.NetworkRequest(network_id=networks[0]['uuid'],
+                                            address='192.168.0.100')])
+        with mock.patch.object(self.network,
+                               'allocate_fixed_ip') as mock_allocate:
+            self.network._allocate_fixed_ips(
+                self.context, FAKEUUID, HOST, networks,
+                requested_networks=requested_networks)
+        self.assertFalse(mock_associate.called)
+        self.assertEqual([
+            mock.call(self.context, FAKEUUID, networks[0],
+                      address=netaddr.IPAddress('192.168.0.100')),
+            mock.call(self.context, FAKEUUID, networks[1], address=None),
+            ], mock_allocate.call_args_list)
+
+    @mock.patch('nova.objects.FixedIPList.bulk_disassociate')
+    @mock.patch('nova.objects.FixedIPList.bulk_associate_pool')
+    def test_allocate_fixed_ips_bulk_releases_pending(self, mock_associate,
+                                                      mock_disassociate):
+        fips = [objects.FixedIP(address=netaddr.IPAddress('192.168.0.100')),
+                objects.FixedIP(address=netaddr.IPAddress('192.168.1.100'))]
+        mock_associate.return_value = objects.FixedIPList(objects=fips)
+        with mock.patch.object(self.network, 'allocate_fixed_ip',
+                               side_effect=[None, test.TestingException]):
+            self.assertRaises(test.TestingException,
+                              self.network._allocate_fixed_ips,
+                              self.context, FAKEUUID, HOST, networks)
+        mock_disassociate.assert_called_once_with(
+            self.context, FAKEUUID, [fips[1].address])
+
+    @mock.patch('nova.objects.VirtualInterface.delete_by_instance_uuid')
+    @mock.patch('nova.objects.FixedIPList.bulk_disassociate')
+    @mock.patch('nova.network.manager.NetworkManager.deallocate_fixed_ip')
+    @mock.patch('nova.objects.FixedIPList.get_by_instance_uuid')
+    def test_deallocate_for_instance_bulk_disassociates(self, mock_get,
+            mock_deallocate, mock_disassociate, mock_delete_vifs):
+        instance = fake_instance.fake_instance_obj(self.context)
+        mock_get.return_value = objects.FixedIPList(objects=[
+            objects.FixedIP(address=netaddr.IPAddress('192.168.0.100'),
+                            network_id=0),
+            objects.FixedIP(address=netaddr.IPAddress('192.168.1.100'),
+                            network_id=1)])
+        self.network.deallocate_for_instance(self.context, instance=instance)
+        self.assertEqual([
+            mock.call(self.context, '192.168.0.100', instance.host,
+                      instance=instance),
+            mock.call(self.context, '192.168.1.100', instance.host,
+                      instance=instance),
+            ], mock_deallocate.call_args_list)
+        mock_disassociate.assert_called_once_with(
+            self.context, instance.uuid, ['192.168.0.100', '192.168.1.100'])
+
 
 class FlatDHCPNetworkTestCase(test.TestCase):
 
@@ -1004,6 +1074,34 @@ class VlanNetworkTestCase(test.TestCase):
                                          net['id'])
         mock_save.assert_called_once_with()
 
+    @mock.patch('nova.network.manager.VlanManager._setup_network_on_host')
+    @mock.patch('nova.network.manager.VlanManager.'
+                '_validate_instance_zone_for_dns_domain', return_value=False)
+    @mock.patch('nova.network.manager.VlanManager.'
+                '_do_trigger_security_group_members_refresh_for_instance')
+    @mock.patch('nova.objects.instance.Instance.get_by_uuid')
+    @mock.patch('nova.objects.fixed_ip.FixedIP.associate_pool')
+    @mock.patch('nova.objects.fixed_ip.FixedIP.save')
+    @mock.patch('nova.objects.VirtualInterface.get_by_instance_and_network')
+    def test_allocate_fixed_ip_already_associated(self, mock_get_vif,
+            mock_save, mock_associate_pool, mock_get_uuid, mock_trigger,
+            mock_validate, mock_setup):
+        net = {'cidr': '24', 'id': 1, 'uuid': 'nosuch'}
+        fip = objects.FixedIP(self.context, instance_uuid=FAKEUUID,
+                              address=netaddr.IPAddress('1.2.3.4'))
+        mock_get_vif.return_value = objects.VirtualInterface(id=1000)
+        mock_get_uuid.return_value = fake_instance.fake_instance_obj(
+            self.context, uuid=FAKEUUID)
+
+        address = self.network.allocate_fixed_ip(self.context_admin,
+                                                 FAKEUUID, net, fixed_ip=fip)
+
+        self.assertEqual(fip.address, address)
+        self.assertFalse(mock_associate_pool.called)
+        self.assertTrue(fip.allocated)
+        self.assertEqual(1000, fip.virtual_interface_id)
+        mock_save.assert_called_once_with()
+
     @mock.patch('nova.objects.instance.Instance.get_by_uuid')
     @mock.patch('nova.objects.fixed_ip.FixedIP.associate')
     def test_allocate_fixed_ip_passes_string_address(self, mock_associate,
@@ -2737,6 +2835,16 @@ class RPCAllocateTestCase(test.NoDBTestCase):
                                                      'fake_network')
         self.assertEqual(rval, address)
 
+    def test_allocate_fixed_ips_local(self):
+        self.rpc_fixed.host = HOST
+        with mock.patch.object(self.rpc_fixed,
+                               '_allocate_local_fixed_ips') as mock_allocate:
+            self.rpc_fixed._allocate_fixed_ips(self.context, FAKEUUID, HOST,
+                                               networks, vpn=False)
+        mock_allocate.assert_called_once_with(
+            self.context, FAKEUUID,
+            [(networks[0], None), (networks[1], None)], vpn=False)
+
 
 class TestFloatingIPManager(floating_ips.FloatingIP,
         network_manager.NetworkManager):
@@ -595,23 +595,20 @@ class TestNeutronv2Base(test.TestCase):
         nets = number == 1 and self.nets1 or self.nets2
         self.moxed_client.list_networks(
             id=net_ids).AndReturn({'networks': nets})
-        for i in range(1, number + 1):
-            float_data = number == 1 and self.float_data1 or self.float_data2
-            for ip in port_data[i - 1]['fixed_ips']:
-                float_data = [x for x in float_data
-                              if x['fixed_ip_address'] == ip['ip_address']]
-                self.moxed_client.list_floatingips(
-                    fixed_ip_address=ip['ip_address'],
-                    port_id=port_data[i - 1]['id']).AndReturn(
-                        {'floatingips': float_data})
-            subnet_data = i == 1 and self.subnet_data1 or self.subnet_data2
-            self.moxed_client.list_subnets(
-                id=mox.SameElementsAs(['my_subid%s' % i])).AndReturn(
-                    {'subnets': subnet_data})
-            self.moxed_client.list_ports(
-                network_id=subnet_data[0]['network_id'],
-                device_owner='network:dhcp').AndReturn(
-                    {'ports': []})
+        float_data = number == 1 and self.float_data1 or self.float_data2
+        self.moxed_client.list_floatingips(
+            port_id=[port['id'] for port in port_data]).AndReturn(
+                {'floatingips': float_data})
+        subnet_data = self.subnet_data1
+        if number == 2:
+            subnet_data = subnet_data + self.subnet_data2
+        self.moxed_client.list_subnets(
+            id=['my_subid%s' % i for i in range(1, number + 1)]).AndReturn(
+                {'subnets': subnet_data})
+        self.moxed_client.list_ports(
+            network_id=[subnet['network_id'] for subnet in subnet_data],
+            device_owner='network:dhcp').AndReturn(
+                {'ports': []})
         self.mox.ReplayAll()
 
         self.instance['info_cache'] = self._fake_instance_info_cache(
@@ -764,29 +761,28 @@ class TestNeutronv2(TestNeutronv2Base):
                 for iface in ifaces]
             port_ids = [iface['id'] for iface in ifaces] + port_ids
 
-        index = 0
-
         current_neutron_port_map = {}
         for current_neutron_port in current_neutron_ports:
             current_neutron_port_map[current_neutron_port['id']] = (
                 current_neutron_port)
-        for port_id in port_ids:
-            current_neutron_port = current_neutron_port_map.get(port_id)
-            if current_neutron_port:
-                for ip in current_neutron_port['fixed_ips']:
-                    self.moxed_client.list_floatingips(
-                        fixed_ip_address=ip['ip_address'],
-                        port_id=current_neutron_port['id']).AndReturn(
-                            {'floatingips': [self.float_data2[index]]})
-                    self.moxed_client.list_subnets(
-                        id=mox.SameElementsAs([ip['subnet_id']])
-                        ).AndReturn(
-                            {'subnets': [self.subnet_data_n[index]]})
-                    self.moxed_client.list_ports(
-                        network_id=current_neutron_port['network_id'],
-                        device_owner='network:dhcp').AndReturn(
-                        {'ports': self.dhcp_port_data1})
-                    index += 1
+        ports = [current_neutron_port_map[port_id] for port_id in port_ids
+                 if port_id in current_neutron_port_map]
+        index = len(ports)
+        if ports:
+            # The floating ips and subnets of all the ports are looked up
+            # at once.
+            self.moxed_client.list_floatingips(
+                port_id=[port['id'] for port in ports]).AndReturn(
+                    {'floatingips': self.float_data2[:index]})
+            subnet_data = self.subnet_data_n[:index]
+            self.moxed_client.list_subnets(
+                id=[ip['subnet_id'] for port in ports
+                    for ip in port['fixed_ips']]).AndReturn(
+                        {'subnets': subnet_data})
+            self.moxed_client.list_ports(
+                network_id=[subnet['network_id'] for subnet in subnet_data],
+                device_owner='network:dhcp').AndReturn(
+                    {'ports': self.dhcp_port_data1})
         self.mox.ReplayAll()
 
         self.instance['info_cache'] = network_cache
@@ -1394,13 +1390,10 @@ class TestNeutronv2(TestNeutronv2Base):
         self.moxed_client.list_networks(id=net_ids).AndReturn(
             {'networks': nets})
         float_data = number == 1 and self.float_data1 or self.float_data2
-        for data in port_data[1:]:
-            for ip in data['fixed_ips']:
-                self.moxed_client.list_floatingips(
-                    fixed_ip_address=ip['ip_address'],
-                    port_id=data['id']).AndReturn(
-                        {'floatingips': float_data[1:]})
-        for port in port_data[1:]:
+        if port_data[1:]:
+            self.moxed_client.list_floatingips(
+                port_id=[port['id'] for port in port_data[1:]]).AndReturn(
+                    {'floatingips': float_data[1:]})
             self.moxed_client.list_subnets(id=['my_subid2']).AndReturn({})
 
         self.mox.ReplayAll()
@@ -2309,30 +2302,49 @@ class TestNeutronv2(TestNeutronv2Base):
         NeutronNotFound = exceptions.NeutronClientException(
             status_code=404)
         self.moxed_client.list_floatingips(
-            fixed_ip_address='1.1.1.1', port_id=1).AndRaise(NeutronNotFound)
+            port_id=[1]).AndRaise(NeutronNotFound)
+        self.mox.ReplayAll()
+        neutronapi.get_client('fake')
+        floatingips = api._get_floating_ips_by_ports(self.moxed_client, [1])
+        self.assertEqual(floatingips, {})
+
+    def test_get_floating_ips_by_ports(self):
+        api = neutronapi.API()
+        self.moxed_client.list_floatingips(
+            port_id=['my_portid1', 'my_portid2']).AndReturn(
+                {'floatingips': self.float_data2})
+        self.mox.ReplayAll()
+        neutronapi.get_client('fake')
+        floatingips = api._get_floating_ips_by_ports(
+            self.moxed_client, ['my_portid1', 'my_portid2'])
+        self.assertEqual({'my_portid1': [self.float_data2[0]],
+                          'my_portid2': [self.float_data2[1]]}, floatingips)
+
+    def test_get_floating_ips_by_ports_no_ports(self):
+        api = neutronapi.API()
         self.mox.ReplayAll()
         neutronapi.get_client('fake')
-        floatingips = api._get_floating_ips_by_fixed_and_port(
-            self.moxed_client, '1.1.1.1', 1)
-        self.assertEqual(floatingips, [])
+        self.assertEqual({}, api._get_floating_ips_by_ports(
+            self.moxed_client, []))
 
     def test_nw_info_get_ips(self):
         fake_port = {
             'fixed_ips': [
-                {'ip_address': '1.1.1.1'}],
+                {'ip_address': '1.1.1.1'},
+                {'ip_address': '2.2.2.2'}],
             'id': 'port-id',
             }
+        fake_floatingips = [{'fixed_ip_address': '1.1.1.1',
+                             'floating_ip_address': '10.0.0.1'}]
         api = neutronapi.API()
-        self.mox.StubOutWithMock(api, '_get_floating_ips_by_fixed_and_port')
-        api._get_floating_ips_by_fixed_and_port(
-            self.moxed_client, '1.1.1.1', 'port-id').AndReturn(
-                [{'floating_ip_address': '10.0.0.1'}])
         self.mox.ReplayAll()
         neutronapi.get_client('fake')
-        result = api._nw_info_get_ips(self.moxed_client, fake_port)
-        self.assertEqual(len(result), 1)
+        result = api._nw_info_get_ips(fake_port, fake_floatingips)
+        self.assertEqual(len(result), 2)
         self.assertEqual(result[0]['address'], '1.1.1.1')
         self.assertEqual(result[0]['floating_ips'][0]['address'], '10.0.0.1')
+        self.assertEqual(result[1]['address'], '2.2.2.2')
+        self.assertEqual(result[1]['floating_ips'], [])
 
     def test_nw_info_get_subnets(self):
         fake_port = {
@@ -2345,7 +2357,7 @@ class TestNeutronv2(TestNeutronv2Base):
         fake_ips = [model.IP(x['ip_address']) for x in fake_port['fixed_ips']]
         api = neutronapi.API()
         self.mox.StubOutWithMock(api, '_get_subnets_from_port')
-        api._get_subnets_from_port(self.context, fake_port).AndReturn(
+        api._get_subnets_from_port(self.context, fake_port, None).AndReturn(
             [fake_subnet])
         self.mox.ReplayAll()
         neutronapi.get_client('fake')
@@ -2460,7 +2472,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': True,
              'status': 'ACTIVE',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:01',
              'binding:vif_type': model.VIF_TYPE_BRIDGE,
              'binding:vnic_type': model.VNIC_TYPE_NORMAL,
@@ -2471,7 +2484,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': False,
              'status': 'DOWN',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:02',
              'binding:vif_type': model.VIF_TYPE_BRIDGE,
              'binding:vnic_type': model.VNIC_TYPE_NORMAL,
@@ -2482,7 +2496,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': True,
              'status': 'DOWN',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:03',
              'binding:vif_type': model.VIF_TYPE_BRIDGE,
              'binding:vnic_type': model.VNIC_TYPE_NORMAL,
@@ -2493,7 +2508,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': True,
              'status': 'ACTIVE',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:04',
              'binding:vif_type': model.VIF_TYPE_HW_VEB,
              'binding:vnic_type': model.VNIC_TYPE_DIRECT,
@@ -2507,7 +2523,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': True,
              'status': 'ACTIVE',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:05',
              'binding:vif_type': model.VIF_TYPE_802_QBH,
              'binding:vnic_type': model.VNIC_TYPE_MACVTAP,
@@ -2522,7 +2539,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': True,
              'status': 'ACTIVE',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:06',
              'binding:vif_type': model.VIF_TYPE_BRIDGE,
              # No binding:vnic_type
@@ -2550,16 +2568,25 @@ class TestNeutronv2(TestNeutronv2Base):
             tenant_id='fake', device_id='uuid').AndReturn(
                 {'ports': fake_ports})
 
-        self.mox.StubOutWithMock(api, '_get_floating_ips_by_fixed_and_port')
+        self.mox.StubOutWithMock(api, '_get_floating_ips_by_ports')
+        self.mox.StubOutWithMock(api, '_get_ipam_subnets')
         self.mox.StubOutWithMock(api, '_get_subnets_from_port')
         requested_ports = [fake_ports[2], fake_ports[0], fake_ports[1],
                            fake_ports[3], fake_ports[4], fake_ports[5]]
+        fake_floatingips = {
+            port['id']: [{'fixed_ip_address': '1.1.1.1',
+                          'floating_ip_address': '10.0.0.1'}]
+            for port in requested_ports}
+        fake_ipam_subnets = {'subnet-id': {'id': 'subnet-id'}}
+        api._get_floating_ips_by_ports(
+            self.moxed_client,
+            [port['id'] for port in requested_ports]).AndReturn(
+                fake_floatingips)
+        api._get_ipam_subnets(self.moxed_client, ['subnet-id']).AndReturn(
+            fake_ipam_subnets)
         for requested_port in requested_ports:
-            api._get_floating_ips_by_fixed_and_port(
-                self.moxed_client, '1.1.1.1', requested_port['id']).AndReturn(
-                    [{'floating_ip_address': '10.0.0.1'}])
-        for requested_port in requested_ports:
-            api._get_subnets_from_port(self.context, requested_port
+            api._get_subnets_from_port(self.context, requested_port,
+                                       fake_ipam_subnets
                 ).AndReturn(fake_subnets)
 
         self.mox.StubOutWithMock(api, '_get_preexisting_port_ids')
@@ -2621,6 +2648,8 @@ class TestNeutronv2(TestNeutronv2Base):
         self.assertFalse(nw_infos[4]['preserve_on_delete'])
         self.assertTrue(nw_infos[5]['preserve_on_delete'])
 
+    @mock.patch('nova.network.neutronv2.api.API._get_ipam_subnets')
+    @mock.patch('nova.network.neutronv2.api.API._get_floating_ips_by_ports')
     @mock.patch('nova.network.neutronv2.api.API._nw_info_get_subnets')
     @mock.patch('nova.network.neutronv2.api.API._nw_info_get_ips')
     @mock.patch('nova.network.neutronv2.api.API._nw_info_build_network')
@@ -2631,7 +2660,9 @@ class TestNeutronv2(TestNeutronv2Base):
             mock_get_preexisting_port_ids,
             mock_nw_info_build_network,
             mock_nw_info_get_ips,
-            mock_nw_info_get_subnets):
+            mock_nw_info_get_subnets,
+            mock_get_floating_ips_by_ports,
+            mock_get_ipam_subnets):
         api = neutronapi.API()
 
         fake_inst = objects.Instance()
@@ -2645,7 +2676,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': True,
              'status': 'ACTIVE',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:01',
              'binding:vif_type': model.VIF_TYPE_BRIDGE,
              'binding:vnic_type': model.VNIC_TYPE_NORMAL,
@@ -2665,6 +2697,8 @@ class TestNeutronv2(TestNeutronv2Base):
         mock_nw_info_build_network.return_value = (None, None)
         mock_nw_info_get_ips.return_value = []
         mock_nw_info_get_subnets.return_value = fake_subnets
+        mock_get_floating_ips_by_ports.return_value = {}
+        mock_get_ipam_subnets.return_value = {}
 
         self.mox.ReplayAll()
         neutronapi.get_client('fake')
@@ -2686,7 +2720,7 @@ class TestNeutronv2(TestNeutronv2Base):
             id=[port_data['fixed_ips'][0]['subnet_id']]
         ).AndReturn({'subnets': subnet_data1})
         self.moxed_client.list_ports(
-            network_id=subnet_data1[0]['network_id'],
+            network_id=[subnet_data1[0]['network_id']],
             device_owner='network:dhcp').AndReturn({'ports': []})
         self.mox.ReplayAll()
 
@@ -2699,6 +2733,45 @@ class TestNeutronv2(TestNeutronv2Base):
         self.assertEqual(subnets[0]['routes'][0]['gateway']['address'],
                          subnet_data1[0]['host_routes'][0]['nexthop'])
 
+    def test_get_ipam_subnets(self):
+        api = neutronapi.API()
+        subnet_data = self.subnet_data1 + self.subnet_data2
+        self.moxed_client.list_subnets(
+            id=['my_subid1', 'my_subid2']).AndReturn(
+                {'subnets': subnet_data})
+        self.moxed_client.list_ports(
+            network_id=['my_netid1', 'my_netid2'],
+            device_owner='network:dhcp').AndReturn(
+                {'ports': self.dhcp_port_data1})
+        self.mox.ReplayAll()
+        neutronapi.get_client('fake')
+
+        ipam_subnets = api._get_ipam_subnets(self.moxed_client,
+                                             ['my_subid1', 'my_subid2'])
+
+        self.assertEqual(['my_subid1', 'my_subid2'],
+                         sorted(ipam_subnets.keys()))
+        self.assertEqual('10.0.1.9',
+                         ipam_subnets['my_subid1']['dhcp_server'])
+        self.assertNotIn('dhcp_server', ipam_subnets['my_subid2'])
+        self.assertNotIn('dhcp_server', self.subnet_data1[0])
+
+    def test_get_subnets_from_port_with_ipam_subnets(self):
+        api = neutronapi.API()
+        ipam_subnets = {'my_subid1': dict(self.subnet_data1[0],
+                                          dhcp_server='10.0.1.9')}
+        self.mox.ReplayAll()
+        neutronapi.get_client('fake')
+
+        subnets = api._get_subnets_from_port(self.context,
+                                             self.port_data1[0],
+                                             ipam_subnets)
+
+        self.assertEqual(1, len(subnets))
+        self.assertEqual('10.0.1.0/24', subnets[0]['cidr'])
+        self.assertEqual('10.0.1.9', subnets[0]['meta']['dhcp_server'])
+        self.assertEqual(2, len(subnets[0]['dns']))
+
     def test_get_all_empty_list_networks(self):
         api = neutronapi.API()
         self.moxed_client.list_networks().AndReturn({'networks': []})
@@ -2814,6 +2887,114 @@ class TestNeutronv2WithMock(test.TestCase):
                           api.get_instance_nw_info, 'context', instance)
         mock_lock.assert_called_once_with('refresh_cache-%s' % instance.uuid)
 
+    def _fake_refresh_instances(self):
+        instances = []
+        for i in range(2):
+            info_cache = objects.InstanceInfoCache(
+                network_info=model.NetworkInfo())
+            instances.append(objects.Instance(uuid='inst-%s' % i,
+                                              project_id='fake-project',
+                                              info_cache=info_cache))
+        ports = [{'id': 'port-%s' % i,
+                  'device_id': 'inst-%s' % i,
+                  'tenant_id': 'fake-project',
+                  'network_id': 'net-id',
+                  'admin_state_up': True,
+                  'status': 'ACTIVE',
+                  'mac_address': 'de:ad:be:ef:00:0%s' % i,
+                  'fixed_ips': [{'ip_address': '10.0.0.%s' % (i + 2),
+                                 'subnet_id': 'subnet-id'}]}
+                 for i in range(2)]
+        # A port of the instance owned by another project is ignored.
+        ports.append(dict(ports[1], id='port-2', tenant_id='other-project'))
+
+        def _fake_list_ports(**search_opts):
+            if search_opts.get('device_owner') == 'network:dhcp':
+                return {'ports': []}
+            return {'ports': ports}
+
+        mock_client = mock.Mock()
+        mock_client.list_ports.side_effect = _fake_list_ports
+        mock_client.list_floatingips.return_value = {'floatingips': []}
+        mock_client.list_networks.return_value = {'networks': [
+            {'id': 'net-id', 'name': 'private',
+             'tenant_id': 'fake-project'}]}
+        mock_client.list_subnets.return_value = {'subnets': [
+            {'id': 'subnet-id', 'cidr': '10.0.0.0/24',
+             'network_id': 'net-id', 'gateway_ip': '10.0.0.1'}]}
+        return instances, mock_client
+
+    @mock.patch.object(objects.InstanceInfoCache, 'get_by_instance_uuid')
+    @mock.patch('nova.network.base_api.update_instance_cache_with_nw_info')
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_refresh_instances_nw_info(self, mock_get_client, mock_update,
+                                       mock_get_cache):
+        instances, mock_client = self._fake_refresh_instances()
+        mock_get_client.return_value = mock_client
+        mock_get_cache.return_value = objects.InstanceInfoCache(
+            network_info=model.NetworkInfo())
+
+        updated = self.api.refresh_instances_nw_info(self.context, instances)
+
+        self.assertEqual(instances, updated)
+        mock_client.list_ports.assert_has_calls([
+            mock.call(device_id=['inst-0', 'inst-1']),
+            mock.call(network_id=['net-id'], device_owner='network:dhcp')])
+        mock_client.list_floatingips.assert_called_once_with(
+            port_id=mock.ANY)
+        self.assertEqual(
+            ['port-0', 'port-1'],
+            sorted(mock_client.list_floatingips.call_args[1]['port_id']))
+        mock_client.list_subnets.assert_called_once_with(id=['subnet-id'])
+        # The caches are empty, the networks of the ports are looked up
+        mock_client.list_networks.assert_called_once_with(id=['net-id'])
+        self.assertEqual(2, mock_update.call_count)
+        for i, instance in enumerate(instances):
+            nw_info = mock_update.call_args_list[i][1]['nw_info']
+            self.assertEqual(['port-%s' % i], [vif['id'] for vif in nw_info])
+            self.assertEqual(['private'],
+                             [vif['network']['label'] for vif in nw_info])
+            self.assertEqual(['10.0.0.%s' % (i + 2)],
+                             [ip['address'] for ip in nw_info.fixed_ips()])
+
+    @mock.patch.object(objects.InstanceInfoCache, 'get_by_instance_uuid')
+    @mock.patch('nova.network.base_api.update_instance_cache_with_nw_info')
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_refresh_instances_nw_info_unchanged(self, mock_get_client,
+                                                 mock_update, mock_get_cache):
+        instances, mock_client = self._fake_refresh_instances()
+        mock_get_client.return_value = mock_client
+        mock_get_cache.return_value = objects.InstanceInfoCache(
+            network_info=model.NetworkInfo())
+
+        with mock.patch.object(self.api, '_nw_info_build_vifs',
+                               return_value=model.NetworkInfo()):
+            updated = self.api.refresh_instances_nw_info(self.context,
+                                                         instances)
+
+        self.assertEqual([], updated)
+        self.assertFalse(mock_update.called)
+
+    @mock.patch.object(objects.InstanceInfoCache, 'get_by_instance_uuid')
+    @mock.patch('nova.network.base_api.update_instance_cache_with_nw_info')
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_refresh_instances_nw_info_cache_changed(self, mock_get_client,
+                                                     mock_update,
+                                                     mock_get_cache):
+        instances, mock_client = self._fake_refresh_instances()
+        mock_get_client.return_value = mock_client
+        # The cache of the first instance was updated while the ports were
+        # being fetched, the second one is gone.
+        mock_get_cache.side_effect = [
+            objects.InstanceInfoCache(network_info=model.NetworkInfo(
+                [model.VIF(id='port-0')])),
+            exception.InstanceInfoCacheNotFound(instance_uuid='inst-1')]
+
+        updated = self.api.refresh_instances_nw_info(self.context, instances)
+
+        self.assertEqual([], updated)
+        self.assertFalse(mock_update.called)
+
     def _test_validate_networks_fixed_ip_no_dup(self, nets, requested_networks,
                                                 ids, list_port_values):
 
@@ -314,6 +314,25 @@ class _TestBlockDeviceMappingListObject(object):
                     self.context, 'fake_instance_uuid'))
         self.assertEqual(0, len(bdm_list))
 
+    @mock.patch.object(db, 'block_device_mapping_get_all_by_instance_uuids')
+    def test_get_by_instance_uuids(self, get_all_by_uuids):
+        fakes = [self.fake_bdm(123), self.fake_bdm(456)]
+        fakes[1]['instance_uuid'] = 'other-instance'
+        get_all_by_uuids.return_value = fakes
+        bdm_list = objects.BlockDeviceMappingList.get_by_instance_uuids(
+            self.context, ['fake-instance', 'other-instance'])
+        get_all_by_uuids.assert_called_once_with(
+            self.context, ['fake-instance', 'other-instance'],
+            use_slave=False)
+        self.assertEqual([123, 456], [bdm.id for bdm in bdm_list])
+        bdms_by_uuid = bdm_list.group_by_instance_uuid()
+        self.assertEqual(set(['fake-instance', 'other-instance']),
+                         set(bdms_by_uuid))
+        self.assertEqual([123],
+                         [bdm.id for bdm in bdms_by_uuid['fake-instance']])
+        self.assertEqual([456],
+                         [bdm.id for bdm in bdms_by_uuid['other-instance']])
+
     def test_root_volume_metadata(self):
         fake_volume = {
                 'volume_image_metadata': {'vol_test_key': 'vol_test_value'}}
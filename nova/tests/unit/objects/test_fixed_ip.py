@@ -273,6 +273,23 @@ class _TestFixedIPObject(object):
                                      [{'address': '192.168.1.1'},
                                       {'address': '192.168.1.2'}])
 
+    @mock.patch('nova.db.fixed_ip_bulk_associate_pool')
+    def test_bulk_associate_pool(self, associate):
+        associate.return_value = [fake_fixed_ip]
+        fixedips = fixed_ip.FixedIPList.bulk_associate_pool(
+            self.context, [123], 'fake-uuid', 'host')
+        associate.assert_called_once_with(self.context, [123], 'fake-uuid',
+                                          host='host')
+        self.assertEqual(1, len(fixedips))
+        self._compare(fixedips[0], fake_fixed_ip)
+
+    @mock.patch('nova.db.fixed_ip_bulk_disassociate')
+    def test_bulk_disassociate(self, disassociate):
+        fixed_ip.FixedIPList.bulk_disassociate(
+            self.context, 'fake-uuid', ['192.168.1.1', '192.168.1.2'])
+        disassociate.assert_called_once_with(self.context, 'fake-uuid',
+                                             ['192.168.1.1', '192.168.1.2'])
+
     @mock.patch('nova.db.network_get_associated_fixed_ips')
     def test_get_by_network(self, get):
         info = {'address': '1.2.3.4',
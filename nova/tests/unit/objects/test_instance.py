@@ -439,6 +439,22 @@ class _TestInstanceObject(object):
         self.assertNotIn('pci_devices',
                          mock_fdo.call_args_list[0][1]['expected_attrs'])
 
+    @mock.patch('nova.api.metadata.cache.invalidate')
+    @mock.patch('nova.db.instance_update_and_get_original')
+    @mock.patch.object(objects.Instance, '_from_db_object')
+    def test_save_invalidates_metadata_cache(self, mock_fdo, mock_update,
+                                             mock_invalidate):
+        mock_update.return_value = None, None
+        inst = instance.Instance(context=self.context, id=123)
+        inst.uuid = 'foo'
+        inst.save()
+        mock_invalidate.assert_called_once_with('foo')
+
+        # Nothing is invalidated when nothing is saved
+        mock_invalidate.reset_mock()
+        inst.save()
+        self.assertFalse(mock_invalidate.called)
+
     @mock.patch('nova.db.instance_extra_update_by_uuid')
     @mock.patch('nova.db.instance_update_and_get_original')
     @mock.patch.object(objects.Instance, '_from_db_object')
@@ -1598,6 +1614,28 @@ class _TestInstanceListObject(object):
             self.assertIsInstance(obj, instance.Instance)
             self.assertEqual(obj.uuid, fake['uuid'])
 
+    def test_get_usage_totals_by_window(self):
+        totals = [{'project_id': 'fake-project', 'hours': 1.5,
+                   'vcpus_hours': 3.0, 'memory_mb_hours': 768.0,
+                   'local_gb_hours': 15.0}]
+        begin = timeutils.utcnow()
+        end = begin + datetime.timedelta(hours=1)
+
+        def fake_instance_get_usage_totals_by_window(context, begin, end,
+                                                     project_id=None,
+                                                     use_slave=False):
+            # make sure begin and end are tz-aware
+            self.assertIsNotNone(begin.utcoffset())
+            self.assertIsNotNone(end.utcoffset())
+            self.assertEqual('fake-project', project_id)
+            return totals
+
+        with mock.patch.object(db, 'instance_get_usage_totals_by_window',
+                               fake_instance_get_usage_totals_by_window):
+            result = instance.InstanceList.get_usage_totals_by_window(
+                self.context, begin, end, project_id='fake-project')
+        self.assertEqual(totals, result)
+
     def test_with_fault(self):
         fake_insts = [
             fake_instance.fake_db_instance(uuid='fake-uuid', host='host'),
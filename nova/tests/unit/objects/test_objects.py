@@ -1060,10 +1060,10 @@ object_data = {
     'BandwidthUsage': '1.2-c6e4c779c7f40f2407e3d70022e3cd1c',
     'BandwidthUsageList': '1.2-77b4d43e641459f464a6aa4d53debd8f',
     'BlockDeviceMapping': '1.9-72d92c263f03a5cbc1761b0ea4c66c22',
-    'BlockDeviceMappingList': '1.10-972d431e07463ae1f68e752521937b01',
+    'BlockDeviceMappingList': '1.11-7bddfba1050c1b07efad2955cb03bac8',
     'CellMapping': '1.0-7f1a7e85a22bbb7559fc730ab658b9bd',
     'ComputeNode': '1.11-71784d2e6f2814ab467d4e0f69286843',
-    'ComputeNodeList': '1.11-8d269636229e8a39fef1c3514f77d0c0',
+    'ComputeNodeList': '1.12-cac525053a0bb1cc7c4507a415885a09',
     'DNSDomain': '1.0-7b0b2dab778454b6a7b6c66afe163a1a',
     'DNSDomainList': '1.0-f876961b1a6afe400b49cf940671db86',
     'EC2Ids': '1.0-474ee1094c7ec16f8ce657595d8c49d9',
@@ -1071,7 +1071,7 @@ object_data = {
     'EC2SnapshotMapping': '1.0-47e7ddabe1af966dce0cfd0ed6cd7cd1',
     'EC2VolumeMapping': '1.0-5b713751d6f97bad620f3378a521020d',
     'FixedIP': '1.10-b5818a33996228fc146f096d1403742c',
-    'FixedIPList': '1.10-d0db9597559409a4a01b3577500dfe5e',
+    'FixedIPList': '1.11-32b583ef5a1675d3f8fea94b467df289',
     'Flavor': '1.1-b6bb7a730a79d720344accefafacf7ee',
     'FlavorList': '1.1-d96e87307f94062ce538f77b5e221e13',
     'FloatingIP': '1.6-52a67d52d85eb8b3f324a5b7935a335b',
@@ -1090,7 +1090,7 @@ object_data = {
     'InstanceGroup': '1.9-a413a4ec0ff391e3ef0faa4e3e2a96d0',
     'InstanceGroupList': '1.6-1e383df73d9bd224714df83d9a9983bb',
     'InstanceInfoCache': '1.5-cd8b96fefe0fc8d4d337243ba0bf0e1e',
-    'InstanceList': '1.17-64f6949d58e4ecd3219142f1567a61d9',
+    'InstanceList': '1.18-264318ed8c7036d0d54703c83baabc04',
     'InstanceMapping': '1.0-47ef26034dfcbea78427565d9177fe50',
     'InstanceMappingList': '1.0-b7b108f6a56bd100c20a3ebd5f3801a1',
     'InstanceNUMACell': '1.2-535ef30e0de2d6a0d26a71bd58ecafc4',
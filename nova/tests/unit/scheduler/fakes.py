@@ -16,8 +16,15 @@
 Fakes For Scheduler tests.
 """
 
+import uuid
+
+from oslo_utils import timeutils
 import six
+from six.moves import range
 
+from nova.compute import arch
+from nova.compute import hv_type
+from nova.compute import vm_mode
 from nova import objects
 from nova.scheduler import host_manager
 
@@ -92,3 +99,81 @@ class FakeHostState(host_manager.HostState):
             self.instances = {}
         for (key, val) in six.iteritems(attribute_dict):
             setattr(self, key, val)
+
+
+def _get_fleet_numa_topology(cells, cpus_per_cell, memory_per_cell):
+    return objects.NUMATopology(cells=[
+        objects.NUMACell(id=cell,
+                         cpuset=set(range(cell * cpus_per_cell,
+                                          (cell + 1) * cpus_per_cell)),
+                         memory=memory_per_cell, cpu_usage=0,
+                         memory_usage=0, mempages=[], siblings=[],
+                         pinned_cpus=set([]))
+        for cell in range(cells)])
+
+
+def get_fleet(num_hosts, instances_per_host=10, hosts_per_aggregate=100,
+              numa_cells=2, pci_devices=4):
+    """Build a synthetic fleet of HostStates along with its aggregates.
+
+    Every host is populated from a ComputeNode the same way the HostManager
+    does it, belongs to one aggregate with an availability zone and some
+    extra metadata, exposes numa_cells NUMA cells and a pool of pci_devices
+    PCI devices, and runs instances_per_host instances. No database access
+    is needed to build or to schedule against the fleet.
+
+    :returns: a tuple of (list of HostStates, list of Aggregates)
+    """
+    now = timeutils.utcnow()
+    vcpus = 16 * numa_cells
+    memory_mb = 65536 * numa_cells
+    numa_topology = None
+    if numa_cells:
+        numa_topology = _get_fleet_numa_topology(
+            numa_cells, vcpus // numa_cells,
+            memory_mb // numa_cells)._to_json()
+    hv_specs = [objects.HVSpec(arch=arch.X86_64, hv_type=hv_type.KVM,
+                               vm_mode=vm_mode.HVM)]
+
+    aggregates = []
+    host_states = []
+    for index in range(num_hosts):
+        host = 'host%s' % index
+        if index % hosts_per_aggregate == 0:
+            agg_index = len(aggregates)
+            aggregates.append(objects.Aggregate(
+                id=agg_index, name='agg%s' % agg_index, hosts=[],
+                metadata={'availability_zone': 'az%s' % (agg_index % 3),
+                          'ssd': str(agg_index % 2 == 0).lower()}))
+        aggregate = aggregates[-1]
+        aggregate.hosts.append(host)
+
+        pci_device_pools = objects.PciDevicePoolList(objects=[])
+        if pci_devices:
+            pci_device_pools.objects.append(objects.PciDevicePool(
+                product_id='1520', vendor_id='8086', numa_node=0,
+                count=pci_devices, tags={}))
+        used = index % 8
+        compute = objects.ComputeNode(
+            id=index, local_gb=2048, memory_mb=memory_mb, vcpus=vcpus,
+            disk_available_least=2048 - used * 20,
+            free_ram_mb=memory_mb - used * 2048, vcpus_used=used,
+            free_disk_gb=2048 - used * 20, local_gb_used=used * 20,
+            updated_at=None, host=host, hypervisor_hostname=host,
+            host_ip='127.0.0.1', hypervisor_type=hv_type.KVM,
+            hypervisor_version=2000000, numa_topology=numa_topology,
+            supported_hv_specs=hv_specs, pci_device_pools=pci_device_pools,
+            cpu_info=None, metrics=None,
+            stats={'num_instances': str(instances_per_host),
+                   'io_workload': str(index % 4)})
+        host_state = host_manager.HostState(host, host, compute=compute)
+        host_state.service = {'host': host, 'disabled': False,
+                              'updated_at': now, 'created_at': now}
+        host_state.aggregates = [aggregate]
+        host_state.instances = {}
+        for _ in range(instances_per_host):
+            instance = objects.Instance(uuid=str(uuid.uuid4()), host=host,
+                                        node=host)
+            host_state.instances[instance.uuid] = instance
+        host_states.append(host_state)
+    return host_states, aggregates
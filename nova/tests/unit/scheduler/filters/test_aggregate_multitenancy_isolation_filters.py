@@ -12,7 +12,9 @@
 
 import mock
 
+from nova import objects
 from nova.scheduler.filters import aggregate_multitenancy_isolation as ami
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -72,3 +74,22 @@ class TestAggregateMultitenancyIsolationFilter(test.NoDBTestCase):
                                      'project_id': 'my_tenantid'}}}
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
+
+    def test_filter_all_with_index(self, agg_mock):
+        index = utils.AggregateMetadataIndex()
+        index.update_host('host1', [objects.Aggregate(
+            id=1, metadata={'filter_tenant_id': 'my_tenantid,other'})])
+        index.update_host('host2', [objects.Aggregate(
+            id=2, metadata={'filter_tenant_id': 'other_tenantid'})])
+        hosts = []
+        for host in ('host1', 'host2', 'host3'):
+            host_state = fakes.FakeHostState(host, 'compute', {})
+            host_state.aggregate_index = index
+            hosts.append(host_state)
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'request_spec': {
+                                 'instance_properties': {
+                                     'project_id': 'my_tenantid'}}}
+        result = list(self.filt_cls.filter_all(hosts, filter_properties))
+        self.assertEqual(['host1', 'host3'], [host.host for host in result])
+        self.assertFalse(agg_mock.called)
@@ -12,7 +12,9 @@
 
 import mock
 
+from nova import objects
 from nova.scheduler.filters import availability_zone_filter
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -52,3 +54,30 @@ class TestAvailabilityZoneFilter(test.NoDBTestCase):
         request = self._make_zone_request('bad')
         host = fakes.FakeHostState('host1', 'node1', {})
         self.assertFalse(self.filt_cls.host_passes(host, request))
+
+    def _get_hosts_with_index(self):
+        index = utils.AggregateMetadataIndex()
+        index.update_host('host1', [objects.Aggregate(
+            id=1, metadata={'availability_zone': 'az1,az2'})])
+        index.update_host('host2', [objects.Aggregate(
+            id=2, metadata={'availability_zone': 'az3'})])
+        hosts = []
+        for host in ('host1', 'host2', 'host3'):
+            host_state = fakes.FakeHostState(host, 'node', {})
+            host_state.aggregate_index = index
+            hosts.append(host_state)
+        return hosts
+
+    def test_filter_all_with_index(self, agg_mock):
+        agg_mock.return_value = {}
+        hosts = self._get_hosts_with_index()
+        request = self._make_zone_request('az2')
+        result = list(self.filt_cls.filter_all(hosts, request))
+        self.assertEqual(['host1'], [host.host for host in result])
+
+    def test_filter_all_with_index_default_zone(self, agg_mock):
+        agg_mock.return_value = {}
+        hosts = self._get_hosts_with_index()
+        request = self._make_zone_request('nova')
+        result = list(self.filt_cls.filter_all(hosts, request))
+        self.assertEqual(['host3'], [host.host for host in result])
@@ -40,6 +40,35 @@ class TestDiskFilter(test.NoDBTestCase):
                 {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 13})
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
+    def test_disk_filter_filter_all(self):
+        self.flags(disk_allocation_ratio=1.0)
+        filt_cls = disk_filter.DiskFilter()
+        filter_properties = {'instance_type': {'root_gb': 10,
+            'ephemeral_gb': 1, 'swap': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 13})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_disk_mb': 12 * 1024, 'total_usable_disk_gb': 13})
+        result = list(filt_cls.filter_all([host1, host2], filter_properties))
+        self.assertEqual([host2], result)
+        self.assertEqual(13, host2.limits['disk_gb'])
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_disk_filter_filter_all(self, agg_mock):
+        filt_cls = disk_filter.AggregateDiskFilter()
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'instance_type': {'root_gb': 12,
+                                               'ephemeral_gb': 0,
+                                               'swap': 0}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 12})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 12})
+        agg_mock.side_effect = [set(['2.0']), set()]
+        result = list(filt_cls.filter_all([host1, host2], filter_properties))
+        self.assertEqual([host1], result)
+        self.assertEqual(2, agg_mock.call_count)
+
     def test_disk_filter_oversubscribe(self):
         self.flags(disk_allocation_ratio=10.0)
         filt_cls = disk_filter.DiskFilter()
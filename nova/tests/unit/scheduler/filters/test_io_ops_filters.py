@@ -36,6 +36,30 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         filter_properties = {}
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_filter_num_iops_filter_all(self):
+        self.flags(max_io_ops_per_host=8)
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        host1 = fakes.FakeHostState('host1', 'node1',
+                                    {'num_io_ops': 8})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                                    {'num_io_ops': 7})
+        result = list(self.filt_cls.filter_all([host1, host2], {}))
+        self.assertEqual([host2], result)
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_filter_num_iops_filter_all(self, agg_mock):
+        self.flags(max_io_ops_per_host=7)
+        self.filt_cls = io_ops_filter.AggregateIoOpsFilter()
+        host1 = fakes.FakeHostState('host1', 'node1',
+                                    {'num_io_ops': 7})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                                    {'num_io_ops': 7})
+        agg_mock.side_effect = [set(['8']), set([])]
+        filter_properties = {'context': mock.sentinel.ctx}
+        result = list(self.filt_cls.filter_all([host1, host2],
+                                               filter_properties))
+        self.assertEqual([host1], result)
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_filter_num_iops_value(self, agg_mock):
         self.flags(max_io_ops_per_host=7)
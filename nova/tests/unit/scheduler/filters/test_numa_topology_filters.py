@@ -144,3 +144,28 @@ class TestNUMATopologyFilter(test.NoDBTestCase):
         limits = host.limits['numa_topology']
         self.assertEqual(limits.cpu_allocation_ratio, 21)
         self.assertEqual(limits.ram_allocation_ratio, 1.3)
+
+    @mock.patch('nova.virt.hardware.numa_fit_instance_to_host',
+                return_value=mock.sentinel.fitted)
+    def test_numa_topology_filter_caches_fit(self, mock_fit):
+        instance_topology = objects.InstanceNUMATopology(
+            cells=[objects.InstanceNUMACell(id=0, cpuset=set([1]), memory=512),
+                   objects.InstanceNUMACell(id=1, cpuset=set([3]), memory=512)
+               ])
+        instance = fake_instance.fake_instance_obj(mock.sentinel.ctx)
+        instance.numa_topology = instance_topology
+        filter_properties = {
+            'request_spec': {
+                'instance_properties': jsonutils.to_primitive(
+                    obj_base.obj_to_primitive(instance))}}
+        hosts = [fakes.FakeHostState(
+                     host, 'node', {'numa_topology':
+                                    fakes.NUMA_TOPOLOGY._to_json(),
+                                    'pci_stats': None})
+                 for host in ('host1', 'host2')]
+        result = list(self.filt_cls.filter_all(hosts, filter_properties))
+        self.assertEqual(hosts, result)
+        # Both hosts have the same topology and usage
+        self.assertEqual(1, mock_fit.call_count)
+        for host in hosts:
+            self.assertIn('numa_topology', host.limits)
@@ -45,6 +45,19 @@ class TestRamFilter(test.NoDBTestCase):
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         self.assertEqual(2048 * 2.0, host.limits['memory_mb'])
 
+    def test_ram_filter_filter_all(self):
+        self.flags(ram_allocation_ratio=1.0)
+        filter_properties = {'instance_type': {'memory_mb': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': 1024, 'total_usable_ram_mb': 1024})
+        result = list(self.filt_cls.filter_all([host1, host2],
+                                               filter_properties))
+        self.assertEqual([host2], result)
+        self.assertNotIn('memory_mb', host1.limits)
+        self.assertEqual(1024 * 1.0, host2.limits['memory_mb'])
+
 
 @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
 class TestAggregateRamFilter(test.NoDBTestCase):
@@ -53,6 +66,22 @@ class TestAggregateRamFilter(test.NoDBTestCase):
         super(TestAggregateRamFilter, self).setUp()
         self.filt_cls = ram_filter.AggregateRamFilter()
 
+    def test_aggregate_ram_filter_filter_all(self, agg_mock):
+        self.flags(ram_allocation_ratio=1.0)
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'instance_type': {'memory_mb': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024})
+        agg_mock.side_effect = [set(['2.0']), set()]
+        result = list(self.filt_cls.filter_all([host1, host2],
+                                               filter_properties))
+        self.assertEqual([host1], result)
+        self.assertEqual([mock.call(host1, 'ram_allocation_ratio'),
+                          mock.call(host2, 'ram_allocation_ratio')],
+                         agg_mock.call_args_list)
+
     def test_aggregate_ram_filter_value_error(self, agg_mock):
         self.flags(ram_allocation_ratio=1.0)
         filter_properties = {'context': mock.sentinel.ctx,
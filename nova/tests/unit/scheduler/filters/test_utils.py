@@ -114,3 +114,46 @@ class TestUtils(test.NoDBTestCase):
         host_state.instances = {inst1.uuid: inst1}
         self.assertFalse(utils.other_types_on_host(host_state, 1))
         self.assertTrue(utils.other_types_on_host(host_state, 2))
+
+    def _get_index(self):
+        index = utils.AggregateMetadataIndex()
+        index.update_host('fake', _AGGREGATE_FIXTURES)
+        index.update_host('other', _AGGREGATE_FIXTURES[:1])
+        return index
+
+    def test_aggregate_metadata_index_hosts(self):
+        index = self._get_index()
+        self.assertEqual(set(['fake', 'other']), index.hosts_with_key('k1'))
+        self.assertEqual(set(), index.hosts_with_key('k3'))
+        self.assertEqual(set(['fake', 'other']),
+                         index.hosts_with_value('k1', '1'))
+        self.assertEqual(set(['fake']), index.hosts_with_value('k1', '7'))
+        self.assertEqual(set(['fake']), index.hosts_with_value('k2', '9'))
+        self.assertEqual(set(), index.hosts_with_value('k3', '1'))
+
+    def test_aggregate_metadata_index_remove_host(self):
+        index = self._get_index()
+        index.remove_host('fake')
+        self.assertEqual(set(['other']), index.hosts_with_key('k1'))
+        self.assertEqual(set(), index.hosts_with_value('k1', '7'))
+        self.assertEqual({}, index.metadata_get_by_host('fake'))
+
+    def test_aggregate_values_from_key_with_index(self):
+        host_state = fakes.FakeHostState('fake', 'node', {})
+        host_state.aggregate_index = self._get_index()
+
+        values = utils.aggregate_values_from_key(host_state, key_name='k1')
+
+        self.assertEqual(set(['1', '3', '6,7']), values)
+
+    def test_aggregate_metadata_get_by_host_with_index(self):
+        host_state = fakes.FakeHostState('fake', 'node', {})
+        host_state.aggregate_index = self._get_index()
+
+        metadata = utils.aggregate_metadata_get_by_host(host_state, 'k1')
+        # The cached metadata must not be modified by the callers
+        metadata['k1'].add('10')
+
+        metadata = utils.aggregate_metadata_get_by_host(host_state, 'k1')
+        self.assertEqual(set(['1', '3', '7', '6']), metadata['k1'])
+        self.assertEqual(set(['9', '8', '2', '4']), metadata['k2'])
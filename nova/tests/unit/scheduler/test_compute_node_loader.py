@@ -0,0 +1,133 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the compute node loader of the scheduler.
+"""
+
+import datetime
+
+import mock
+from oslo_serialization import jsonutils
+
+from nova import exception
+from nova import objects
+from nova.scheduler import compute_node_loader
+from nova.scheduler import host_manager
+from nova import test
+
+NOW = datetime.datetime(2015, 6, 1, 12, 0, 0)
+
+
+def _fake_row(**updates):
+    row = dict.fromkeys(compute_node_loader.COLUMNS)
+    row.update({
+        'id': 1, 'service_id': 1, 'host': 'host1',
+        'hypervisor_hostname': 'node1', 'updated_at': NOW,
+        'vcpus': 4, 'vcpus_used': 1, 'memory_mb': 2048,
+        'free_ram_mb': 1024, 'local_gb': 100, 'local_gb_used': 10,
+        'free_disk_gb': 90, 'disk_available_least': None,
+        'hypervisor_type': 'QEMU', 'hypervisor_version': 1000,
+        'host_ip': '127.0.0.1', 'cpu_info': '{}',
+        'stats': jsonutils.dumps({'num_instances': 2, 'io_workload': 1}),
+        'supported_instances': jsonutils.dumps([['x86_64', 'kvm', 'hvm']]),
+        'pci_stats': None,
+    })
+    row.update(updates)
+    return row
+
+
+class ComputeNodeLoaderTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ComputeNodeLoaderTestCase, self).setUp()
+        self.context = mock.sentinel.ctx
+        self.loader = compute_node_loader.ComputeNodeLoader()
+
+    @mock.patch('nova.db.compute_node_get_all_columns')
+    def test_get_all(self, mock_get):
+        mock_get.return_value = [_fake_row()]
+        compute_nodes = self.loader.get_all(self.context)
+        mock_get.assert_called_once_with(
+            self.context, compute_node_loader.COLUMNS, since=None)
+        self.assertEqual(1, len(compute_nodes))
+        compute = compute_nodes[0]
+        self.assertEqual('host1', compute.host)
+        self.assertEqual('node1', compute.hypervisor_hostname)
+        self.assertIsNotNone(compute.updated_at.tzinfo)
+        self.assertEqual('127.0.0.1', str(compute.host_ip))
+        self.assertEqual({'num_instances': '2', 'io_workload': '1'},
+                         compute.stats)
+        self.assertEqual([['x86_64', 'kvm', 'hvm']],
+                         [spec.to_list()
+                          for spec in compute.supported_hv_specs])
+        self.assertIsNone(compute.pci_device_pools)
+        self.assertRaises(AttributeError, getattr, compute, 'running_vms')
+
+    @mock.patch('nova.db.compute_node_get_all_columns')
+    def test_get_all_caches_decoded_fields(self, mock_get):
+        mock_get.side_effect = lambda *a, **kw: [_fake_row()]
+        with mock.patch.object(jsonutils, 'loads',
+                               wraps=jsonutils.loads) as mock_decode:
+            # Not decoded until used
+            compute = self.loader.get_all(self.context)[0]
+            self.assertFalse(mock_decode.called)
+            compute.stats['num_instances'] = '3'
+            self.assertEqual('2', compute.stats['num_instances'])
+            compute = self.loader.get_all(self.context)[0]
+            self.assertEqual('2', compute.stats['num_instances'])
+            self.assertEqual(1, mock_decode.call_count)
+
+            # The compute node was updated, the stats are decoded again
+            mock_get.side_effect = lambda *a, **kw: [_fake_row(
+                updated_at=NOW + datetime.timedelta(seconds=1),
+                stats=jsonutils.dumps({'num_instances': 3}))]
+            compute = self.loader.get_all(self.context)[0]
+            self.assertEqual('3', compute.stats['num_instances'])
+            self.assertEqual(2, mock_decode.call_count)
+
+    @mock.patch('nova.db.compute_node_get_all_columns')
+    def test_get_all_forgets_deleted_nodes(self, mock_get):
+        mock_get.return_value = [_fake_row()]
+        self.loader.get_all(self.context)
+        mock_get.return_value = [_fake_row(id=2)]
+        self.loader.get_all(self.context, since=NOW)
+        self.assertEqual(set([1, 2]), set(self.loader._decoded))
+        self.loader.get_all(self.context)
+        self.assertEqual(set([2]), set(self.loader._decoded))
+
+    @mock.patch.object(objects.Service, 'get_by_id')
+    @mock.patch('nova.db.compute_node_get_all_columns')
+    def test_get_all_host_from_service(self, mock_get, mock_service):
+        mock_get.return_value = [_fake_row(host=None, service_id=2),
+                                 _fake_row(id=2, host=None, service_id=3)]
+        mock_service.side_effect = [objects.Service(host='host2'),
+                                    exception.ServiceNotFound(service_id=3)]
+        compute_nodes = self.loader.get_all(self.context)
+        self.assertEqual(['host2', None],
+                         [compute.host for compute in compute_nodes])
+
+    @mock.patch('nova.db.compute_node_get_all_columns')
+    def test_update_host_state(self, mock_get):
+        mock_get.return_value = [_fake_row()]
+        compute = self.loader.get_all(self.context)[0]
+        host_state = host_manager.HostState('host1', 'node1')
+        host_state.update_from_compute_node(compute)
+        self.assertEqual(1024, host_state.free_ram_mb)
+        self.assertEqual(90 * 1024, host_state.free_disk_mb)
+        self.assertEqual(2, host_state.num_instances)
+        self.assertEqual(1, host_state.num_io_ops)
+        self.assertEqual([['x86_64', 'kvm', 'hvm']],
+                         host_state.supported_instances)
+        self.assertEqual(compute.updated_at, host_state.updated)
@@ -16,6 +16,8 @@
 Tests For Filter Scheduler.
 """
 
+import contextlib
+
 import mock
 
 from nova import exception
@@ -328,3 +330,80 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                 # Make sure that the consumed hosts have chance to be reverted.
                 for host in consumed_hosts:
                     self.assertIsNone(host.obj.updated)
+
+    def _get_batch_hosts(self):
+        host1 = fakes.FakeHostState('host1', 'node1', {})
+        host2 = fakes.FakeHostState('host2', 'node2', {})
+        return host1, host2
+
+    @mock.patch.object(host_manager.HostState, 'consume_from_instance')
+    def test_schedule_batch(self, mock_consume):
+        host1, host2 = self._get_batch_hosts()
+        hm = self.driver.host_manager
+        with contextlib.nested(
+            mock.patch.object(hm, 'get_filtered_hosts',
+                              side_effect=fake_get_filtered_hosts),
+            mock.patch.object(hm, 'get_weighed_hosts',
+                              return_value=[weights.WeighedHost(host1, 2.0),
+                                            weights.WeighedHost(host2, 1.0)]),
+            mock.patch.object(hm, 'get_weight_bounds', return_value=[]),
+            mock.patch.object(hm, 'get_weighed_host',
+                              side_effect=lambda host, props, bounds:
+                                  weights.WeighedHost(host, 0.0)),
+        ) as (mock_filter, mock_weigh, mock_bounds, mock_weigh_one):
+            selected = self.driver._schedule_batch(
+                [host1, host2], {}, mock.sentinel.instance, 3, False)
+
+        self.assertEqual([host1, host2, host1],
+                         [weighed_host.obj for weighed_host in selected])
+        # The hosts are only filtered and weighed once, then only the
+        # selected host is filtered and weighed again
+        self.assertEqual(1, mock_weigh.call_count)
+        self.assertEqual(3, mock_filter.call_count)
+        mock_filter.assert_called_with([host2], {}, index=2)
+        self.assertEqual(2, mock_weigh_one.call_count)
+        self.assertEqual(3, mock_consume.call_count)
+
+    def _test_schedule_batch_group(self, policy, num_instances):
+        host1, host2 = self._get_batch_hosts()
+        hm = self.driver.host_manager
+        hm.default_filters = hm._choose_host_filters(
+            ['ServerGroupAntiAffinityFilter', 'ServerGroupAffinityFilter'])
+        filter_properties = {'group_hosts': [], 'group_policies': [policy]}
+        with contextlib.nested(
+            mock.patch.object(host_manager.HostState,
+                              'consume_from_instance'),
+            mock.patch.object(hm, 'get_weighed_hosts',
+                              return_value=[weights.WeighedHost(host1, 2.0),
+                                            weights.WeighedHost(host2, 1.0)]),
+            mock.patch.object(hm, 'get_weight_bounds', return_value=[]),
+            mock.patch.object(hm, 'get_weighed_host',
+                              side_effect=lambda host, props, bounds:
+                                  weights.WeighedHost(host, 3.0)),
+        ):
+            selected = self.driver._schedule_batch(
+                [host1, host2], filter_properties, mock.sentinel.instance,
+                num_instances, True)
+        return [weighed_host.obj.host for weighed_host in selected]
+
+    def test_schedule_batch_anti_affinity(self):
+        self.assertEqual(['host1', 'host2'],
+                         self._test_schedule_batch_group('anti-affinity', 3))
+
+    def test_schedule_batch_affinity(self):
+        self.assertEqual(['host1', 'host1', 'host1'],
+                         self._test_schedule_batch_group('affinity', 3))
+
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule_batch',
+                       return_value=[])
+    @mock.patch.object(filter_scheduler.FilterScheduler,
+                       '_get_all_host_states', return_value=[])
+    def test_schedule_uses_batch_placement(self, mock_get_hosts,
+                                           mock_schedule_batch):
+        self.flags(scheduler_batch_placement=True)
+        instance_properties = {'project_id': 1, 'os_type': 'Linux'}
+        request_spec = dict(instance_properties=instance_properties,
+                            instance_type={}, num_instances=2)
+        self.driver._schedule(self.context, request_spec, {})
+        mock_schedule_batch.assert_called_once_with(
+            [], mock.ANY, instance_properties, 2, False)
@@ -17,10 +17,13 @@ Tests For HostManager
 """
 
 import collections
+import datetime
 
+import iso8601
 import mock
 from oslo_config import cfg
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 import six
 
 import nova
@@ -129,7 +132,7 @@ class HostManagerTestCase(test.NoDBTestCase):
     @mock.patch.object(objects.AggregateList, 'get_all')
     def test_init_aggregates_one_agg_no_hosts(self, agg_get_all,
                                               mock_init_info):
-        fake_agg = objects.Aggregate(id=1, hosts=[])
+        fake_agg = objects.Aggregate(id=1, hosts=[], metadata={})
         agg_get_all.return_value = [fake_agg]
         self.host_manager = host_manager.HostManager()
         self.assertEqual({1: fake_agg}, self.host_manager.aggs_by_id)
@@ -139,7 +142,7 @@ class HostManagerTestCase(test.NoDBTestCase):
     @mock.patch.object(objects.AggregateList, 'get_all')
     def test_init_aggregates_one_agg_with_hosts(self, agg_get_all,
                                                 mock_init_info):
-        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'], metadata={})
         agg_get_all.return_value = [fake_agg]
         self.host_manager = host_manager.HostManager()
         self.assertEqual({1: fake_agg}, self.host_manager.aggs_by_id)
@@ -147,14 +150,14 @@ class HostManagerTestCase(test.NoDBTestCase):
                          self.host_manager.host_aggregates_map)
 
     def test_update_aggregates(self):
-        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'], metadata={})
         self.host_manager.update_aggregates([fake_agg])
         self.assertEqual({1: fake_agg}, self.host_manager.aggs_by_id)
         self.assertEqual({'fake-host': set([1])},
                          self.host_manager.host_aggregates_map)
 
     def test_update_aggregates_remove_hosts(self):
-        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'], metadata={})
         self.host_manager.update_aggregates([fake_agg])
         self.assertEqual({1: fake_agg}, self.host_manager.aggs_by_id)
         self.assertEqual({'fake-host': set([1])},
@@ -167,7 +170,7 @@ class HostManagerTestCase(test.NoDBTestCase):
                          self.host_manager.host_aggregates_map)
 
     def test_delete_aggregate(self):
-        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'], metadata={})
         self.host_manager.host_aggregates_map = collections.defaultdict(
             set, {'fake-host': set([1])})
         self.host_manager.aggs_by_id = {1: fake_agg}
@@ -176,6 +179,31 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual({'fake-host': set([])},
                          self.host_manager.host_aggregates_map)
 
+    def test_update_aggregates_updates_index(self):
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={'availability_zone': 'az1'})
+        self.host_manager.update_aggregates([fake_agg])
+        index = self.host_manager.aggregate_index
+        self.assertEqual(set(['fake-host']),
+                         index.hosts_with_value('availability_zone', 'az1'))
+        # Let's move the aggregate to another host and update again
+        fake_agg.hosts = ['other-host']
+        self.host_manager.update_aggregates([fake_agg])
+        self.assertEqual(set(['other-host']),
+                         index.hosts_with_value('availability_zone', 'az1'))
+        self.assertEqual(set(),
+                         index.values_from_key('fake-host',
+                                               'availability_zone'))
+
+    def test_delete_aggregate_updates_index(self):
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={'availability_zone': 'az1'})
+        self.host_manager.update_aggregates([fake_agg])
+        self.host_manager.delete_aggregate(fake_agg)
+        index = self.host_manager.aggregate_index
+        self.assertEqual(set(), index.hosts_with_key('availability_zone'))
+        self.assertEqual({}, index.metadata_get_by_host('fake-host'))
+
     def test_choose_host_filters_not_found(self):
         self.assertRaises(exception.SchedulerHostFilterNotFound,
                           self.host_manager._choose_host_filters,
@@ -500,7 +528,7 @@ class HostManagerTestCase(test.NoDBTestCase):
         host_state = host_manager.HostState('host1', cn1)
         self.assertFalse(host_state.instances)
         mock_get_by_host.return_value = None
-        hm._add_instance_info(context, cn1, host_state)
+        hm._add_instance_info(context, host_state)
         self.assertFalse(mock_get_by_host.called)
         self.assertTrue(host_state.instances)
         self.assertEqual(host_state.instances['uuid1'], inst1)
@@ -522,7 +550,7 @@ class HostManagerTestCase(test.NoDBTestCase):
         host_state = host_manager.HostState('host1', cn1)
         self.assertFalse(host_state.instances)
         mock_get_by_host.return_value = objects.InstanceList(objects=[inst1])
-        hm._add_instance_info(context, cn1, host_state)
+        hm._add_instance_info(context, host_state)
         mock_get_by_host.assert_called_once_with(context, cn1.host)
         self.assertTrue(host_state.instances)
         self.assertEqual(host_state.instances['uuid1'], inst1)
@@ -751,6 +779,127 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         host_states_map = self.host_manager.host_state_map
         self.assertEqual(len(host_states_map), 0)
 
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_incremental(self, mock_get_by_binary,
+                                             mock_get_all,
+                                             mock_get_changed,
+                                             mock_get_by_host):
+        self.flags(scheduler_incremental_host_states=True)
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_by_binary.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        changed_node = objects.ComputeNode(
+            id=2, local_gb=2048, memory_mb=2048, vcpus=2,
+            disk_available_least=1024, free_ram_mb=256, vcpus_used=2,
+            free_disk_gb=1024, local_gb_used=0,
+            updated_at=timeutils.utcnow().replace(
+                tzinfo=iso8601.iso8601.Utc()),
+            host='host2', hypervisor_hostname='node2', host_ip='127.0.0.1',
+            hypervisor_version=0, numa_topology=None,
+            hypervisor_type='foo', supported_hv_specs=[],
+            pci_device_pools=None, cpu_info=None, stats=None, metrics=None)
+        mock_get_changed.return_value = [changed_node]
+        context = 'fake_context'
+
+        self.host_manager.get_all_host_states(context)
+        last_sync = self.host_manager._last_sync
+        self.host_manager.get_all_host_states(context)
+
+        mock_get_all.assert_called_once_with(context)
+        mock_get_changed.assert_called_once_with(
+            context, last_sync - datetime.timedelta(seconds=60))
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(4, len(host_states_map))
+        self.assertEqual(256, host_states_map[('host2', 'node2')].free_ram_mb)
+        self.assertEqual(512, host_states_map[('host1', 'node1')].free_ram_mb)
+
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_incremental_resync(self, mock_get_by_binary,
+                                                    mock_get_all,
+                                                    mock_get_changed,
+                                                    mock_get_by_host):
+        self.flags(scheduler_incremental_host_states=True,
+                   scheduler_host_states_resync_interval=60)
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_by_binary.return_value = fakes.SERVICES
+        running_nodes = [n for n in fakes.COMPUTE_NODES
+                         if n.get('hypervisor_hostname') != 'node4']
+        mock_get_all.side_effect = [fakes.COMPUTE_NODES, running_nodes]
+        mock_get_changed.return_value = []
+        context = 'fake_context'
+
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(30)
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(4, len(self.host_manager.host_state_map))
+        timeutils.advance_time_seconds(30)
+        self.host_manager.get_all_host_states(context)
+
+        self.assertEqual(2, mock_get_all.call_count)
+        self.assertEqual(1, mock_get_changed.call_count)
+        self.assertEqual(3, len(self.host_manager.host_state_map))
+
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_incremental_reloads_invalidated(
+            self, mock_get_by_binary, mock_get_all, mock_get_changed,
+            mock_get_by_node, mock_get_by_host):
+        self.flags(scheduler_incremental_host_states=True)
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_by_binary.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        mock_get_changed.return_value = []
+        mock_get_by_node.return_value = fakes.COMPUTE_NODES[0]
+        context = 'fake_context'
+
+        self.host_manager.get_all_host_states(context)
+        now = timeutils.utcnow().replace(tzinfo=iso8601.iso8601.Utc())
+        for state_key, host_state in self.host_manager.host_state_map.items():
+            if state_key != ('host1', 'node1'):
+                host_state.updated = now
+        host_state = self.host_manager.host_state_map[('host1', 'node1')]
+        host_state.free_ram_mb = 0
+        self.host_manager.get_all_host_states(context)
+
+        mock_get_by_node.assert_called_once_with(context, 'host1', 'node1')
+        self.assertEqual(512, host_state.free_ram_mb)
+
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_bulk_load(self, mock_get_by_binary,
+                                           mock_get_all, mock_get_by_host):
+        self.flags(scheduler_bulk_load_compute_nodes=True,
+                   scheduler_incremental_host_states=True)
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_by_binary.return_value = fakes.SERVICES
+        context = 'fake_context'
+
+        with mock.patch.object(self.host_manager.compute_node_loader,
+                               'get_all',
+                               return_value=fakes.COMPUTE_NODES) as mock_load:
+            self.host_manager.get_all_host_states(context)
+            last_sync = self.host_manager._last_sync
+            self.host_manager.get_all_host_states(context)
+
+        self.assertFalse(mock_get_all.called)
+        self.assertEqual([mock.call(context),
+                          mock.call(context, since=last_sync -
+                                    datetime.timedelta(seconds=60))],
+                         mock_load.call_args_list)
+        self.assertEqual(4, len(self.host_manager.host_state_map))
+
 
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
@@ -0,0 +1,243 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Benchmark for the FilterScheduler against synthetic fleets.
+
+Run as a unit test, a small fleet is scheduled against to make sure the
+harness keeps working. Run as a script, fleets of the given sizes are built
+and a placement latency report is printed, e.g.::
+
+    python nova/tests/unit/scheduler/test_scheduler_benchmark.py 1000 10000
+"""
+
+import collections
+import copy
+import resource
+import sys
+import time
+
+import mock
+import six
+from six.moves import range
+
+from nova import context
+from nova import objects
+from nova.scheduler import filter_scheduler
+from nova.scheduler import host_manager
+from nova import test
+from nova.tests.unit.scheduler import fakes
+from nova.tests.unit import utils as test_utils
+
+FLEET_SIZES = [50]
+REQUESTS = 5
+
+BENCHMARK_FILTERS = [
+    'RetryFilter',
+    'AvailabilityZoneFilter',
+    'RamFilter',
+    'CoreFilter',
+    'DiskFilter',
+    'ComputeFilter',
+    'ComputeCapabilitiesFilter',
+    'ImagePropertiesFilter',
+    'ServerGroupAntiAffinityFilter',
+    'ServerGroupAffinityFilter',
+    'AggregateInstanceExtraSpecsFilter',
+    'NUMATopologyFilter',
+    'PciPassthroughFilter',
+    'IoOpsFilter',
+    'NumInstancesFilter',
+]
+
+BENCHMARK_WEIGHERS = [
+    'nova.scheduler.weights.ram.RAMWeigher',
+    'nova.scheduler.weights.io_ops.IoOpsWeigher',
+]
+
+
+def _percentile(values, percent):
+    """Return the nearest-rank percentile of a sorted list of values."""
+    if not values:
+        return None
+    rank = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(rank, len(values) - 1))]
+
+
+def _max_rss_kb():
+    # NOTE: ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class SchedulerBenchmark(object):
+    """Times select_destinations() calls against a list of HostStates.
+
+    Each filter and weigher of the scheduler's HostManager is wrapped so the
+    time spent in it is accounted for separately from the overall latency.
+    """
+
+    def __init__(self, driver, host_states):
+        self.driver = driver
+        self.host_states = host_states
+        self.filter_times = collections.defaultdict(float)
+        self.weigher_times = collections.defaultdict(float)
+        hm = driver.host_manager
+        for filter_ in hm.default_filters:
+            self._time_filter(filter_)
+        for weigher in hm.weighers:
+            self._time_weigher(weigher)
+
+    def _time_filter(self, filter_):
+        name = filter_.__class__.__name__
+        filter_all = filter_.filter_all
+
+        def timed_filter_all(filter_obj_list, filter_properties):
+            start = time.time()
+            # NOTE: filter_all() may return a generator, so the hosts are
+            # consumed here for the time to be accounted to the filter.
+            result = filter_all(filter_obj_list, filter_properties)
+            if result is not None:
+                result = list(result)
+            self.filter_times[name] += time.time() - start
+            return result
+
+        filter_.filter_all = timed_filter_all
+
+    def _time_weigher(self, weigher):
+        name = weigher.__class__.__name__
+        weigh_objects = weigher.weigh_objects
+
+        def timed_weigh_objects(weighed_obj_list, weight_properties):
+            start = time.time()
+            result = weigh_objects(weighed_obj_list, weight_properties)
+            self.weigher_times[name] += time.time() - start
+            return result
+
+        weigher.weigh_objects = timed_weigh_objects
+
+    def run(self, ctxt, request_spec, filter_properties, num_requests):
+        """Schedule num_requests times and return a report dict."""
+        latencies = []
+        with mock.patch.object(self.driver, '_get_all_host_states',
+                               return_value=self.host_states):
+            for _ in range(num_requests):
+                start = time.time()
+                self.driver.select_destinations(
+                    ctxt, copy.deepcopy(request_spec),
+                    copy.deepcopy(filter_properties))
+                latencies.append((time.time() - start) * 1000)
+        latencies.sort()
+        return {
+            'hosts': len(self.host_states),
+            'requests': num_requests,
+            'p50_ms': _percentile(latencies, 50),
+            'p99_ms': _percentile(latencies, 99),
+            'filter_ms': {name: total * 1000 / num_requests
+                          for name, total in
+                          six.iteritems(self.filter_times)},
+            'weigher_ms': {name: total * 1000 / num_requests
+                           for name, total in
+                           six.iteritems(self.weigher_times)},
+        }
+
+
+def format_report(report):
+    lines = ['%(hosts)d hosts, %(requests)d requests: '
+             'p50 %(p50_ms).2f ms, p99 %(p99_ms).2f ms, '
+             '%(memory_per_host_kb).2f KB/host' % report]
+    for kind in ('filter_ms', 'weigher_ms'):
+        for name, value in sorted(six.iteritems(report[kind]),
+                                  key=lambda x: x[1], reverse=True):
+            lines.append('    %-40s %10.3f ms/request' % (name, value))
+    return '\n'.join(lines)
+
+
+class SchedulerBenchmarkTestCase(test.NoDBTestCase):
+    """Runs the scheduler benchmark, with a small fleet by default."""
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def setUp(self, mock_init_agg, mock_init_inst):
+        super(SchedulerBenchmarkTestCase, self).setUp()
+        self.flags(scheduler_default_filters=BENCHMARK_FILTERS,
+                   scheduler_weight_classes=BENCHMARK_WEIGHERS,
+                   service_down_time=240)
+        self.driver = filter_scheduler.FilterScheduler()
+        self.context = context.RequestContext('fake_user', 'fake_project')
+
+    def add_report(self, report):
+        """Replaced by run_benchmark() to collect the reports."""
+
+    def _get_request_spec(self):
+        flavor = objects.Flavor(
+            flavorid='bench', memory_mb=2048, root_gb=20, ephemeral_gb=0,
+            swap=0, vcpus=2,
+            extra_specs={'aggregate_instance_extra_specs:ssd': 'true'})
+        numa_topology = objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(id=0, cpuset=set([0, 1]), memory=2048)])
+        instance_properties = {
+            'os_type': 'linux',
+            'project_id': 'fake_project',
+            'availability_zone': 'az0',
+            'memory_mb': 2048,
+            'root_gb': 20,
+            'ephemeral_gb': 0,
+            'vcpus': 2,
+            'numa_topology': numa_topology,
+            'pci_requests': None,
+        }
+        return {
+            'instance_type': flavor,
+            'instance_properties': instance_properties,
+            'image': {'properties': {}},
+            'num_instances': 1,
+        }
+
+    def _get_filter_properties(self):
+        pci_requests = objects.InstancePCIRequests(requests=[
+            objects.InstancePCIRequest(
+                count=1, spec=[{'vendor_id': '8086',
+                                'product_id': '1520'}])])
+        return {'pci_requests': pci_requests}
+
+    def test_benchmark_select_destinations(self):
+        for num_hosts in FLEET_SIZES:
+            rss_before = _max_rss_kb()
+            host_states, _aggregates = fakes.get_fleet(num_hosts)
+            memory_per_host_kb = (
+                float(_max_rss_kb() - rss_before) / num_hosts)
+
+            benchmark = SchedulerBenchmark(self.driver, host_states)
+            report = benchmark.run(self.context, self._get_request_spec(),
+                                   self._get_filter_properties(), REQUESTS)
+            report['memory_per_host_kb'] = memory_per_host_kb
+            self.add_report(report)
+
+            self.assertEqual(num_hosts, report['hosts'])
+            self.assertEqual(REQUESTS, report['requests'])
+            self.assertLessEqual(report['p50_ms'], report['p99_ms'])
+            self.assertEqual(set(BENCHMARK_FILTERS),
+                             set(report['filter_ms']))
+            self.assertEqual(set(['RAMWeigher', 'IoOpsWeigher']),
+                             set(report['weigher_ms']))
+
+
+if __name__ == '__main__':
+    # Fleet sizes can be given on the command line, e.g. "1000 50000"
+    if len(sys.argv) > 1:
+        FLEET_SIZES = [int(arg) for arg in sys.argv[1:]]
+        REQUESTS = 100
+    test_utils.run_benchmark(SchedulerBenchmarkTestCase,
+                             ['test_benchmark_select_destinations'],
+                             format_report)
@@ -17,12 +17,15 @@
 Tests for availability zones
 """
 
+import mock
 from oslo_config import cfg
+from oslo_utils import timeutils
 import six
 
 from nova import availability_zones as az
 from nova import context
 from nova import db
+from nova import objects
 from nova import test
 from nova.tests.unit.api.openstack import fakes
 
@@ -44,6 +47,7 @@ class AvailabilityZoneTestCases(test.TestCase):
         self.default_in_az = CONF.internal_service_availability_zone
         self.context = context.get_admin_context()
         self.agg = self._create_az('az_agg', self.availability_zone)
+        az.reset_cache()
 
     def tearDown(self):
         db.aggregate_delete(self.context, self.agg['id'])
@@ -113,8 +117,9 @@ class AvailabilityZoneTestCases(test.TestCase):
                          self.default_az)
 
         # The service is added into aggregate, confirm return the aggregate
-        # availability zone.
+        # availability zone once the compute API updated the cache.
         self._add_to_aggregate(service, self.agg)
+        az.update_host_availability_zone_cache(self.context, self.host)
         new_service = az.set_availability_zones(self.context, services)[0]
         self.assertEqual(new_service['availability_zone'],
                          self.availability_zone)
@@ -256,3 +261,99 @@ class AvailabilityZoneTestCases(test.TestCase):
 
         self.assertEqual(self.availability_zone,
                 az.get_instance_availability_zone(self.context, fake_inst))
+
+    def test_get_instance_availability_zones(self):
+        """Test get availability zones of instances with one query."""
+        host = 'host180'
+        service = self._create_service_with_topic('compute', host)
+        self._add_to_aggregate(service, self.agg)
+
+        fake_insts = [fakes.stub_instance(181, host=host),
+                      fakes.stub_instance(182, host=host),
+                      fakes.stub_instance(183, host=self.host),
+                      fakes.stub_instance(184, host=None)]
+
+        with mock.patch.object(objects.AggregateList, 'get_by_metadata_key',
+                               wraps=objects.AggregateList.get_by_metadata_key
+                               ) as mock_get_aggs:
+            azs = az.get_instance_availability_zones(self.context,
+                                                     fake_insts)
+            self.assertEqual({host: self.availability_zone,
+                              self.host: self.default_az}, azs)
+            azs = az.get_instance_availability_zones(self.context,
+                                                     fake_insts[2:])
+            self.assertEqual({self.host: self.default_az}, azs)
+        self.assertEqual(1, mock_get_aggs.call_count)
+
+    def test_get_hosts_availability_zones_host_key(self):
+        """Test a host named like the map key gets its own zone."""
+        service = self._create_service_with_topic('compute', 'hosts')
+        self._add_to_aggregate(service, self.agg)
+        az.get_instance_availability_zone(self.context,
+                                          fakes.stub_instance(1, host='hosts'))
+        self.assertEqual({'hosts': self.availability_zone,
+                          self.host: self.default_az},
+                         az.get_hosts_availability_zones(
+                             self.context, ['hosts', self.host]))
+
+    def test_set_availability_zones_multiple_zones(self):
+        """Test a host in several zones gets the zones of the servers."""
+        service = self._create_service_with_topic('compute', self.host)
+        self._add_to_aggregate(service, self.agg)
+        agg_az0 = self._create_az('agg-az0', 'az0')
+        self._add_to_aggregate(service, agg_az0)
+        services = db.service_get_all(self.context)
+
+        new_service = az.set_availability_zones(self.context, services)[0]
+        self.assertEqual('az0,' + self.availability_zone,
+                         new_service['availability_zone'])
+        self.assertEqual({self.host: new_service['availability_zone']},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
+
+    def test_get_hosts_availability_zones_refresh(self):
+        """Test the availability zones of hosts are refreshed."""
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        service = self._create_service_with_topic('compute', self.host)
+        self.assertEqual({self.host: self.default_az},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
+
+        # Cached until the availability zone of the host is updated
+        self._add_to_aggregate(service, self.agg)
+        self.assertEqual({self.host: self.default_az},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
+        az.update_host_availability_zone_cache(self.context, self.host)
+        self.assertEqual({self.host: self.availability_zone},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
+
+        # but not when the zone of the host is unchanged
+        with mock.patch.object(objects.AggregateList, 'get_by_metadata_key',
+                               wraps=objects.AggregateList.get_by_metadata_key
+                               ) as mock_get_aggs:
+            az.update_host_availability_zone_cache(self.context, self.host)
+            az.update_host_availability_zone_cache(self.context, 'other',
+                                                   self.default_az)
+            az.get_hosts_availability_zones(self.context, [self.host])
+            self.assertFalse(mock_get_aggs.called)
+
+        # or the cache is reset
+        self._update_az(self.agg, 'az2')
+        az.reset_cache()
+        self.assertEqual({self.host: 'az2'},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
+
+        # or it expires
+        self._update_az(self.agg, 'az3')
+        timeutils.advance_time_seconds(az.HOST_AZS_CACHE_SECONDS - 1)
+        self.assertEqual({self.host: 'az2'},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
+        timeutils.advance_time_seconds(1)
+        self.assertEqual({self.host: 'az3'},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
@@ -15,6 +15,7 @@
 #    under the License.
 """Unit Tests for network code."""
 
+from oslo_concurrency import processutils
 import six
 
 from nova.network import linux_net
@@ -275,3 +276,127 @@ class IptablesManagerTestCase(test.NoDBTestCase):
                                                self.manager.ipv4['filter'],
                                                'filter')
         self.assertEqual(current_lines, new_lines)
+
+    def test_top_rules_keep_counts(self):
+        current_lines = list(self.sample_filter)
+        current_lines[12] = '[5:10] -A FORWARD -j nova-filter-top'
+        new_lines = self.manager._modify_rules(current_lines,
+                                               self.manager.ipv4['filter'],
+                                               'filter')
+        self.assertIn('[5:10] -A FORWARD -j nova-filter-top', new_lines)
+        self.assertNotIn('[0:0] -A FORWARD -j nova-filter-top', new_lines)
+
+    def test_remove_unwrapped_rules(self):
+        current_lines = self.sample_filter
+        table = self.manager.ipv4['filter']
+        table.add_rule('nova-filter-top', '-s 1.2.3.4/5 -j DROP', wrap=False)
+        table.add_rule('nova-filter-top', '-s 6.7.8.9/5 -j DROP', wrap=False)
+        new_lines = self.manager._modify_rules(current_lines, table, 'filter')
+        self.assertIn('[0:0] -A nova-filter-top -s 1.2.3.4/5 -j DROP',
+                      new_lines)
+        self.assertIn('[0:0] -A nova-filter-top -s 6.7.8.9/5 -j DROP',
+                      new_lines)
+
+        table.remove_rule('nova-filter-top', '-s 1.2.3.4/5 -j DROP',
+                          wrap=False)
+        table.remove_rule('nova-filter-top', '-s 6.7.8.9/5 -j DROP',
+                          wrap=False)
+        new_lines = self.manager._modify_rules(new_lines, table, 'filter')
+        self.assertNotIn('[0:0] -A nova-filter-top -s 1.2.3.4/5 -j DROP',
+                         new_lines)
+        self.assertNotIn('[0:0] -A nova-filter-top -s 6.7.8.9/5 -j DROP',
+                         new_lines)
+        self.assertEqual([], table.remove_rules)
+
+
+class IptablesManagerIncrementalTestCase(test.NoDBTestCase):
+
+    binary_name = linux_net.get_binary_name()
+
+    def setUp(self):
+        super(IptablesManagerIncrementalTestCase, self).setUp()
+        self.executes = []
+        self.manager = linux_net.IptablesManager(execute=self._fake_execute)
+        # Pretend the tables were applied
+        for table in six.itervalues(self.manager.ipv4):
+            table.applied = self.manager._table_state(table)
+            table.dirty = False
+
+    def _fake_execute(self, *cmd, **kwargs):
+        self.executes.append((cmd, kwargs.get('process_input')))
+        return '', ''
+
+    def test_apply_changed_chains(self):
+        table = self.manager.ipv4['filter']
+        table.add_chain('inst-1')
+        table.add_rule('inst-1', '-s 1.2.3.4/5 -j DROP')
+        table.add_rule('inst-1', '-j ACCEPT', top=True)
+        table.add_rule('local', '-d 10.0.0.1 -j $inst-1')
+
+        self.assertTrue(self.manager._apply_changed_chains(
+            'iptables', self.manager.ipv4))
+
+        self.assertEqual(1, len(self.executes))
+        cmd, process_input = self.executes[0]
+        self.assertEqual(('iptables-restore', '-c', '-n'), cmd)
+        self.assertEqual(
+            ['*filter',
+             ':%s-inst-1 - [0:0]' % self.binary_name,
+             ':%s-local - [0:0]' % self.binary_name,
+             '[0:0] -A %s-inst-1 -j ACCEPT' % self.binary_name,
+             '[0:0] -A %s-inst-1 -s 1.2.3.4/5 -j DROP' % self.binary_name,
+             '[0:0] -A %s-local -d 10.0.0.1 -j %s-inst-1' % (
+                 self.binary_name, self.binary_name),
+             'COMMIT',
+             ''],
+            process_input.split('\n'))
+        self.assertFalse(table.dirty)
+
+        # Removing the chain also removes the rules jumping to it
+        table.remove_chain('inst-1')
+        self.assertTrue(self.manager._apply_changed_chains(
+            'iptables', self.manager.ipv4))
+
+        self.assertEqual(2, len(self.executes))
+        cmd, process_input = self.executes[1]
+        self.assertEqual(
+            ['*filter',
+             ':%s-local - [0:0]' % self.binary_name,
+             ':%s-inst-1 - [0:0]' % self.binary_name,
+             '-X %s-inst-1' % self.binary_name,
+             'COMMIT',
+             ''],
+            process_input.split('\n'))
+
+    def test_apply_changed_chains_nothing_changed(self):
+        self.assertTrue(self.manager._apply_changed_chains(
+            'iptables', self.manager.ipv4))
+        self.assertEqual([], self.executes)
+
+    def test_apply_changed_chains_unwrapped_rule(self):
+        table = self.manager.ipv4['filter']
+        table.add_rule('nova-filter-top', '-s 1.2.3.4/5 -j DROP', wrap=False)
+        self.assertFalse(self.manager._apply_changed_chains(
+            'iptables', self.manager.ipv4))
+        self.assertEqual([], self.executes)
+        self.assertTrue(table.dirty)
+
+    def test_apply_changed_chains_never_applied(self):
+        table = self.manager.ipv4['filter']
+        table.applied = None
+        table.add_rule('local', '-s 1.2.3.4/5 -j DROP')
+        self.assertFalse(self.manager._apply_changed_chains(
+            'iptables', self.manager.ipv4))
+        self.assertEqual([], self.executes)
+
+    def test_apply_changed_chains_restore_fails(self):
+        def fake_execute(*cmd, **kwargs):
+            raise processutils.ProcessExecutionError()
+
+        self.manager.execute = fake_execute
+        table = self.manager.ipv4['filter']
+        table.add_rule('local', '-s 1.2.3.4/5 -j DROP')
+        self.assertFalse(self.manager._apply_changed_chains(
+            'iptables', self.manager.ipv4))
+        for table in six.itervalues(self.manager.ipv4):
+            self.assertIsNone(table.applied)
@@ -33,6 +33,7 @@ import six
 import webob
 
 from nova.api.metadata import base
+from nova.api.metadata import cache as metadata_cache
 from nova.api.metadata import handler
 from nova.api.metadata import password
 from nova import block_device
@@ -904,6 +905,35 @@ class MetadataHandlerTestCase(test.TestCase):
         self._metadata_handler_with_remote_address(hnd)
         self.assertEqual(2, get_by_uuid.call_count)
 
+    @mock.patch.object(objects.Instance, 'get_by_uuid')
+    @mock.patch.object(base, 'get_metadata_by_address')
+    def test_metadata_handler_cache_invalidated_on_update(self, get_by_addr,
+                                                          get_instance):
+        get_by_addr.return_value = self.mdinst
+        self.flags(metadata_cache_expiration=15)
+        hnd = handler.MetadataRequestHandler()
+        self._metadata_handler_with_remote_address(hnd)
+        self._metadata_handler_with_remote_address(hnd)
+        self.assertEqual(1, get_by_addr.call_count)
+        # The cached metadata are used without looking up the instance
+        self.assertFalse(get_instance.called)
+
+        # The instance or its network info were updated
+        metadata_cache.invalidate(self.instance.uuid)
+        self._metadata_handler_with_remote_address(hnd)
+        self.assertEqual(2, get_by_addr.call_count)
+
+    @mock.patch.object(base, 'get_metadata_by_address')
+    def test_metadata_handler_caches_responses(self, get_by_addr):
+        get_by_addr.return_value = self.mdinst
+        self.flags(metadata_cache_expiration=15)
+        hnd = handler.MetadataRequestHandler()
+        with mock.patch.object(self.mdinst, 'lookup',
+                               wraps=self.mdinst.lookup) as mock_lookup:
+            self._metadata_handler_with_remote_address(hnd)
+            self._metadata_handler_with_remote_address(hnd)
+        self.assertEqual(1, mock_lookup.call_count)
+
 
 class MetadataPasswordTestCase(test.TestCase):
     def setUp(self):
@@ -383,6 +383,40 @@ class DBCommandsTestCase(test.TestCase):
     def test_archive_deleted_rows_negative(self):
         self.assertEqual(1, self.commands.archive_deleted_rows(-1))
 
+    def test_archive_deleted_rows_negative_batch_size(self):
+        self.assertEqual(1, self.commands.archive_deleted_rows(
+            None, batch_size=0))
+
+    @mock.patch.object(db, 'archive_deleted_rows',
+                       return_value={'instances': (10, 2.0)})
+    def test_archive_deleted_rows(self, mock_archive):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        self.commands.archive_deleted_rows('20', batch_size='5', sleep='0.1')
+        mock_archive.assert_called_once_with(
+            mock.ANY, 20, batch_size=5, throttle=0.1, checkpoint={})
+        self.assertIn('instances: 10 rows archived in 2.00 seconds '
+                      '(5.0 rows/sec)', sys.stdout.getvalue())
+
+    def test_archive_deleted_rows_checkpoint(self):
+        checkpoint = self.useFixture(fixtures.TempDir()).path + '/checkpoint'
+        with open(checkpoint, 'w') as f:
+            f.write('{"instances": 5}')
+
+        def fake_archive(context, max_rows, batch_size, throttle,
+                         checkpoint):
+            self.assertEqual({'instances': 5}, checkpoint)
+            checkpoint['instances'] = 7
+            raise KeyboardInterrupt()
+
+        with mock.patch.object(db, 'archive_deleted_rows',
+                               side_effect=fake_archive):
+            self.assertRaises(KeyboardInterrupt,
+                              self.commands.archive_deleted_rows,
+                              None, checkpoint=checkpoint)
+        with open(checkpoint) as f:
+            self.assertEqual('{"instances": 7}', f.read())
+
     @mock.patch.object(migration, 'db_null_instance_uuid_scan',
                        return_value={'foo': 0})
     def test_null_instance_uuid_scan_no_records_found(self, mock_scan):
@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 import datetime
 import functools
 import hashlib
@@ -214,6 +215,20 @@ class GenericUtilsTestCase(test.NoDBTestCase):
         self.assertEqual(
             value, utils.get_hash_str(base_str))
 
+    def test_pagination_cursor(self):
+        created_at = datetime.datetime(2015, 6, 1, 12, 0, 0)
+        cursor = utils.encode_pagination_cursor(
+            {'created_at': created_at, 'id': 5, 'uuid': 'fake-uuid'})
+        self.assertEqual({'created_at': '2015-06-01T12:00:00', 'id': 5,
+                          'uuid': 'fake-uuid'},
+                         utils.decode_pagination_cursor(cursor))
+
+    def test_pagination_cursor_invalid(self):
+        for cursor in ['not-a-cursor', utils.encode_pagination_cursor({})[:-2],
+                       base64.urlsafe_b64encode('[1, 2]')]:
+            self.assertRaises(ValueError, utils.decode_pagination_cursor,
+                              cursor)
+
     def test_use_rootwrap(self):
         self.flags(disable_rootwrap=False, group='workarounds')
         self.flags(rootwrap_config='foo')
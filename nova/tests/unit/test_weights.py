@@ -56,6 +56,22 @@ class TestWeigher(test.NoDBTestCase):
             ret = weights.normalize(seq, minval=minval, maxval=maxval)
             self.assertEqual(tuple(ret), result)
 
+    def test_weigh_objects_records_bounds(self):
+        class FakeWeigher(weights.BaseWeigher):
+            def _weigh_object(self, obj, weight_properties):
+                return obj
+
+        weigher = FakeWeigher()
+        weighed_objs = [weights.WeighedObject(obj, 0.0)
+                        for obj in (3, 1, 2)]
+        self.assertEqual([3, 1, 2],
+                         weigher.weigh_objects(weighed_objs, {}))
+        self.assertEqual(1, weigher.minval)
+        self.assertEqual(3, weigher.maxval)
+        self.assertEqual([], weigher.weigh_objects([], {}))
+        self.assertEqual(1, weigher.minval)
+        self.assertEqual(3, weigher.maxval)
+
     @mock.patch('nova.weights.BaseWeigher.weigh_objects')
     def test_only_one_host(self, mock_weigh):
         host_values = [
@@ -71,3 +87,23 @@ class TestWeigher(test.NoDBTestCase):
         self.assertEqual(1, len(weighed_host))
         self.assertEqual('host1', weighed_host[0].obj.host)
         self.assertFalse(mock_weigh.called)
+
+    def test_get_weighed_object_with_bounds(self):
+        host_values = [
+            ('host1', 'node1', {'free_ram_mb': 512}),
+            ('host2', 'node2', {'free_ram_mb': 1024}),
+        ]
+        hostinfo = [fakes.FakeHostState(host, node, values)
+                    for host, node, values in host_values]
+
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighers = [scheduler_weights.ram.RAMWeigher()]
+        weight_handler.get_weighed_objects(weighers, hostinfo, {})
+        bounds = weight_handler.get_weight_bounds(weighers)
+        self.assertEqual([(512, 1024)], bounds)
+
+        hostinfo[1].free_ram_mb = 768
+        weighed_host = weight_handler.get_weighed_object(
+            weighers, hostinfo[1], {}, bounds)
+        self.assertEqual('host2', weighed_host.obj.host)
+        self.assertEqual(0.5, weighed_host.weight)
@@ -16,6 +16,7 @@ import errno
 import platform
 import socket
 import sys
+import unittest
 
 import mock
 from oslo_config import cfg
@@ -218,3 +219,21 @@ def is_ipv6_supported():
 def get_api_version(request):
     if request.path[2:3].isdigit():
         return int(request.path[2:3])
+
+
+def run_benchmark(test_class, test_names, format_report):
+    """Run benchmark tests from a script and print their reports.
+
+    The tests pass their reports to their add_report() method, which is
+    replaced here to collect them; run as unit tests, the reports are
+    dropped.
+    """
+    reports = []
+    suite = unittest.TestSuite()
+    for test_name in test_names:
+        test = test_class(test_name)
+        test.add_report = reports.append
+        suite.addTest(test)
+    unittest.TextTestRunner().run(suite)
+    for report in reports:
+        print(format_report(report))
@@ -18,11 +18,13 @@ import contextlib
 import copy
 import datetime
 import errno
+import functools
 import glob
 import os
 import random
 import re
 import shutil
+import stat
 import threading
 import time
 import uuid
@@ -51,6 +53,7 @@ from nova.compute import cpumodel
 from nova.compute import manager
 from nova.compute import power_state
 from nova.compute import task_states
+from nova.compute import utils as compute_utils
 from nova.compute import vm_mode
 from nova.compute import vm_states
 from nova import context
@@ -89,6 +92,7 @@ from nova.virt.libvirt import firewall
 from nova.virt.libvirt import guest as libvirt_guest
 from nova.virt.libvirt import host
 from nova.virt.libvirt import imagebackend
+from nova.virt.libvirt import imagecache
 from nova.virt.libvirt import lvm
 from nova.virt.libvirt import rbd_utils
 from nova.virt.libvirt import utils as libvirt_utils
@@ -7020,6 +7024,47 @@ class LibvirtConnTestCase(test.NoDBTestCase):
         self.assertEqual(info[0]['backing_file'], "")
         self.assertEqual(info[0]['over_committed_disk_size'], 0)
 
+    @mock.patch.object(libvirt_driver.disk, 'get_disk_size',
+                       return_value=20 * units.Gi)
+    @mock.patch.object(libvirt_driver.libvirt_utils, 'get_disk_backing_file',
+                       return_value='file')
+    @mock.patch('os.stat')
+    def test_get_qcow2_disk_info_cached(self, mock_stat, mock_backing,
+                                        mock_size):
+        mock_stat.return_value = mock.Mock(st_mode=stat.S_IFREG,
+                                           st_size=units.Gi, st_mtime=1)
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.assertEqual(('file', 20 * units.Gi),
+                         drvr._get_qcow2_disk_info('/test/disk'))
+        self.assertEqual(('file', 20 * units.Gi),
+                         drvr._get_qcow2_disk_info('/test/disk'))
+        self.assertEqual(1, mock_size.call_count)
+        self.assertEqual(1, mock_backing.call_count)
+
+        # The disk was written to
+        mock_stat.return_value.st_mtime = 2
+        drvr._get_qcow2_disk_info('/test/disk')
+        self.assertEqual(2, mock_size.call_count)
+        self.assertEqual(2, mock_backing.call_count)
+
+    @mock.patch.object(libvirt_driver.disk, 'get_disk_size',
+                       return_value=20 * units.Gi)
+    @mock.patch.object(libvirt_driver.libvirt_utils, 'get_disk_backing_file',
+                       return_value='')
+    @mock.patch('os.stat')
+    def test_get_qcow2_disk_info_not_cached(self, mock_stat, mock_backing,
+                                            mock_size):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        # Neither a missing file nor a block device are cached
+        for stat_result in (OSError(errno.ENOENT, 'No such file'),
+                            mock.Mock(st_mode=stat.S_IFBLK,
+                                      st_size=0, st_mtime=1)):
+            mock_stat.side_effect = [stat_result, stat_result]
+            drvr._get_qcow2_disk_info('/test/disk')
+            drvr._get_qcow2_disk_info('/test/disk')
+        self.assertEqual(4, mock_size.call_count)
+        self.assertEqual({}, drvr._qcow2_disk_info)
+
     def test_spawn_with_network_info(self):
         # Preparing mocks
         def fake_none(*args, **kwargs):
@@ -7567,6 +7612,54 @@ class LibvirtConnTestCase(test.NoDBTestCase):
                               context, instance, disk_info['mapping'],
                               block_device_info=block_device_info)
 
+    def test_create_disks(self):
+        instance = objects.Instance(**self.test_instance)
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        created = []
+        stages = [(name, functools.partial(created.append, name))
+                  for name in ('disk', 'disk.local', 'disk.swap')]
+
+        with mock.patch.object(utils, 'spawn') as mock_spawn:
+            drvr._create_disks(self.context, instance, stages)
+        self.assertFalse(mock_spawn.called)
+        self.assertEqual(['disk', 'disk.local', 'disk.swap'], created)
+
+    def test_create_disks_concurrently(self):
+        self.flags(disk_creation_concurrency=2, group='libvirt')
+        instance = objects.Instance(**self.test_instance)
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        created = []
+        running = []
+
+        def create(name):
+            running.append(name)
+            self.assertLessEqual(len(running), 2)
+            greenthread.sleep(0)
+            created.append(name)
+            running.remove(name)
+            if name == 'disk.local':
+                raise test.TestingException()
+
+        stages = [(name, functools.partial(create, name))
+                  for name in ('disk', 'disk.local', 'disk.eph0',
+                               'disk.swap')]
+        self.assertRaises(test.TestingException, drvr._create_disks,
+                          self.context, instance, stages)
+        # All the disks were created before the failure was raised
+        self.assertEqual(set(['disk', 'disk.local', 'disk.eph0',
+                              'disk.swap']), set(created))
+
+    @mock.patch.object(compute_utils, 'EventReporter')
+    def test_create_disk_records_event(self, mock_event):
+        self.flags(record_disk_creation_events=True, group='libvirt')
+        instance = objects.Instance(**self.test_instance)
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        create_func = mock.Mock()
+        drvr._create_disk(self.context, instance, 'disk.local', create_func)
+        create_func.assert_called_once_with()
+        mock_event.assert_called_once_with(
+            self.context, 'libvirt_create_disk.local', instance.uuid)
+
     def test_create_ephemeral_default(self):
         drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
         self.mox.StubOutWithMock(utils, 'execute')
@@ -7616,6 +7709,89 @@ class LibvirtConnTestCase(test.NoDBTestCase):
 
         drvr._create_swap('/dev/something', 1, max_size=20)
 
+    @mock.patch.object(objects.FlavorList, 'get_all')
+    def test_get_disk_templates(self, mock_get_all):
+        mock_get_all.return_value = [
+            objects.Flavor(ephemeral_gb=0, swap=0),
+            objects.Flavor(ephemeral_gb=20, swap=512)]
+        self.stubs.Set(nova.virt.disk.api, '_MKFS_COMMAND',
+                       {'linux': 'mkfs.ext3 --label %(fs_label)s %(target)s'})
+        instance = objects.Instance(**self.test_instance)
+        instance.os_type = 'linux'
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        templates = drvr._get_disk_templates(self.context, [instance])
+        linux_fname = 'ephemeral_20_%s' % utils.get_hash_str(
+            'mkfs.ext3 --label %(fs_label)s %(target)s')[:7]
+        self.assertEqual(set([self._EPHEMERAL_20_DEFAULT, linux_fname,
+                              'swap_512']), set(templates))
+        self.assertEqual('linux', templates[linux_fname].keywords['os_type'])
+        self.assertEqual(512, templates['swap_512'].keywords['swap_mb'])
+
+    @mock.patch.object(objects.FlavorList, 'get_all')
+    def test_get_disk_templates_lvm(self, mock_get_all):
+        self.flags(images_type='lvm', group='libvirt')
+        mock_get_all.return_value = [objects.Flavor(ephemeral_gb=20, swap=512)]
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.assertEqual(['swap_512'],
+                         list(drvr._get_disk_templates(self.context, [])))
+
+    def test_prewarm_disk_templates(self):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        os.makedirs(base_dir)
+        existing = os.path.join(base_dir, 'swap_512')
+        open(existing, 'w').close()
+        os.utime(existing, (0, 0))
+
+        def create_template(target):
+            open(target, 'w').close()
+
+        templates = {'swap_512': mock.Mock(),
+                     'swap_1024': create_template}
+        with mock.patch.object(drvr, '_get_disk_templates',
+                               return_value=templates):
+            drvr._prewarm_disk_templates(self.context, [])
+        self.assertFalse(templates['swap_512'].called)
+        self.assertNotEqual(0, os.path.getmtime(existing))
+        self.assertEqual(['swap_1024', 'swap_512'],
+                         sorted(os.listdir(base_dir)))
+
+    def test_prewarm_disk_templates_deferred(self):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        drvr._disks_in_creation = 1
+        create_template = mock.Mock()
+        with mock.patch.object(drvr, '_get_disk_templates',
+                               return_value={'swap_512': create_template}):
+            drvr._prewarm_disk_templates(self.context, [])
+        self.assertFalse(create_template.called)
+
+    def test_prewarm_disk_templates_failed(self):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+
+        def create_template(target):
+            open(target, 'w').close()
+            raise processutils.ProcessExecutionError()
+
+        with mock.patch.object(drvr, '_get_disk_templates',
+                               return_value={'swap_512': create_template}):
+            drvr._prewarm_disk_templates(self.context, [])
+        self.assertEqual([], os.listdir(base_dir))
+
+    @mock.patch.object(imagecache.ImageCacheManager, 'update')
+    def test_manage_image_cache_prewarm_disk_templates(self, mock_update):
+        self.flags(prewarm_disk_templates=True, group='libvirt')
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        with mock.patch.object(drvr, '_prewarm_disk_templates') as mock_pre:
+            drvr.manage_image_cache(self.context, mock.sentinel.instances)
+        mock_pre.assert_called_once_with(self.context,
+                                         mock.sentinel.instances)
+        mock_update.assert_called_once_with(self.context,
+                                            mock.sentinel.instances)
+
     def test_get_console_output_file(self):
         fake_libvirt_utils.files['console.log'] = '01234567890'
 
@@ -8679,10 +8855,15 @@ class LibvirtConnTestCase(test.NoDBTestCase):
                                "_get_instance_disk_info") as mock_info:
             mock_info.side_effect = get_info
 
+            drvr._qcow2_disk_info = {'/somepath/disk1': 'info1',
+                                     '/somepath/gone': 'info2'}
             result = drvr._get_disk_over_committed_size_total()
             self.assertEqual(result, 10653532160)
             mock_list.assert_called_with()
             self.assertTrue(mock_info.called)
+            # The disks of the domains which are gone are forgotten
+            self.assertEqual({'/somepath/disk1': 'info1'},
+                             drvr._qcow2_disk_info)
 
     @mock.patch.object(host.Host, "list_instance_domains")
     def test_disk_over_committed_size_total_eperm(self, mock_list):
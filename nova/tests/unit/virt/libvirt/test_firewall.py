@@ -389,7 +389,8 @@ class IptablesFirewallTestCase(test.NoDBTestCase):
         self.fw.add_filters_for_instance(instance_ref, mox.IgnoreArg(),
                                          mox.IgnoreArg(), mox.IgnoreArg())
         self.fw.instance_rules(instance_ref,
-                               mox.IgnoreArg()).AndReturn((None, None))
+                               mox.IgnoreArg(),
+                               sg_cache={}).AndReturn((None, None))
         self.fw.iptables.ipv4['filter'].has_chain(mox.IgnoreArg()
                                                   ).AndReturn(True)
         self.fw.add_filters_for_instance(instance_ref, mox.IgnoreArg(),
@@ -420,6 +421,69 @@ class IptablesFirewallTestCase(test.NoDBTestCase):
                                                    any_order=True)
             self.assertEqual(0, mock_filter.add_chain.call_count)
 
+    @mock.patch.object(firewall.IptablesFirewallDriver,
+                       '_inner_do_refresh_rules')
+    @mock.patch.object(objects.InstanceList, 'get_by_security_group')
+    @mock.patch.object(objects.SecurityGroupRuleList, 'get_by_security_group')
+    @mock.patch.object(objects.SecurityGroupList, 'get_by_instance')
+    def test_do_refresh_security_group_rules_batched(self, mock_secgroup,
+                                                     mock_secrule,
+                                                     mock_instlist,
+                                                     mock_refresh):
+        secgroup = objects.SecurityGroup(id=1, name='web')
+        src_secgroup = objects.SecurityGroup(id=2, name='src')
+        mock_secgroup.return_value = objects.SecurityGroupList(
+            objects=[secgroup])
+        rule = objects.SecurityGroupRule(parent_group_id=1, protocol='tcp',
+                                         from_port=80, to_port=80,
+                                         cidr=None,
+                                         grantee_group=src_secgroup)
+        mock_secrule.return_value = objects.SecurityGroupRuleList(
+            objects=[rule])
+        src_instance = self._create_instance_ref()
+        mock_instlist.return_value = objects.InstanceList(
+            objects=[src_instance])
+        network_model = _fake_network_info(self.stubs, 1)
+        self.stubs.Set(compute_utils, 'get_nw_info_for_instance',
+                       lambda instance: network_model)
+        instance1 = objects.Instance(id=1, uuid='fake-uuid1')
+        instance2 = objects.Instance(id=2, uuid='fake-uuid2')
+        self.fw.instance_info = {1: (instance1, network_model),
+                                 2: (instance2, network_model)}
+
+        self.fw.do_refresh_security_group_rules(src_secgroup.id)
+
+        # The group and its members are looked up once for both instances
+        self.assertEqual(2, mock_secgroup.call_count)
+        mock_secrule.assert_called_once_with(mock.ANY, secgroup)
+        mock_instlist.assert_called_once_with(mock.ANY, src_secgroup)
+        self.assertEqual(2, mock_refresh.call_count)
+        ipv4_rules = mock_refresh.call_args[0][2]
+        for ip in network_model.fixed_ips():
+            if ip['version'] == 4:
+                self.assertIn('-j ACCEPT -p tcp --dport 80 -s %s' %
+                              ip['address'], ipv4_rules)
+
+    @mock.patch.object(firewall.IptablesFirewallDriver,
+                       '_inner_do_refresh_rules')
+    @mock.patch.object(firewall.IptablesFirewallDriver, 'instance_rules')
+    def test_do_refresh_security_group_rules_unchanged(self, mock_ir,
+                                                       mock_refresh):
+        instance1 = objects.Instance(id=1, uuid='fake-uuid1')
+        instance2 = objects.Instance(id=2, uuid='fake-uuid2')
+        self.fw.instance_info = {1: (instance1, 'netinfo1'),
+                                 2: (instance2, 'netinfo2')}
+        self.fw.instance_sg_rules = {1: (['rule1'], []),
+                                     2: (['rule2'], [])}
+        mock_ir.side_effect = lambda instance, *args, **kwargs: (
+            ['rule%s' % (instance.id + 1)], [])
+
+        self.fw.do_refresh_security_group_rules('secgroup')
+
+        self.assertEqual(2, mock_ir.call_count)
+        mock_refresh.assert_called_once_with(instance1, 'netinfo1',
+                                             ['rule2'], [])
+
     @mock.patch.object(fakelibvirt.virConnect, "nwfilterLookupByName")
     @mock.patch.object(fakelibvirt.virConnect, "nwfilterDefineXML")
     @mock.patch.object(objects.InstanceList, "get_by_security_group_id")
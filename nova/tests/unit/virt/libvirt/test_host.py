@@ -606,6 +606,56 @@ class HostTestCase(test.NoDBTestCase):
         self.assertEqual(doms[2].name(), vm2.name())
         mock_list.assert_called_with(True)
 
+    @mock.patch('time.time', return_value=1000)
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_get_domain_snapshot(self, mock_list, mock_time):
+        self.flags(domain_snapshot_max_age=60, group='libvirt')
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        mock_list.return_value = [vm1]
+
+        snapshot = self.host.get_domain_snapshot()
+        self.assertEqual([vm1], snapshot.domains)
+        mock_time.return_value = 1059
+        self.assertIs(snapshot, self.host.get_domain_snapshot())
+        mock_list.assert_called_once_with()
+
+        # The snapshot is too old
+        mock_time.return_value = 1060
+        self.assertIsNot(snapshot, self.host.get_domain_snapshot())
+        self.assertEqual(2, mock_list.call_count)
+
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_get_domain_snapshot_disabled(self, mock_list):
+        self.flags(domain_snapshot_max_age=0, group='libvirt')
+        snapshot = self.host.get_domain_snapshot()
+        self.assertIsNot(snapshot, self.host.get_domain_snapshot())
+        self.assertEqual(2, mock_list.call_count)
+
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_get_domain_snapshot_lifecycle_event(self, mock_list):
+        self.flags(domain_snapshot_max_age=60, group='libvirt')
+        hostimpl = host.Host("qemu:///system",
+                             lifecycle_event_handler=lambda event: None)
+        hostimpl._init_events_pipe()
+        snapshot = hostimpl.get_domain_snapshot()
+
+        hostimpl._queue_event(event.LifecycleEvent(
+            "cef19ce0-0ca2-11df-855d-b19fbce37686",
+            event.EVENT_LIFECYCLE_STARTED))
+        hostimpl._dispatch_events()
+
+        self.assertIsNot(snapshot, hostimpl.get_domain_snapshot())
+        self.assertEqual(2, mock_list.call_count)
+
+    def test_domain_snapshot_xml_desc(self):
+        dom = mock.Mock()
+        dom.UUIDString.return_value = "cef19ce0-0ca2-11df-855d-b19fbce37686"
+        dom.XMLDesc.return_value = "<domain/>"
+        snapshot = host.DomainSnapshot([dom])
+        self.assertEqual("<domain/>", snapshot.get_xml_desc(dom))
+        self.assertEqual("<domain/>", snapshot.get_xml_desc(dom))
+        self.assertEqual(1, dom.XMLDesc.call_count)
+
     def test_cpu_features_bug_1217630(self):
         self.host.get_connection()
 
@@ -494,6 +494,23 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
             self.assertEqual(image_cache_manager.removable_base_files, [])
             self.assertEqual(image_cache_manager.corrupt_base_files, [])
 
+    def test_handle_base_image_prefetched(self):
+        self.stubs.Set(libvirt_utils, 'chown', lambda x, y: None)
+        img = '123'
+
+        with self._make_base_file() as fname:
+            os.utime(fname, (-1, time.time() - 3601))
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.unexplained_images = [fname]
+            image_cache_manager.prefetch_images = set(['123'])
+            image_cache_manager._handle_base_image(img, fname)
+
+            self.assertEqual(image_cache_manager.unexplained_images, [])
+            self.assertEqual(image_cache_manager.active_base_files, [fname])
+            self.assertEqual(image_cache_manager.removable_base_files, [])
+            self.assertEqual(image_cache_manager.corrupt_base_files, [])
+
     def test_handle_base_image_absent(self):
         img = '123'
 
@@ -844,6 +861,132 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
             compute._run_image_cache_manager_pass(None)
             self.assertTrue(was['called'])
 
+    @mock.patch.object(time, 'time')
+    def test_get_prefetch_images(self, mock_time):
+        self.flags(prefetch_images=['1', '2'],
+                   prefetch_popular_image_boots=2,
+                   prefetch_popular_image_window=100, group='libvirt')
+        image_cache_manager = imagecache.ImageCacheManager()
+        for now, image_id in [(1000, '3'), (1050, '3'), (1050, '4'),
+                              (1090, '5'), (1100, '5')]:
+            mock_time.return_value = now
+            image_cache_manager.record_boot(image_id)
+
+        mock_time.return_value = 1100
+        self.assertEqual(set(['1', '2', '3', '5']),
+                         image_cache_manager._get_prefetch_images())
+        # The boots out of the window are forgotten
+        mock_time.return_value = 1160
+        self.assertEqual(set(['1', '2', '5']),
+                         image_cache_manager._get_prefetch_images())
+        self.assertEqual(['5'], list(image_cache_manager.recent_boots))
+        mock_time.return_value = 1201
+        self.assertEqual(set(['1', '2']),
+                         image_cache_manager._get_prefetch_images())
+        self.assertEqual({}, image_cache_manager.recent_boots)
+
+    @mock.patch('nova.image.glance.get_admin_context')
+    @mock.patch('nova.virt.images.fetch_to_raw')
+    def test_prefetch_image(self, mock_fetch, mock_get_context):
+        def fake_fetch(context, image_id, target, *args, **kwargs):
+            open(target, 'w').close()
+
+        mock_fetch.side_effect = fake_fetch
+        ctxt = context.RequestContext('glance-user', 'glance-project',
+                                      is_admin=True, auth_token='token')
+        mock_get_context.return_value = ctxt
+        self.flags(prefetch_max_rate=100, group='libvirt')
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.prefetching.add('123')
+            image_cache_manager._prefetch_image(tmpdir, '123')
+            self.assertEqual(set(), image_cache_manager.prefetching)
+            image_cache_manager._prefetch_image(tmpdir, '123')
+
+            # The image is fetched with the token of the glance credentials
+            base_file = os.path.join(tmpdir, hashlib.sha1('123').hexdigest())
+            self.assertTrue(os.path.exists(base_file))
+            mock_get_context.assert_called_once_with()
+            mock_fetch.assert_called_once_with(
+                ctxt, '123', base_file, 'glance-user', 'glance-project',
+                max_rate=100 * 1024)
+
+    @mock.patch('nova.image.glance.get_admin_context')
+    @mock.patch('nova.virt.images.fetch_to_raw',
+                side_effect=processutils.ProcessExecutionError)
+    def test_prefetch_image_failed(self, mock_fetch, mock_get_context):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.prefetching.add('123')
+            with intercept_log_messages() as stream:
+                image_cache_manager._prefetch_image(tmpdir, '123')
+            self.assertIn('prefetch failed', stream.getvalue())
+            self.assertFalse(os.path.exists(
+                os.path.join(tmpdir, hashlib.sha1('123').hexdigest())))
+            # The image is fetched again on the next pass
+            self.assertEqual(set(), image_cache_manager.prefetching)
+
+    @mock.patch('nova.utils.spawn_n')
+    def test_start_prefetch_images(self, mock_spawn):
+        with utils.tempdir() as tmpdir:
+            image_cache_manager = imagecache.ImageCacheManager()
+            open(os.path.join(tmpdir, hashlib.sha1('123').hexdigest()),
+                 'w').close()
+            image_cache_manager._start_prefetch_images(
+                tmpdir, set(['123', '456', '789']))
+
+            # Only the images missing from the cache are fetched
+            self.assertEqual(
+                [mock.call(image_cache_manager._prefetch_image, tmpdir,
+                           '456'),
+                 mock.call(image_cache_manager._prefetch_image, tmpdir,
+                           '789')],
+                mock_spawn.call_args_list)
+            self.assertEqual(set(['456', '789']),
+                             image_cache_manager.prefetching)
+
+            # The images whose fetch is still running are skipped
+            image_cache_manager.prefetching.discard('789')
+            mock_spawn.reset_mock()
+            image_cache_manager._start_prefetch_images(
+                tmpdir, set(['123', '456', '789']))
+            mock_spawn.assert_called_once_with(
+                image_cache_manager._prefetch_image, tmpdir, '789')
+
+    def test_update_prefetch_images(self):
+        self.stubs.Set(libvirt_utils, 'chown', lambda x, y: None)
+        self.flags(prefetch_images=['123'], group='libvirt')
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.record_boot('456')
+            with contextlib.nested(
+                mock.patch.object(image_cache_manager,
+                                  '_start_prefetch_images'),
+                mock.patch.object(image_cache_manager,
+                                  '_list_running_instances',
+                                  return_value={'used_images': {},
+                                                'image_popularity': {},
+                                                'instance_names': set(),
+                                                'used_swap_images': set()})
+            ) as (mock_start_prefetch, mock_running):
+                image_cache_manager.update(ctxt, [])
+
+                base_dir = os.path.join(tmpdir, '_base')
+                mock_start_prefetch.assert_called_once_with(base_dir,
+                                                            set(['123']))
+                self.assertEqual(set(['123']),
+                                 image_cache_manager.prefetch_images)
+
+                self.flags(prefetch_popular_image_boots=1, group='libvirt')
+                mock_start_prefetch.reset_mock()
+                image_cache_manager.update(ctxt, [])
+                mock_start_prefetch.assert_called_once_with(
+                    base_dir, set(['123', '456']))
+
     def test_store_swap_image(self):
         image_cache_manager = imagecache.ImageCacheManager()
         image_cache_manager._store_swap_image('swap_')
@@ -1465,6 +1465,49 @@ class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
                                                         pci_stats=pci_stats)
             self.assertIsNone(fitted_instance1)
 
+    @mock.patch.object(hw, '_numa_fit_instance_cell')
+    def test_get_fitting_exceeds_capacity(self, mock_fit_cell):
+        instance = objects.InstanceNUMATopology(
+                cells=[
+                    objects.InstanceNUMACell(
+                        id=0, cpuset=set([1, 2]), memory=2048),
+                    objects.InstanceNUMACell(
+                        id=1, cpuset=set([3]), memory=4096)])
+        fitted_instance = hw.numa_fit_instance_to_host(
+                self.host, instance, self.limits)
+        self.assertIsNone(fitted_instance)
+        self.assertFalse(mock_fit_cell.called)
+
+    def test_get_fitting_fits_cells_once(self):
+        host = objects.NUMATopology(
+                cells=[objects.NUMACell(id=cell_id,
+                                        cpuset=set([cell_id * 2,
+                                                    cell_id * 2 + 1]),
+                                        memory=2048, cpu_usage=3,
+                                        memory_usage=0, mempages=[],
+                                        siblings=[], pinned_cpus=set([]))
+                       for cell_id in range(3)])
+        instance = objects.InstanceNUMATopology(
+                cells=[
+                    objects.InstanceNUMACell(
+                        id=0, cpuset=set([0]), memory=1024),
+                    objects.InstanceNUMACell(
+                        id=1, cpuset=set([1, 2]), memory=1024)])
+        with mock.patch.object(hw, '_numa_fit_instance_cell',
+                               wraps=hw._numa_fit_instance_cell) as fit_cell:
+            fitted_instance = hw.numa_fit_instance_to_host(
+                    host, instance, self.limits)
+        self.assertIsNone(fitted_instance)
+        # All the 6 permutations fail on the second instance cell, but each
+        # instance cell is only fitted once onto each host cell
+        self.assertEqual(6, fit_cell.call_count)
+
+    def test_get_fitting_does_not_modify_instance(self):
+        fitted_instance = hw.numa_fit_instance_to_host(
+                self.host, self.instance3, self.limits)
+        self.assertEqual(1, fitted_instance.cells[0].id)
+        self.assertEqual(0, self.instance3.cells[0].id)
+
 
 class NumberOfSerialPortsTest(test.NoDBTestCase):
     def test_flavor(self):
@@ -13,6 +13,7 @@
 #    under the License.
 
 import os
+import time
 
 import mock
 from oslo_concurrency import processutils
@@ -43,3 +44,22 @@ class QemuTestCase(test.NoDBTestCase):
         image_info = images.qemu_img_info('/fake/path')
         self.assertTrue(image_info)
         self.assertTrue(str(image_info))
+
+    @mock.patch.object(time, 'sleep')
+    @mock.patch.object(images.IMAGE_API, 'download')
+    def test_fetch_max_rate(self, mock_download, mock_sleep):
+        def fake_download(context, image_href, data=None, dest_path=None):
+            self.assertIsNone(dest_path)
+            data.write('a' * 100)
+            data.write('b' * 100)
+
+        mock_download.side_effect = fake_download
+        with utils.tempdir() as tmpdir:
+            path = os.path.join(tmpdir, 'image')
+            with mock.patch.object(time, 'time', return_value=0):
+                images.fetch(None, 'fake-image', path, None, None,
+                             max_rate=100)
+            with open(path) as image_file:
+                self.assertEqual('a' * 100 + 'b' * 100, image_file.read())
+        self.assertEqual([mock.call(1.0), mock.call(2.0)],
+                         mock_sleep.call_args_list)
@@ -17,6 +17,7 @@
 
 """Utilities and helper functions."""
 
+import base64
 import contextlib
 import datetime
 import functools
@@ -42,6 +43,7 @@ from oslo_config import cfg
 from oslo_context import context as common_context
 from oslo_log import log as logging
 import oslo_messaging as messaging
+from oslo_serialization import jsonutils
 from oslo_utils import encodeutils
 from oslo_utils import excutils
 from oslo_utils import importutils
@@ -1176,6 +1178,30 @@ def get_hash_str(base_str):
     """returns string that represents hash of base_str (in hex format)."""
     return hashlib.md5(base_str).hexdigest()
 
+
+def encode_pagination_cursor(values):
+    """Return an opaque pagination cursor for a dict of sort key values.
+
+    Datetime values are encoded as ISO 8601 strings.
+    """
+    values = {key: value.isoformat() if isinstance(value, datetime.datetime)
+              else value for key, value in six.iteritems(values)}
+    return base64.urlsafe_b64encode(jsonutils.dumps(values))
+
+
+def decode_pagination_cursor(cursor):
+    """Return the dict of sort key values of a pagination cursor.
+
+    :raises: ValueError if cursor is not a valid pagination cursor
+    """
+    try:
+        values = jsonutils.loads(base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError(_('Invalid pagination cursor: %s') % cursor)
+    if not isinstance(values, dict):
+        raise ValueError(_('Invalid pagination cursor: %s') % cursor)
+    return values
+
 if hasattr(hmac, 'compare_digest'):
     constant_time_compare = hmac.compare_digest
 else:
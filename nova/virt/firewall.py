@@ -141,6 +141,9 @@ class IptablesFirewallDriver(FirewallDriver):
         super(IptablesFirewallDriver, self).__init__(virtapi)
         self.iptables = linux_net.iptables_manager
         self.instance_info = {}
+        # The security group rules currently loaded in each instance chain,
+        # used to leave the chains whose rules did not change alone
+        self.instance_sg_rules = {}
         self.basically_filtered = False
 
         # Flags for DHCP request rule
@@ -246,9 +249,12 @@ class IptablesFirewallDriver(FirewallDriver):
                                                             network_info)
         self._add_filters('local', ipv4_rules, ipv6_rules)
         self._add_filters(chain_name, inst_ipv4_rules, inst_ipv6_rules)
+        self.instance_sg_rules[instance.id] = (inst_ipv4_rules,
+                                               inst_ipv6_rules)
 
     def remove_filters_for_instance(self, instance):
         chain_name = self._instance_chain_name(instance)
+        self.instance_sg_rules.pop(instance.id, None)
 
         self.iptables.ipv4['filter'].remove_chain(chain_name)
         if CONF.use_ipv6:
@@ -327,7 +333,94 @@ class IptablesFirewallDriver(FirewallDriver):
                     '--dports', '%s:%s' % (rule['from_port'],
                                            rule['to_port'])]
 
-    def instance_rules(self, instance, network_info):
+    def _security_group_member_ips(self, ctxt, group, sg_cache):
+        """Return the fixed ips of the members of a grantee group.
+
+        The ips are keyed by ip version and expanded once per group for
+        all the rules and instances rendered with the same sg_cache.
+        """
+        key = ('members', group['id'])
+        if key in sg_cache:
+            return sg_cache[key]
+        member_ips = {4: [], 6: []}
+        insts = objects.InstanceList.get_by_security_group(ctxt, group)
+        for instance in insts:
+            if instance.info_cache['deleted']:
+                LOG.debug('ignoring deleted cache')
+                continue
+            nw_info = compute_utils.get_nw_info_for_instance(instance)
+            ips = [(ip['version'], ip['address'])
+                   for ip in nw_info.fixed_ips()]
+            LOG.debug('ips: %r', ips, instance=instance)
+            for version, address in ips:
+                member_ips.setdefault(version, []).append(address)
+        sg_cache[key] = member_ips
+        return member_ips
+
+    def _security_group_rules(self, ctxt, security_group, sg_cache):
+        """Translate the rules of a security group to iptables rules.
+
+        The rendered rules only depend on the group, so they are kept in
+        sg_cache and shared by all the instances in the group.
+        """
+        key = ('rules', security_group['id'])
+        if key in sg_cache:
+            return sg_cache[key]
+
+        ipv4_rules = []
+        ipv6_rules = []
+        rules = objects.SecurityGroupRuleList.get_by_security_group(
+                ctxt, security_group)
+
+        for rule in rules:
+            if not rule['cidr']:
+                version = 4
+            else:
+                version = netutils.get_ip_version(rule['cidr'])
+
+            if version == 4:
+                fw_rules = ipv4_rules
+            else:
+                fw_rules = ipv6_rules
+
+            protocol = rule['protocol']
+
+            if protocol:
+                protocol = rule['protocol'].lower()
+
+            if version == 6 and protocol == 'icmp':
+                protocol = 'icmpv6'
+
+            args = ['-j ACCEPT']
+            if protocol:
+                args += ['-p', protocol]
+
+            if protocol in ['udp', 'tcp']:
+                args += self._build_tcp_udp_rule(rule, version)
+            elif protocol == 'icmp':
+                args += self._build_icmp_rule(rule, version)
+            if rule['cidr']:
+                args += ['-s', str(rule['cidr'])]
+                fw_rules += [' '.join(args)]
+            elif rule['grantee_group']:
+                member_ips = self._security_group_member_ips(
+                    ctxt, rule['grantee_group'], sg_cache)
+                for ip in member_ips.get(version, []):
+                    subrule = args + ['-s %s' % ip]
+                    fw_rules += [' '.join(subrule)]
+
+        sg_cache[key] = (ipv4_rules, ipv6_rules)
+        return ipv4_rules, ipv6_rules
+
+    def instance_rules(self, instance, network_info, sg_cache=None):
+        """Build the iptables rules for an instance.
+
+        :param sg_cache: optional dict shared between the calls of a refresh
+                         batch so that each security group and grantee group
+                         is only looked up and rendered once
+        """
+        if sg_cache is None:
+            sg_cache = {}
         ctxt = context.get_admin_context()
         if isinstance(instance, dict):
             # NOTE(danms): allow old-world instance objects from
@@ -359,59 +452,10 @@ class IptablesFirewallDriver(FirewallDriver):
 
         # then, security group chains and rules
         for security_group in security_groups:
-            rules = objects.SecurityGroupRuleList.get_by_security_group(
-                    ctxt, security_group)
-
-            for rule in rules:
-                if not rule['cidr']:
-                    version = 4
-                else:
-                    version = netutils.get_ip_version(rule['cidr'])
-
-                if version == 4:
-                    fw_rules = ipv4_rules
-                else:
-                    fw_rules = ipv6_rules
-
-                protocol = rule['protocol']
-
-                if protocol:
-                    protocol = rule['protocol'].lower()
-
-                if version == 6 and protocol == 'icmp':
-                    protocol = 'icmpv6'
-
-                args = ['-j ACCEPT']
-                if protocol:
-                    args += ['-p', protocol]
-
-                if protocol in ['udp', 'tcp']:
-                    args += self._build_tcp_udp_rule(rule, version)
-                elif protocol == 'icmp':
-                    args += self._build_icmp_rule(rule, version)
-                if rule['cidr']:
-                    args += ['-s', str(rule['cidr'])]
-                    fw_rules += [' '.join(args)]
-                else:
-                    if rule['grantee_group']:
-                        insts = (
-                            objects.InstanceList.get_by_security_group(
-                                ctxt, rule['grantee_group']))
-                        for instance in insts:
-                            if instance.info_cache['deleted']:
-                                LOG.debug('ignoring deleted cache')
-                                continue
-                            nw_info = compute_utils.get_nw_info_for_instance(
-                                    instance)
-
-                            ips = [ip['address']
-                                for ip in nw_info.fixed_ips()
-                                    if ip['version'] == version]
-
-                            LOG.debug('ips: %r', ips, instance=instance)
-                            for ip in ips:
-                                subrule = args + ['-s %s' % ip]
-                                fw_rules += [' '.join(subrule)]
+            group_ipv4_rules, group_ipv6_rules = self._security_group_rules(
+                ctxt, security_group, sg_cache)
+            ipv4_rules += group_ipv4_rules
+            ipv6_rules += group_ipv6_rules
 
         ipv4_rules += ['-j $sg-fallback']
         ipv6_rules += ['-j $sg-fallback']
@@ -449,6 +493,10 @@ class IptablesFirewallDriver(FirewallDriver):
                                       ipv6_rules)
 
     def do_refresh_security_group_rules(self, security_group):
+        # The rules of each security group and the ips of each grantee
+        # group are looked up once for all the instances on the host, and
+        # only the chains whose rules changed are rebuilt.
+        sg_cache = {}
         id_list = self.instance_info.keys()
         for instance_id in id_list:
             try:
@@ -458,7 +506,13 @@ class IptablesFirewallDriver(FirewallDriver):
                 # ignore this deleted instance and move on
                 continue
             ipv4_rules, ipv6_rules = self.instance_rules(instance,
-                                                         network_info)
+                                                         network_info,
+                                                         sg_cache=sg_cache)
+            if (self.instance_sg_rules.get(instance_id) ==
+                    (ipv4_rules, ipv6_rules)):
+                LOG.debug('Security group rules unchanged, skipping',
+                          instance=instance)
+                continue
             self._inner_do_refresh_rules(instance, network_info, ipv4_rules,
                                          ipv6_rules)
 
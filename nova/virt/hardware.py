@@ -993,6 +993,36 @@ def numa_get_constraints(flavor, image_meta):
     return _add_cpu_pinning_constraint(flavor, image_meta, numa_topology)
 
 
+def _numa_fit_exceeds_capacity(host_topology, instance_topology):
+    """Check if the instance cannot fit the host cells put together
+
+    Each instance cell has to fit onto a different host cell and cannot
+    overcommit against itself, so if the instance requests more memory or
+    CPUs than the largest host cells have together, no permutation of host
+    cells can fit it.
+
+    :returns: True if the instance cannot fit onto the host
+    """
+    num_cells = len(instance_topology)
+
+    def largest(values):
+        return sum(sorted(values, reverse=True)[:num_cells])
+
+    if (sum(cell.memory for cell in instance_topology.cells) >
+            largest(cell.memory for cell in host_topology.cells)):
+        return True
+    if (sum(len(cell.cpuset) for cell in instance_topology.cells) >
+            largest(len(cell.cpuset) for cell in host_topology.cells)):
+        return True
+    pinned_cpus = sum(len(cell.cpuset) for cell in instance_topology.cells
+                      if cell.cpu_pinning_requested)
+    # NOTE: pinned CPUs cannot be overcommitted
+    if pinned_cpus and pinned_cpus > largest(
+            cell.avail_cpus for cell in host_topology.cells):
+        return True
+    return False
+
+
 def numa_fit_instance_to_host(
         host_topology, instance_topology, limits=None,
         pci_requests=None, pci_stats=None):
@@ -1009,24 +1039,41 @@ def numa_fit_instance_to_host(
     by calling the _numa_fit_instance_cell method, and return a new
     InstanceNUMATopology with it's cell ids set to host cell id's of
     the first successful permutation, or None.
+
+    Whether an instance cell fits onto a host cell does not depend on the
+    other cells of the permutation, so each pair of cells is only fitted
+    once, onto a copy of the instance cell.
     """
     if (not (host_topology and instance_topology) or
         len(host_topology) < len(instance_topology)):
         return
+    elif _numa_fit_exceeds_capacity(host_topology, instance_topology):
+        return
     else:
+        # Fitted instance cells (or None) keyed by host and instance cell
+        # indexes
+        fitted_cells = {}
+
+        def fit_cell(host_index, instance_index):
+            key = (host_index, instance_index)
+            if key not in fitted_cells:
+                fitted_cells[key] = _numa_fit_instance_cell(
+                    host_topology.cells[host_index],
+                    instance_topology.cells[instance_index].obj_clone(),
+                    limits)
+            return fitted_cells[key]
+
         # TODO(ndipanov): We may want to sort permutations differently
         # depending on whether we want packing/spreading over NUMA nodes
-        for host_cell_perm in itertools.permutations(
-                host_topology.cells, len(instance_topology)):
+        for host_index_perm in itertools.permutations(
+                range(len(host_topology)), len(instance_topology)):
             cells = []
-            for host_cell, instance_cell in zip(
-                    host_cell_perm, instance_topology.cells):
-                got_cell = _numa_fit_instance_cell(
-                    host_cell, instance_cell, limits)
+            for instance_index, host_index in enumerate(host_index_perm):
+                got_cell = fit_cell(host_index, instance_index)
                 if got_cell is None:
                     break
                 cells.append(got_cell)
-            if len(cells) == len(host_cell_perm):
+            if len(cells) == len(host_index_perm):
                 if not pci_requests:
                     return objects.InstanceNUMATopology(cells=cells)
                 elif ((pci_stats is not None) and
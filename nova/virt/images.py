@@ -20,6 +20,7 @@ Handling of VM disk images.
 """
 
 import os
+import time
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -72,19 +73,50 @@ def convert_image(source, dest, out_format, run_as_root=False):
     utils.execute(*cmd, run_as_root=run_as_root)
 
 
-def fetch(context, image_href, path, _user_id, _project_id, max_size=0):
+class _RateLimitedFile(object):
+    """File wrapper sleeping in write() to stay under a rate."""
+
+    def __init__(self, fileobj, max_rate):
+        self._file = fileobj
+        self._max_rate = float(max_rate)
+        self._written = 0
+        self._start = time.time()
+
+    def write(self, data):
+        self._file.write(data)
+        self._written += len(data)
+        delay = (self._written / self._max_rate -
+                 (time.time() - self._start))
+        if delay > 0:
+            time.sleep(delay)
+
+
+def fetch(context, image_href, path, _user_id, _project_id, max_size=0,
+          max_rate=0):
+    """Download an image to path.
+
+    :param max_rate: maximum rate of the download in bytes per second,
+                     0 for unlimited
+    """
     with fileutils.remove_path_on_error(path):
-        IMAGE_API.download(context, image_href, dest_path=path)
+        if max_rate:
+            with open(path, 'wb') as image_file:
+                IMAGE_API.download(context, image_href,
+                                   data=_RateLimitedFile(image_file,
+                                                         max_rate))
+        else:
+            IMAGE_API.download(context, image_href, dest_path=path)
 
 
 def get_info(context, image_href):
     return IMAGE_API.get(context, image_href)
 
 
-def fetch_to_raw(context, image_href, path, user_id, project_id, max_size=0):
+def fetch_to_raw(context, image_href, path, user_id, project_id, max_size=0,
+                 max_rate=0):
     path_tmp = "%s.part" % path
     fetch(context, image_href, path_tmp, user_id, project_id,
-          max_size=max_size)
+          max_size=max_size, max_rate=max_rate)
 
     with fileutils.remove_path_on_error(path_tmp):
         data = qemu_img_info(path_tmp)
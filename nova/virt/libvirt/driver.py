@@ -35,12 +35,15 @@ import mmap
 import operator
 import os
 import shutil
+import stat
+import sys
 import tempfile
 import time
 import uuid
 
 import eventlet
 from eventlet import greenthread
+import eventlet.semaphore
 from eventlet import tpool
 from lxml import etree
 from oslo_concurrency import processutils
@@ -215,6 +218,34 @@ libvirt_opts = [
                 help='A number of seconds to memory usage statistics period. '
                      'Zero or negative value mean to disable memory usage '
                      'statistics.'),
+    cfg.IntOpt('disk_creation_concurrency',
+               default=0,
+               help='Maximum number of instance disks (root, ephemeral, '
+                    'swap, config drive) being created at once on the '
+                    'host. When set, the disks of an instance are created '
+                    'concurrently. Zero means the disks of an instance are '
+                    'created one after the other, without a host wide '
+                    'limit.'),
+    cfg.BoolOpt('record_disk_creation_events',
+                default=False,
+                help='Record the creation of each disk of an instance as '
+                     'an instance action event, so the time spent on each '
+                     'of them shows in the instance actions.'),
+    cfg.BoolOpt('prewarm_disk_templates',
+                default=False,
+                help='Create the ephemeral and swap disk templates of the '
+                     'flavors in the image cache from the image cache '
+                     'manager periodic task, while no instance disk is '
+                     'being created, so that the first instance using a '
+                     'flavor does not wait for the disks to be formatted.'),
+    cfg.IntOpt('domain_snapshot_max_age',
+               default=0,
+               help='Number of seconds the enumeration of the running '
+                    'domains, and their XML descriptions, are shared by the '
+                    'periodic tasks computing the host resources. The '
+                    'enumeration is also refreshed on any domain lifecycle '
+                    'event. Zero means every task enumerates the domains '
+                    'itself.'),
     cfg.ListOpt('uid_maps',
                 default=[],
                 help='List of uid targets and ranges.'
@@ -232,6 +263,7 @@ CONF.register_opts(libvirt_opts, 'libvirt')
 CONF.import_opt('host', 'nova.netconf')
 CONF.import_opt('my_ip', 'nova.netconf')
 CONF.import_opt('use_cow_images', 'nova.virt.driver')
+CONF.import_opt('image_cache_subdirectory_name', 'nova.virt.imagecache')
 CONF.import_opt('enabled', 'nova.compute.api',
                 group='ephemeral_storage_encryption')
 CONF.import_opt('cipher', 'nova.compute.api',
@@ -448,6 +480,20 @@ class LibvirtDriver(driver.ComputeDriver):
         self._volume_api = volume.API()
         self._image_api = image.API()
 
+        if CONF.libvirt.disk_creation_concurrency > 0:
+            self._disk_creation_semaphore = eventlet.semaphore.Semaphore(
+                CONF.libvirt.disk_creation_concurrency)
+        else:
+            self._disk_creation_semaphore = None
+        # The number of instance disks being created, the disk templates
+        # are only created while it is zero
+        self._disks_in_creation = 0
+
+        # The backing file and virtual size of the qcow2 disks of the
+        # domains, by path, along with the stat of the file they were read
+        # from, see _get_qcow2_disk_info()
+        self._qcow2_disk_info = {}
+
         sysinfo_serial_funcs = {
             'none': lambda: None,
             'hardware': self._get_host_sysinfo_serial_hardware,
@@ -2783,22 +2829,30 @@ class LibvirtDriver(driver.ComputeDriver):
                            'kernel_id': instance.kernel_id,
                            'ramdisk_id': instance.ramdisk_id}
 
+        # The disks are independent from each other, they are collected
+        # here and created by _create_disks(), possibly concurrently.
+        stages = []
+
         if disk_images['kernel_id']:
-            fname = imagecache.get_cache_fname(disk_images, 'kernel_id')
-            raw('kernel').cache(fetch_func=libvirt_utils.fetch_image,
-                                context=context,
-                                filename=fname,
-                                image_id=disk_images['kernel_id'],
-                                user_id=instance.user_id,
-                                project_id=instance.project_id)
-            if disk_images['ramdisk_id']:
-                fname = imagecache.get_cache_fname(disk_images, 'ramdisk_id')
-                raw('ramdisk').cache(fetch_func=libvirt_utils.fetch_image,
-                                     context=context,
-                                     filename=fname,
-                                     image_id=disk_images['ramdisk_id'],
-                                     user_id=instance.user_id,
-                                     project_id=instance.project_id)
+            def create_kernel():
+                fname = imagecache.get_cache_fname(disk_images, 'kernel_id')
+                raw('kernel').cache(fetch_func=libvirt_utils.fetch_image,
+                                    context=context,
+                                    filename=fname,
+                                    image_id=disk_images['kernel_id'],
+                                    user_id=instance.user_id,
+                                    project_id=instance.project_id)
+                if disk_images['ramdisk_id']:
+                    fname = imagecache.get_cache_fname(disk_images,
+                                                       'ramdisk_id')
+                    raw('ramdisk').cache(
+                        fetch_func=libvirt_utils.fetch_image,
+                        context=context,
+                        filename=fname,
+                        image_id=disk_images['ramdisk_id'],
+                        user_id=instance.user_id,
+                        project_id=instance.project_id)
+            stages.append(('kernel', create_kernel))
 
         inst_type = instance.get_flavor()
 
@@ -2806,25 +2860,31 @@ class LibvirtDriver(driver.ComputeDriver):
         # currently happens only on rescue - we still don't want to
         # create a base image.
         if not booted_from_volume:
-            root_fname = imagecache.get_cache_fname(disk_images, 'image_id')
-            size = instance.root_gb * units.Gi
-
-            if size == 0 or suffix == '.rescue':
-                size = None
-
-            backend = image('disk')
-            if backend.SUPPORTS_CLONE:
-                def clone_fallback_to_fetch(*args, **kwargs):
-                    try:
-                        backend.clone(context, disk_images['image_id'])
-                    except exception.ImageUnacceptable:
-                        libvirt_utils.fetch_image(*args, **kwargs)
-                fetch_func = clone_fallback_to_fetch
-            else:
-                fetch_func = libvirt_utils.fetch_image
-            self._try_fetch_image_cache(backend, fetch_func, context,
-                                        root_fname, disk_images['image_id'],
-                                        instance, size, fallback_from_host)
+            def create_root():
+                self.image_cache_manager.record_boot(disk_images['image_id'])
+                root_fname = imagecache.get_cache_fname(disk_images,
+                                                        'image_id')
+                size = instance.root_gb * units.Gi
+
+                if size == 0 or suffix == '.rescue':
+                    size = None
+
+                backend = image('disk')
+                if backend.SUPPORTS_CLONE:
+                    def clone_fallback_to_fetch(*args, **kwargs):
+                        try:
+                            backend.clone(context, disk_images['image_id'])
+                        except exception.ImageUnacceptable:
+                            libvirt_utils.fetch_image(*args, **kwargs)
+                    fetch_func = clone_fallback_to_fetch
+                else:
+                    fetch_func = libvirt_utils.fetch_image
+                self._try_fetch_image_cache(backend, fetch_func, context,
+                                            root_fname,
+                                            disk_images['image_id'],
+                                            instance, size,
+                                            fallback_from_host)
+            stages.append(('disk', create_root))
 
         # Lookup the filesystem type if required
         os_type_with_default = disk.get_fs_type_for_os_type(instance.os_type)
@@ -2842,15 +2902,18 @@ class LibvirtDriver(driver.ComputeDriver):
                                    is_block_dev=disk_image.is_block_dev)
             fname = "ephemeral_%s_%s" % (ephemeral_gb, file_extension)
             size = ephemeral_gb * units.Gi
-            disk_image.cache(fetch_func=fn,
-                             context=context,
-                             filename=fname,
-                             size=size,
-                             ephemeral_size=ephemeral_gb)
+            stages.append(('disk.local', functools.partial(
+                disk_image.cache,
+                fetch_func=fn,
+                context=context,
+                filename=fname,
+                size=size,
+                ephemeral_size=ephemeral_gb)))
 
         for idx, eph in enumerate(driver.block_device_info_get_ephemerals(
                 block_device_info)):
-            disk_image = image(blockinfo.get_eph_disk(idx))
+            disk_name = blockinfo.get_eph_disk(idx)
+            disk_image = image(disk_name)
 
             specified_fs = eph.get('guest_format')
             if specified_fs and not self.is_supported_fs_format(specified_fs):
@@ -2863,12 +2926,14 @@ class LibvirtDriver(driver.ComputeDriver):
                                    is_block_dev=disk_image.is_block_dev)
             size = eph['size'] * units.Gi
             fname = "ephemeral_%s_%s" % (eph['size'], file_extension)
-            disk_image.cache(fetch_func=fn,
-                             context=context,
-                             filename=fname,
-                             size=size,
-                             ephemeral_size=eph['size'],
-                             specified_fs=specified_fs)
+            stages.append((disk_name, functools.partial(
+                disk_image.cache,
+                fetch_func=fn,
+                context=context,
+                filename=fname,
+                size=size,
+                ephemeral_size=eph['size'],
+                specified_fs=specified_fs)))
 
         if 'disk.swap' in disk_mapping:
             mapping = disk_mapping['disk.swap']
@@ -2884,42 +2949,53 @@ class LibvirtDriver(driver.ComputeDriver):
 
             if swap_mb > 0:
                 size = swap_mb * units.Mi
-                image('disk.swap').cache(fetch_func=self._create_swap,
-                                         context=context,
-                                         filename="swap_%s" % swap_mb,
-                                         size=size,
-                                         swap_mb=swap_mb)
+                stages.append(('disk.swap', functools.partial(
+                    image('disk.swap').cache,
+                    fetch_func=self._create_swap,
+                    context=context,
+                    filename="swap_%s" % swap_mb,
+                    size=size,
+                    swap_mb=swap_mb)))
 
         # Config drive
-        if configdrive.required_by(instance):
-            LOG.info(_LI('Using config drive'), instance=instance)
-            extra_md = {}
-            if admin_pass:
-                extra_md['admin_pass'] = admin_pass
-
-            inst_md = instance_metadata.InstanceMetadata(instance,
-                content=files, extra_md=extra_md, network_info=network_info)
-            with configdrive.ConfigDriveBuilder(instance_md=inst_md) as cdb:
-                configdrive_path = self._get_disk_config_path(instance, suffix)
-                LOG.info(_LI('Creating config drive at %(path)s'),
-                         {'path': configdrive_path}, instance=instance)
+        config_drive_required = configdrive.required_by(instance)
+        if config_drive_required:
+            def create_config_drive():
+                LOG.info(_LI('Using config drive'), instance=instance)
+                extra_md = {}
+                if admin_pass:
+                    extra_md['admin_pass'] = admin_pass
+
+                inst_md = instance_metadata.InstanceMetadata(instance,
+                    content=files, extra_md=extra_md,
+                    network_info=network_info)
+                with configdrive.ConfigDriveBuilder(
+                        instance_md=inst_md) as cdb:
+                    configdrive_path = self._get_disk_config_path(instance,
+                                                                  suffix)
+                    LOG.info(_LI('Creating config drive at %(path)s'),
+                             {'path': configdrive_path}, instance=instance)
 
-                try:
-                    os_type = vm_mode.get_from_instance(instance)
-                    if (os_type == vm_mode.EXE and
-                        CONF.libvirt.virt_type == "parallels"):
-                        cdb.make_drive(configdrive_path,
-                                configdrive.IMAGE_TYPE_PLOOP)
-                    else:
-                        cdb.make_drive(configdrive_path)
-                except processutils.ProcessExecutionError as e:
-                    with excutils.save_and_reraise_exception():
-                        LOG.error(_LE('Creating config drive failed '
-                                      'with error: %s'),
-                                  e, instance=instance)
+                    try:
+                        os_type = vm_mode.get_from_instance(instance)
+                        if (os_type == vm_mode.EXE and
+                            CONF.libvirt.virt_type == "parallels"):
+                            cdb.make_drive(configdrive_path,
+                                    configdrive.IMAGE_TYPE_PLOOP)
+                        else:
+                            cdb.make_drive(configdrive_path)
+                    except processutils.ProcessExecutionError as e:
+                        with excutils.save_and_reraise_exception():
+                            LOG.error(_LE('Creating config drive failed '
+                                          'with error: %s'),
+                                      e, instance=instance)
+            stages.append(('disk.config', create_config_drive))
+
+        self._create_disks(context, instance, stages)
 
         # File injection only if needed
-        elif inject_files and CONF.libvirt.inject_partition != -2:
+        if (not config_drive_required and inject_files and
+                CONF.libvirt.inject_partition != -2):
             if booted_from_volume:
                 LOG.warn(_LW('File injection into a boot from volume '
                              'instance is not supported'), instance=instance)
@@ -2929,6 +3005,56 @@ class LibvirtDriver(driver.ComputeDriver):
         if CONF.libvirt.virt_type == 'uml':
             libvirt_utils.chown(image('disk').path, 'root')
 
+    def _create_disk(self, context, instance, name, create_func):
+        """Create one of the disks of an instance and time it."""
+        start = time.time()
+        self._disks_in_creation += 1
+        try:
+            if CONF.libvirt.record_disk_creation_events:
+                with compute_utils.EventReporter(
+                        context, 'libvirt_create_%s' % name, instance.uuid):
+                    create_func()
+            else:
+                create_func()
+        finally:
+            self._disks_in_creation -= 1
+        LOG.debug('Created %(name)s in %(seconds).2f seconds',
+                  {'name': name, 'seconds': time.time() - start},
+                  instance=instance)
+
+    def _create_disks(self, context, instance, stages):
+        """Create the disks of an instance.
+
+        :param stages: list of (disk name, function creating the disk)
+
+        With the disk_creation_concurrency option set, the disks are
+        created concurrently, with at most that many disks being created
+        at once on the host. Otherwise they are created one after the
+        other.
+        """
+        if self._disk_creation_semaphore is None:
+            for name, create_func in stages:
+                self._create_disk(context, instance, name, create_func)
+            return
+
+        def create_disk(name, create_func):
+            with self._disk_creation_semaphore:
+                self._create_disk(context, instance, name, create_func)
+
+        threads = [utils.spawn(create_disk, name, create_func)
+                   for name, create_func in stages]
+        # Wait for all the disks before raising, so that no disk is still
+        # being created when the caller cleans up after a failure
+        exc_info = None
+        for thread in threads:
+            try:
+                thread.wait()
+            except Exception:
+                if exc_info is None:
+                    exc_info = sys.exc_info()
+        if exc_info is not None:
+            six.reraise(*exc_info)
+
     def _prepare_pci_devices_for_use(self, pci_devices):
         # kvm , qemu support managed mode
         # In managed mode, the configured device will be automatically
@@ -4603,7 +4729,7 @@ class LibvirtDriver(driver.ComputeDriver):
         if CONF.libvirt.virt_type == 'lxc':
             return total + 1
 
-        for dom in self._host.list_instance_domains():
+        for dom in self._host.get_domain_snapshot().domains:
             try:
                 # TODO(sahid): list_instance_domains should
                 # return Guest objects.
@@ -6142,8 +6268,7 @@ class LibvirtDriver(driver.ComputeDriver):
 
             disk_type = driver_nodes[cnt].get('type')
             if disk_type == "qcow2":
-                backing_file = libvirt_utils.get_disk_backing_file(path)
-                virt_size = disk.get_disk_size(path)
+                backing_file, virt_size = self._get_qcow2_disk_info(path)
                 over_commit_size = int(virt_size) - dk_size
             else:
                 backing_file = ""
@@ -6158,6 +6283,32 @@ class LibvirtDriver(driver.ComputeDriver):
                               'over_committed_disk_size': over_commit_size})
         return disk_info
 
+    def _get_qcow2_disk_info(self, path):
+        """Return the backing file and virtual size of a qcow2 disk.
+
+        Running qemu-img on every disk of every domain is the bulk of the
+        periodic resource update, so the result is kept until the size or
+        modification time of the file changes.
+        """
+        try:
+            disk_stat = os.stat(path)
+        except OSError:
+            # The caller already got the size of the disk, let qemu-img
+            # report the error.
+            disk_stat = None
+        stamp = None
+        if disk_stat is not None and stat.S_ISREG(disk_stat.st_mode):
+            stamp = (disk_stat.st_size, disk_stat.st_mtime)
+            cached = self._qcow2_disk_info.get(path)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+
+        info = (libvirt_utils.get_disk_backing_file(path),
+                disk.get_disk_size(path))
+        if stamp is not None:
+            self._qcow2_disk_info[path] = (stamp, info)
+        return info
+
     def get_instance_disk_info(self, instance,
                                block_device_info=None):
         try:
@@ -6182,16 +6333,19 @@ class LibvirtDriver(driver.ComputeDriver):
         """Return total over committed disk size for all instances."""
         # Disk size that all instance uses : virtual_size - disk_size
         disk_over_committed_size = 0
-        for dom in self._host.list_instance_domains():
+        disk_paths = set()
+        snapshot = self._host.get_domain_snapshot()
+        for dom in snapshot.domains:
             try:
                 # TODO(sahid): list_instance_domain should
                 # be renamed as list_guest and so returning
                 # Guest objects.
                 guest = libvirt_guest.Guest(dom)
-                xml = guest.get_xml_desc()
+                xml = snapshot.get_xml_desc(dom)
 
                 disk_infos = self._get_instance_disk_info(guest.name, xml)
                 for info in disk_infos:
+                    disk_paths.add(info['path'])
                     disk_over_committed_size += int(
                         info['over_committed_disk_size'])
             except libvirt.libvirtError as ex:
@@ -6228,6 +6382,10 @@ class LibvirtDriver(driver.ComputeDriver):
                           'error': e})
             # NOTE(gtt116): give other tasks a chance.
             greenthread.sleep(0)
+        # Forget the disks of the domains which are gone
+        self._qcow2_disk_info = {
+            path: info for path, info in six.iteritems(self._qcow2_disk_info)
+            if path in disk_paths}
         return disk_over_committed_size
 
     def unfilter_instance(self, instance, network_info):
@@ -6249,8 +6407,84 @@ class LibvirtDriver(driver.ComputeDriver):
 
     def manage_image_cache(self, context, all_instances):
         """Manage the local cache of images."""
+        if CONF.libvirt.prewarm_disk_templates:
+            # Before the update, so that the templates just touched are
+            # not aged out by it
+            self._prewarm_disk_templates(context, all_instances)
         self.image_cache_manager.update(context, all_instances)
 
+    def _get_disk_templates(self, context, all_instances):
+        """Return the ephemeral and swap templates of the active flavors.
+
+        Returns a dict of the template file names in the image cache, as
+        _create_image() names them, to the function creating the template.
+        The ephemeral templates are made for the os types of the given
+        instances.
+        """
+        os_types = {}
+        for os_type in [None] + [inst.os_type for inst in all_instances]:
+            file_extension = disk.get_file_extension_for_os_type(
+                disk.get_fs_type_for_os_type(os_type))
+            os_types.setdefault(file_extension, os_type)
+
+        templates = {}
+        for flavor in objects.FlavorList.get_all(context):
+            # The lvm backend formats the ephemeral disks in place
+            if flavor.ephemeral_gb and CONF.libvirt.images_type != 'lvm':
+                for file_extension, os_type in os_types.items():
+                    fname = 'ephemeral_%s_%s' % (flavor.ephemeral_gb,
+                                                 file_extension)
+                    templates[fname] = functools.partial(
+                        self._create_ephemeral,
+                        ephemeral_size=flavor.ephemeral_gb,
+                        fs_label='ephemeral0',
+                        os_type=os_type)
+            if flavor.swap:
+                templates['swap_%s' % flavor.swap] = functools.partial(
+                    self._create_swap, swap_mb=flavor.swap)
+        return templates
+
+    def _prewarm_disk_templates(self, context, all_instances):
+        """Create the missing disk templates in the image cache.
+
+        The existing templates are touched, so that the image cache manager
+        keeps them. The creation stops as soon as instance disks are being
+        created on the host, it is resumed by the next pass.
+        """
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        lock_path = os.path.join(CONF.instances_path, 'locks')
+        fileutils.ensure_tree(base_dir)
+
+        templates = self._get_disk_templates(context, all_instances)
+        for fname, create_func in sorted(templates.items()):
+            base = os.path.join(base_dir, fname)
+            if os.path.exists(base):
+                os.utime(base, None)
+                continue
+            if self._disks_in_creation:
+                LOG.debug('Instance disks are being created, deferring the '
+                          'creation of the disk templates')
+                return
+
+            # The same lock as Image.cache(), the template is created aside
+            # so that it is never seen half formatted
+            @utils.synchronized(fname, external=True, lock_path=lock_path)
+            def create_template(base, create_func):
+                if os.path.exists(base):
+                    return
+                target = base + '.part'
+                with fileutils.remove_path_on_error(target):
+                    create_func(target=target)
+                os.rename(target, base)
+
+            LOG.debug('Creating disk template %s', base)
+            try:
+                create_template(base, create_func)
+            except Exception as e:
+                LOG.warn(_LW('Failed to create disk template %(base)s: '
+                             '%(error)s'), {'base': base, 'error': e})
+
     def _cleanup_remote_migration(self, dest, inst_base, inst_base_resize,
                                   shared_storage=False):
         """Used only for cleanup in case migrate_disk_and_power_off fails."""
@@ -32,6 +32,7 @@ import os
 import socket
 import sys
 import threading
+import time
 
 import eventlet
 from eventlet import greenio
@@ -192,6 +193,26 @@ class DomainJobInfo(object):
             return cls._get_job_stats_compat(dom)
 
 
+class DomainSnapshot(object):
+    """One enumeration of the running guest domains of the host.
+
+    The XML description of a domain is only fetched from libvirt the first
+    time it is asked for, and is then shared by all the users of the
+    snapshot.
+    """
+
+    def __init__(self, domains):
+        self.domains = domains
+        self.created_at = time.time()
+        self._xml_descs = {}
+
+    def get_xml_desc(self, dom):
+        uuid = dom.UUIDString()
+        if uuid not in self._xml_descs:
+            self._xml_descs[uuid] = guest.Guest(dom).get_xml_desc()
+        return self._xml_descs[uuid]
+
+
 class Host(object):
 
     def __init__(self, uri, read_only=False,
@@ -209,6 +230,7 @@ class Host(object):
         self._skip_list_all_domains = False
         self._caps = None
         self._hostname = None
+        self._domain_snapshot = None
 
         self._wrapped_conn = None
         self._wrapped_conn_lock = threading.Lock()
@@ -362,6 +384,8 @@ class Host(object):
             try:
                 event = self._event_queue.get(block=False)
                 if isinstance(event, virtevent.LifecycleEvent):
+                    # The set of running domains may have changed
+                    self._domain_snapshot = None
                     # call possibly with delay
                     self._event_emit_delayed(event)
 
@@ -731,6 +755,23 @@ class Host(object):
 
         return doms
 
+    def get_domain_snapshot(self):
+        """Get a snapshot of the running guest domains of the host
+
+        The periodic tasks which walk all the domains share a single
+        enumeration, which is reused until it is older than the
+        domain_snapshot_max_age option or a lifecycle event is received
+        from libvirt.
+
+        :returns: a DomainSnapshot
+        """
+        snapshot = self._domain_snapshot
+        if (snapshot is None or time.time() - snapshot.created_at >=
+                CONF.libvirt.domain_snapshot_max_age):
+            snapshot = DomainSnapshot(self.list_instance_domains())
+            self._domain_snapshot = snapshot
+        return snapshot
+
     def get_online_cpus(self):
         """Get the set of CPUs that are online on the host
 
@@ -34,9 +34,11 @@ from oslo_serialization import jsonutils
 from nova.i18n import _LE
 from nova.i18n import _LI
 from nova.i18n import _LW
+from nova.image import glance
 from nova.openstack.common import fileutils
 from nova import utils
 from nova.virt import imagecache
+from nova.virt import images
 from nova.virt.libvirt import utils as libvirt_utils
 
 LOG = logging.getLogger(__name__)
@@ -65,6 +67,29 @@ imagecache_opts = [
     cfg.IntOpt('checksum_interval_seconds',
                default=3600,
                help='How frequently to checksum base images'),
+    cfg.ListOpt('prefetch_images',
+                default=[],
+                help='Ids of the images fetched into the image cache by '
+                     'the image cache manager ahead of the first instance '
+                     'using them. They are not removed from the cache while '
+                     'listed here. They are fetched with the credentials of '
+                     'the auth plugin of the glance section.'),
+    cfg.IntOpt('prefetch_popular_image_boots',
+               default=0,
+               help='Number of instances booted on the host from an image '
+                    'within prefetch_popular_image_window seconds, from '
+                    'which the image is kept in the image cache, and '
+                    'fetched again when missing, as if it was listed in '
+                    'prefetch_images. Zero disables it.'),
+    cfg.IntOpt('prefetch_popular_image_window',
+               default=24 * 3600,
+               help='Number of seconds the boots of the host are counted '
+                    'for prefetch_popular_image_boots'),
+    cfg.IntOpt('prefetch_max_rate',
+               default=0,
+               help='Maximum rate in kilobytes per second of the download '
+                    'of each image fetched ahead by the image cache '
+                    'manager. Zero means unlimited.'),
     ]
 
 CONF = cfg.CONF
@@ -239,6 +264,11 @@ class ImageCacheManager(imagecache.ImageCacheManager):
     def __init__(self):
         super(ImageCacheManager, self).__init__()
         self.lock_path = os.path.join(CONF.instances_path, 'locks')
+        # The times of the recent boots of the host by image id, see
+        # record_boot()
+        self.recent_boots = {}
+        # The ids of the images being prefetched, see _prefetch_image()
+        self.prefetching = set()
         self._reset_state()
 
     def _reset_state(self):
@@ -250,6 +280,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
 
         self.back_swap_images = set()
         self.used_swap_images = set()
+        self.prefetch_images = set()
 
         self.active_base_files = []
         self.corrupt_base_files = []
@@ -522,7 +553,15 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             # Give other threads a chance to run
             time.sleep(0)
 
-        if img_id in self.used_images:
+        if img_id in self.prefetch_images:
+            image_in_use = True
+            LOG.info(_LI('image %(id)s at (%(base_file)s): in use: '
+                         'prefetched'),
+                     {'id': img_id,
+                      'base_file': base_file})
+            self.active_base_files.append(base_file)
+
+        elif img_id in self.used_images:
             local, remote, instances = self.used_images[img_id]
 
             if local > 0 or remote > 0:
@@ -585,7 +624,9 @@ class ImageCacheManager(imagecache.ImageCacheManager):
     def _age_and_verify_cached_images(self, context, all_instances, base_dir):
         LOG.debug('Verify base images')
         # Determine what images are on disk because they're in use
-        for img in self.used_images:
+        image_ids = list(self.used_images)
+        image_ids.extend(sorted(self.prefetch_images - set(self.used_images)))
+        for img in image_ids:
             fingerprint = hashlib.sha1(img).hexdigest()
             LOG.debug('Image id %(id)s yields fingerprint %(fingerprint)s',
                       {'id': img,
@@ -647,12 +688,99 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             return
         return base_dir
 
+    def record_boot(self, image_id):
+        """Record the boot of an instance of the host from an image."""
+        self.recent_boots.setdefault(image_id, []).append(time.time())
+
+    def _get_prefetch_images(self):
+        """Return the ids of the images to keep in the cache.
+
+        These are the images listed in prefetch_images, and the images from
+        which at least prefetch_popular_image_boots instances were booted on
+        the host within the last prefetch_popular_image_window seconds.
+        """
+        prefetch_images = set(CONF.libvirt.prefetch_images)
+        min_boots = CONF.libvirt.prefetch_popular_image_boots
+        window_start = (time.time() -
+                        CONF.libvirt.prefetch_popular_image_window)
+        for image_id, boots in list(self.recent_boots.items()):
+            boots = [boot for boot in boots if boot >= window_start]
+            if not boots:
+                del self.recent_boots[image_id]
+                continue
+            self.recent_boots[image_id] = boots
+            if min_boots > 0 and len(boots) >= min_boots:
+                prefetch_images.add(image_id)
+        return prefetch_images
+
+    def _prefetch_image(self, base_dir, image_id):
+        """Fetch an image into the cache, unless it is there already.
+
+        The image is fetched under the same lock, and to the same base file,
+        as Image.cache() does. It is run in its own green thread, and no
+        other fetch of the image is started until it is done.
+
+        The boots recorded do not keep the contexts of their requests, whose
+        tokens expire long before the image stops being popular, so the
+        image is fetched with the admin context of the glance credentials.
+        """
+        filename = get_cache_fname({'image_id': image_id}, 'image_id')
+        base_file = os.path.join(base_dir, filename)
+
+        @utils.synchronized(filename, external=True, lock_path=self.lock_path)
+        def fetch_image():
+            if os.path.exists(base_file):
+                return
+            LOG.info(_LI('image %(id)s at (%(base_file)s): prefetching'),
+                     {'id': image_id,
+                      'base_file': base_file})
+            context = glance.get_admin_context()
+            images.fetch_to_raw(context, image_id, base_file,
+                                context.user_id, context.project_id,
+                                max_rate=CONF.libvirt.prefetch_max_rate * 1024)
+
+        try:
+            fetch_image()
+        except Exception as e:
+            LOG.warn(_LW('image %(id)s at (%(base_file)s): prefetch '
+                         'failed: %(error)s'),
+                     {'id': image_id,
+                      'base_file': base_file,
+                      'error': e})
+        finally:
+            self.prefetching.discard(image_id)
+
+    def _start_prefetch_images(self, base_dir, image_ids):
+        """Start fetching the given images missing from the cache.
+
+        The images are fetched in the background so that the periodic tasks
+        of the host are not held up by the downloads, and an image whose
+        fetch did not end since the previous pass is skipped.
+        """
+        for image_id in sorted(image_ids):
+            if image_id in self.prefetching:
+                continue
+            filename = get_cache_fname({'image_id': image_id}, 'image_id')
+            if os.path.exists(os.path.join(base_dir, filename)):
+                continue
+            self.prefetching.add(image_id)
+            utils.spawn_n(self._prefetch_image, base_dir, image_id)
+
     def update(self, context, all_instances):
+        prefetch_images = self._get_prefetch_images()
+        if prefetch_images:
+            # The images are prefetched even if no image was cached yet
+            fileutils.ensure_tree(os.path.join(
+                CONF.instances_path, CONF.image_cache_subdirectory_name))
         base_dir = self._get_base()
         if not base_dir:
             return
         # reset the local statistics
         self._reset_state()
+        # start fetching the missing images to prefetch, they are handled as
+        # in use once they are in the cache
+        self.prefetch_images = prefetch_images
+        self._start_prefetch_images(base_dir, prefetch_images)
         # read the cached images
         self._list_base_images(base_dir)
         # read running instances data
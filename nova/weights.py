@@ -97,23 +97,19 @@ class BaseWeigher(object):
         just return a list of weights.
         """
         # Calculate the weights
-        weights = []
-        for obj in weighed_obj_list:
-            weight = self._weigh_object(obj.obj, weight_properties)
-
-            # Record the min and max values if they are None. If they anything
-            # but none we assume that the weigher has set them
-            if self.minval is None:
-                self.minval = weight
-            if self.maxval is None:
-                self.maxval = weight
-
-            if weight < self.minval:
-                self.minval = weight
-            elif weight > self.maxval:
-                self.maxval = weight
-
-            weights.append(weight)
+        weights = [self._weigh_object(obj.obj, weight_properties)
+                   for obj in weighed_obj_list]
+        if not weights:
+            return weights
+
+        # Record the min and max values if they are None. If they anything
+        # but none we assume that the weigher has set them
+        minval = min(weights)
+        maxval = max(weights)
+        if self.minval is None or minval < self.minval:
+            self.minval = minval
+        if self.maxval is None or maxval > self.maxval:
+            self.maxval = maxval
 
         return weights
 
@@ -136,8 +132,31 @@ class BaseWeightHandler(loadables.BaseLoader):
                                 minval=weigher.minval,
                                 maxval=weigher.maxval)
 
-            for i, weight in enumerate(weights):
-                obj = weighed_objs[i]
-                obj.weight += weigher.weight_multiplier() * weight
+            multiplier = weigher.weight_multiplier()
+            for obj, weight in zip(weighed_objs, weights):
+                obj.weight += multiplier * weight
 
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
+    def get_weight_bounds(self, weighers):
+        """Return the (minval, maxval) normalization bounds of each weigher,
+        as used by the last call to get_weighed_objects().
+        """
+        return [(weigher.minval, weigher.maxval) for weigher in weighers]
+
+    def get_weighed_object(self, weighers, obj, weighing_properties, bounds):
+        """Return a WeighedObject for a single object.
+
+        The weights are normalized using the bounds returned by
+        get_weight_bounds() rather than against other objects, so that the
+        object can be compared with the ones previously returned by
+        get_weighed_objects().
+        """
+        weighed_obj = self.object_class(obj, 0.0)
+        for weigher, (minval, maxval) in zip(weighers, bounds):
+            weights = weigher.weigh_objects([weighed_obj],
+                                            weighing_properties)
+            weight = list(normalize(weights, minval=minval,
+                                    maxval=maxval))[0]
+            weighed_obj.weight += weigher.weight_multiplier() * weight
+        return weighed_obj